@@ -0,0 +1,290 @@
+import atexit
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+
+from flask import has_app_context
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+from models import db, AuditLog
+
+logger = logging.getLogger(__name__)
+
+_UUID_FIELDS = ('id', 'user_id')
+# Errors that say the database is unreachable rather than that a record is bad
+_UNAVAILABLE = (OperationalError, InterfaceError, DisconnectionError)
+
+
+def _to_spool(record):
+    line = dict(record)
+    for field in _UUID_FIELDS:
+        if line.get(field) is not None:
+            line[field] = str(line[field])
+    if line.get('timestamp') is not None:
+        line['timestamp'] = line['timestamp'].isoformat()
+    return json.dumps(line, default=str)
+
+
+def _from_spool(line):
+    record = json.loads(line)
+    for field in _UUID_FIELDS:
+        if record.get(field) is not None:
+            record[field] = uuid.UUID(record[field])
+    if record.get('timestamp') is not None:
+        record['timestamp'] = datetime.datetime.fromisoformat(record['timestamp'])
+    return record
+
+
+class AuditSink:
+    """Write-behind sink for audit log records.
+
+    Requests enqueue plain dicts and return immediately. A background thread
+    drains the bounded queue and writes each batch with a single multi-row
+    INSERT, triggered when `batch_size` records are waiting or every
+    `flush_interval` seconds. Records that cannot be queued (the database is
+    falling behind) or that cannot be inserted while the database is
+    unavailable are appended to a local spool file, which is replayed once
+    inserts succeed again. When a batch fails for any other reason its rows
+    are inserted one at a time, and rows the database rejects are moved to
+    a quarantine file instead of holding back the rest.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_WRITE_BEHIND', True)
+        app.config.setdefault('AUDIT_QUEUE_SIZE', 10000)
+        app.config.setdefault('AUDIT_BATCH_SIZE', 500)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('AUDIT_SPOOL_PATH', 'audit-spool.ndjson')
+        app.config.setdefault('AUDIT_QUARANTINE_PATH', 'audit-quarantine.ndjson')
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+        app.extensions['audit_sink'] = self
+
+    def record(self, **fields):
+        """Record one audit event; the id and timestamp are fixed now"""
+        record = {
+            'id': uuid.uuid4(),
+            'user_id': fields.get('user_id'),
+            'action': fields['action'],
+            'resource_type': fields.get('resource_type'),
+            'resource_id': fields.get('resource_id'),
+            'details': fields.get('details'),
+            'ip_address': fields.get('ip_address'),
+            'user_agent': fields.get('user_agent'),
+            'timestamp': datetime.datetime.utcnow()
+        }
+
+        if not self.app.config['AUDIT_WRITE_BEHIND']:
+            self._insert([record])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._spool([record])
+            return
+        if self._queue.qsize() >= self.app.config['AUDIT_BATCH_SIZE']:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued record now, then replay the spool if any"""
+        while True:
+            batch = self._drain(self.app.config['AUDIT_BATCH_SIZE'])
+            if not batch:
+                break
+            if not self._write(batch):
+                return
+        self._replay_spool()
+
+    def shutdown(self, timeout=10):
+        """Stop the flusher thread after a final flush"""
+        if self.app is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        else:
+            self.flush()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        try:
+            self._sweep_replays()
+        except Exception:
+            logger.exception('Audit spool sweep failed')
+        interval = self.app.config['AUDIT_FLUSH_INTERVAL']
+        while not self._stopping.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Audit flush failed')
+        self.flush()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records):
+        """Insert `records`; returns False if the database was unavailable and they were spooled"""
+        try:
+            self._insert(records)
+            return True
+        except _UNAVAILABLE:
+            logger.exception('Audit database unavailable; spooling %d records', len(records))
+            self._spool(records)
+            return False
+        except Exception:
+            logger.exception('Audit batch insert failed; retrying %d records one at a time', len(records))
+
+        for index, record in enumerate(records):
+            try:
+                self._insert([record])
+            except _UNAVAILABLE:
+                logger.exception('Audit database unavailable; spooling %d records', len(records) - index)
+                self._spool(records[index:])
+                return False
+            except Exception:
+                logger.exception('Audit record %s rejected; quarantining it', record.get('id'))
+                self._quarantine([_to_spool(record)])
+        return True
+
+    def _insert(self, records):
+        if not records:
+            return
+        if has_app_context():
+            self._execute(records)
+        else:
+            with self.app.app_context():
+                self._execute(records)
+
+    def _execute(self, records):
+        # executemany of a Core insert is sent as multi-row INSERT statements
+        try:
+            db.session.execute(AuditLog.__table__.insert(), records)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _spool(self, records):
+        path = self.app.config['AUDIT_SPOOL_PATH']
+        with self._spool_lock:
+            with open(path, 'a', encoding='utf-8') as spool:
+                spool.write(''.join(_to_spool(record) + '\n' for record in records))
+                spool.flush()
+                os.fsync(spool.fileno())
+
+    def _quarantine(self, lines):
+        path = self.app.config['AUDIT_QUARANTINE_PATH']
+        with self._spool_lock:
+            with open(path, 'a', encoding='utf-8') as quarantine:
+                quarantine.write(''.join(line.rstrip('\n') + '\n' for line in lines))
+                quarantine.flush()
+                os.fsync(quarantine.fileno())
+
+    def _replay_spool(self):
+        path = self.app.config['AUDIT_SPOOL_PATH']
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        # Claim the spool atomically so only one worker replays it
+        claimed = f'{path}.{os.getpid()}.replay'
+        with self._spool_lock:
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                return
+
+        self._replay_file(claimed)
+
+    def _replay_file(self, claimed):
+        records, unreadable = [], []
+        with open(claimed, encoding='utf-8') as spool:
+            for line in spool:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(_from_spool(line))
+                except (ValueError, TypeError, AttributeError):
+                    unreadable.append(line)
+        if unreadable:
+            logger.error('Quarantining %d unreadable audit spool lines', len(unreadable))
+            self._quarantine(unreadable)
+
+        batch_size = self.app.config['AUDIT_BATCH_SIZE']
+        for start in range(0, len(records), batch_size):
+            if not self._write(records[start:start + batch_size]):
+                # _write spooled the failed batch; keep the rest with it
+                self._spool(records[start + batch_size:])
+                logger.error('Audit spool replay stopped; kept %d records', len(records) - start)
+                break
+        os.remove(claimed)
+
+    def _sweep_replays(self):
+        """Replay spool files claimed by workers that died mid-replay"""
+        path = self.app.config['AUDIT_SPOOL_PATH']
+        for stale in glob.glob(glob.escape(path) + '.*.replay'):
+            try:
+                pid = int(stale[len(path) + 1:].split('.')[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _alive(pid):
+                continue
+            # Re-claim under this process, so only one worker replays it
+            claimed = f'{path}.{os.getpid()}.{uuid.uuid4().hex}.replay'
+            try:
+                os.rename(stale, claimed)
+            except FileNotFoundError:
+                continue
+            logger.warning('Replaying audit spool %s left by process %d', stale, pid)
+            self._replay_file(claimed)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+audit_sink = AuditSink()
@@ -0,0 +1,180 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import text
+
+from models import db, AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions of audit_logs are named audit_logs_pYYYY_MM (see
+# migration 0004_partition_audit_logs)
+PARTITION_PATTERN = re.compile(r'^audit_logs_p(\d{4})_(\d{2})$')
+DEFAULT_PARTITION = 'audit_logs_default'
+
+
+def _month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'audit_logs_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned():
+    """Whether audit_logs is a partitioned parent (Postgres after migration 0004)"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'audit_logs'"
+    )).scalar())
+
+
+def _attached_partitions():
+    rows = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = 'audit_logs'"
+    ))
+    return {name for (name,) in rows}
+
+
+def _monthly_tables():
+    """Every table following the partition naming scheme, attached or not"""
+    rows = db.session.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind IN ('r', 'p') AND relname LIKE 'audit_logs_p%'"
+    ))
+    tables = {}
+    for (name,) in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            tables[name] = datetime.date(int(match.group(1)), int(match.group(2)), 1)
+    return tables
+
+
+def _create_partition(name, month, has_default):
+    bounds = f"FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    in_range = f"timestamp >= '{month.isoformat()}' AND timestamp < '{_add_months(month, 1).isoformat()}'"
+    stranded = has_default and db.session.execute(
+        text(f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1')
+    ).first()
+    if not stranded:
+        db.session.execute(text(f'CREATE TABLE {name} PARTITION OF audit_logs FOR VALUES {bounds}'))
+        return
+    # Postgres refuses a partition whose rows already sit in the default
+    # partition, so move them across with the default detached. DDL is
+    # transactional: writers wait on the parent's lock until the commit.
+    logger.warning('Moving %s rows from %s into new partition %s', month.strftime('%Y-%m'), DEFAULT_PARTITION, name)
+    db.session.execute(text(f'ALTER TABLE audit_logs DETACH PARTITION {DEFAULT_PARTITION}'))
+    db.session.execute(text(f'CREATE TABLE {name} PARTITION OF audit_logs FOR VALUES {bounds}'))
+    db.session.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved'
+    ))
+    db.session.execute(text(f'ALTER TABLE audit_logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT'))
+
+
+def ensure_partitions(months_ahead=2, today=None):
+    """Create monthly partitions from the current month through `months_ahead`.
+
+    Rows for a new month that already landed in the default partition are
+    moved into it. A partition that cannot be created is logged and skipped
+    rather than raised, so `flask ixion bootstrap` still lets the app start.
+    Returns the names of the partitions created.
+    """
+    if not is_partitioned():
+        return []
+
+    current = _month_start(today or datetime.datetime.utcnow())
+    existing = _monthly_tables()
+    has_default = DEFAULT_PARTITION in _attached_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            _create_partition(name, month, has_default)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Could not create audit log partition %s', name)
+            continue
+        created.append(name)
+    return created
+
+
+def archive_table(name, archive_dir):
+    """Stream every row of table `name` to archive_dir/<name>.ndjson.gz.
+
+    The file is written under a temporary name and renamed once complete, so
+    a finished archive is never partial.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{name}.ndjson.gz')
+    partial = path + '.partial'
+
+    columns = [column.name for column in AuditLog.__table__.columns]
+    result = db.session.execute(
+        text(f'SELECT {", ".join(columns)} FROM {name} ORDER BY timestamp, id').execution_options(yield_per=1000)
+    )
+    count = 0
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for batch in result.partitions():
+                lines = []
+                for row in batch:
+                    record = {}
+                    for key, value in row._mapping.items():
+                        if isinstance(value, (datetime.datetime, datetime.date)):
+                            value = value.isoformat()
+                        elif value is not None and not isinstance(value, (str, int, float, bool)):
+                            value = str(value)
+                        record[key] = value
+                    lines.append(json.dumps(record) + '\n')
+                archive.write(''.join(lines).encode('utf-8'))
+                count += len(lines)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return path, count
+
+
+def apply_retention(retention_months, archive_dir, today=None):
+    """Detach, archive and drop monthly partitions older than the retention window.
+
+    A partition is expired once its whole month falls before the first day of
+    the current month minus `retention_months`. Tables left detached by an
+    interrupted run are archived and dropped as well. Returns a list of
+    (partition, archive_path, row_count).
+    """
+    if not is_partitioned():
+        return []
+
+    cutoff = _add_months(_month_start(today or datetime.datetime.utcnow()), -retention_months)
+    attached = _attached_partitions()
+    expired = sorted(name for name, month in _monthly_tables().items() if _add_months(month, 1) <= cutoff)
+
+    archived = []
+    for name in expired:
+        if name in attached:
+            db.session.execute(text(f'ALTER TABLE audit_logs DETACH PARTITION {name}'))
+            db.session.commit()
+        path, count = archive_table(name, archive_dir)
+        db.session.execute(text(f'DROP TABLE {name}'))
+        db.session.commit()
+        logger.info('Archived %d audit rows from %s to %s', count, name, path)
+        archived.append((name, path, count))
+    return archived
@@ -0,0 +1,56 @@
+import uuid
+
+from permission_bits import permission_bits
+from principal_cache import get_principals
+
+DEFAULT_MAX_CHECKS = 100
+
+
+def parse_checks(data, max_checks=DEFAULT_MAX_CHECKS):
+    """Validate a check request body into (subject, resource, action) tuples; raises ValueError"""
+    checks = data.get('checks') if isinstance(data, dict) else None
+    if not isinstance(checks, list) or not checks:
+        raise ValueError('checks must be a non-empty list')
+    if len(checks) > max_checks:
+        raise ValueError(f'at most {max_checks} checks per request')
+
+    parsed = []
+    for index, check in enumerate(checks):
+        fields = [check.get(key) if isinstance(check, dict) else None for key in ('subject', 'resource', 'action')]
+        if not all(isinstance(field, str) and field for field in fields):
+            raise ValueError(f'check {index} needs subject, resource and action strings')
+        parsed.append(tuple(fields))
+    return parsed
+
+
+def _decide(principal, permission):
+    if principal is None:
+        return False, 'unknown subject'
+    if not principal.is_active:
+        return False, 'subject is deactivated'
+    if principal.is_admin or permission_bits.test(principal.permissions, permission):
+        return True, None
+    return False, 'permission not granted'
+
+
+def check_batch(checks):
+    """Decide each (subject, resource, action) tuple against effective permissions.
+
+    Subjects are user ids. Their principals come from the principal cache,
+    with every miss loaded in a single query, so a batch costs at most one
+    database round trip. Decisions follow permission_required: admins hold
+    every permission and deactivated users hold none.
+    """
+    principals = get_principals({subject for subject, _, _ in checks})
+    results = []
+    for subject, resource, action in checks:
+        try:
+            principal = principals.get(uuid.UUID(subject))
+        except ValueError:
+            principal = None
+        allowed, reason = _decide(principal, f'{resource}:{action}')
+        result = {'subject': subject, 'resource': resource, 'action': action, 'allowed': allowed}
+        if reason:
+            result['reason'] = reason
+        results.append(result)
+    return results
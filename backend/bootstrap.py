@@ -0,0 +1,79 @@
+import logging
+
+from sqlalchemy import inspect, select
+
+from catalog import load_catalog, diff_catalog, apply_diff
+from models import db, User, Role, user_roles
+from principal_cache import principal_cache
+from resource_versions import touch_users
+
+logger = logging.getLogger(__name__)
+
+# Revision matching databases created with db.create_all() before migrations
+BASELINE_REVISION = '0001_initial_schema'
+# Last revision create_all() could have built, once the listing indexes existed.
+# Later migrations add tables, Postgres partitioning and data fixes that
+# create_all() never ran, so such databases must still upgrade through them.
+CREATE_ALL_REVISION = '0003_audit_log_indexes'
+
+
+def migrate_schema():
+    """Bring the schema to the latest migration.
+
+    A database created by the old create_all() startup hook has the tables
+    but no alembic_version; it is stamped first, at the baseline revision,
+    or at CREATE_ALL_REVISION when create_all() already built the listing
+    indexes.
+    """
+    from flask_migrate import stamp, upgrade
+
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    if 'users' in tables and 'alembic_version' not in tables:
+        indexes = {index['name'] for index in inspector.get_indexes('users')}
+        stamp(revision=CREATE_ALL_REVISION if 'ix_users_created_at_id' in indexes else BASELINE_REVISION)
+    upgrade()
+
+
+def seed(admin_email, admin_password, catalog=None):
+    """Sync the permission catalog and create the admin user if missing.
+
+    Catalog changes are computed as one diff (see catalog.diff_catalog) and
+    written with bulk upserts; everything is committed in a single
+    transaction, so running it again is a no-op. Nothing is pruned, and an
+    existing admin keeps its password. Returns `(diff, admin_created)`.
+    """
+    if catalog is None:
+        catalog = load_catalog()
+    diff = diff_catalog(catalog)
+    apply_diff(diff)
+
+    admin_role_id = db.session.execute(select(Role.id).where(Role.name == 'admin')).scalar()
+    admin_id = db.session.execute(select(User.id).where(User.email == admin_email)).scalar()
+    admin_created = admin_id is None
+    if admin_created:
+        admin = User(
+            email=admin_email,
+            first_name='Admin',
+            last_name='User',
+            is_active=True,
+            is_admin=True,
+            role='admin'
+        )
+        admin.set_password(admin_password)
+        db.session.add(admin)
+        db.session.flush()
+        admin_id = admin.id
+    has_admin_role = db.session.execute(
+        select(user_roles.c.user_id).where(user_roles.c.user_id == admin_id, user_roles.c.role_id == admin_role_id)
+    ).first()
+    grant_admin_role = admin_role_id is not None and not has_admin_role
+    if grant_admin_role:
+        db.session.execute(user_roles.insert(), [{'user_id': admin_id, 'role_id': admin_role_id}])
+        touch_users(User.id == admin_id)
+
+    db.session.commit()
+    if diff:
+        principal_cache.bump_roles()
+    logger.info('Seeded %s', diff.summary())
+    return diff, admin_created
@@ -0,0 +1,270 @@
+import datetime
+import json
+import os
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import select, update, bindparam
+
+from models import db, Role, Permission, role_permissions, reserve_permission_bits
+from permission_bits import permission_bits
+from principal_cache import principal_cache
+from resource_versions import bump_versions, ROLES, PERMISSIONS
+from role_hierarchy import add_closure_self_rows
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'permissions.json')
+
+CatalogPermission = namedtuple('CatalogPermission', ['name', 'resource', 'action', 'description'])
+CatalogRole = namedtuple('CatalogRole', ['name', 'description', 'grants'])
+Catalog = namedtuple('Catalog', ['permissions', 'roles'])
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class CatalogDiff:
+    """Changes needed to bring the database in line with a catalog"""
+
+    def __init__(self):
+        self.permissions_created = []
+        self.permissions_updated = []
+        self.permissions_removed = []
+        self.roles_created = []
+        self.roles_updated = []
+        self.grants_added = []
+        self.grants_revoked = []
+        # Rows and ids the diff was computed from, used by apply_diff
+        self._permission_rows = []
+        self._role_rows = []
+        self._grant_rows = []
+        self._revoke = {}
+        self._remove_ids = []
+        self._new_role_ids = []
+
+    def summary(self):
+        return {
+            'permissions_created': self.permissions_created,
+            'permissions_updated': self.permissions_updated,
+            'permissions_removed': self.permissions_removed,
+            'roles_created': self.roles_created,
+            'roles_updated': self.roles_updated,
+            'grants_added': self.grants_added,
+            'grants_revoked': self.grants_revoked
+        }
+
+    def __bool__(self):
+        return any(self.summary().values())
+
+
+def _expand_grants(role_name, grants, permissions):
+    names = set()
+    for grant in grants:
+        if grant == '*':
+            names.update(permissions)
+            continue
+        resource, _, action = grant.partition(':')
+        if action == '*':
+            matched = {name for name, p in permissions.items() if p.resource == resource}
+        else:
+            matched = {grant} if grant in permissions else set()
+        if not matched:
+            raise CatalogError(f'role {role_name} grants unknown permission {grant}')
+        names.update(matched)
+    return frozenset(names)
+
+
+def parse_catalog(manifest):
+    """Build a Catalog from a manifest of resources/actions and role grants.
+
+    `grants` entries are permission names, `resource:*` or `*` for every
+    permission in the catalog.
+    """
+    permissions = {}
+    for resource, actions in manifest.get('resources', {}).items():
+        for action, description in actions.items():
+            name = f'{resource}:{action}'
+            permissions[name] = CatalogPermission(name, resource, action, description)
+
+    roles = {}
+    for name, spec in manifest.get('roles', {}).items():
+        grants = _expand_grants(name, spec.get('grants', []), permissions)
+        roles[name] = CatalogRole(name, spec.get('description'), grants)
+    return Catalog(permissions, roles)
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    with open(path, encoding='utf-8') as manifest:
+        return parse_catalog(json.load(manifest))
+
+
+def diff_catalog(catalog, prune=False):
+    """Compare the catalog with the database in three queries.
+
+    Catalog permissions and roles are created or updated and missing grants
+    added. With `prune`, grants on catalog roles that the catalog does not
+    list are revoked, and permissions on catalog resources that the catalog
+    no longer declares are removed; permissions on other resources are
+    never touched.
+    """
+    diff = CatalogDiff()
+    now = datetime.datetime.utcnow()
+    resources = {p.resource for p in catalog.permissions.values()}
+
+    existing = {
+        row.name: row for row in db.session.execute(
+            select(Permission.id, Permission.name, Permission.resource, Permission.action, Permission.description, Permission.bit)
+            .where(Permission.name.in_(list(catalog.permissions)) | Permission.resource.in_(list(resources)))
+        )
+    }
+    permission_ids = {}
+    for name, permission in catalog.permissions.items():
+        row = existing.get(name)
+        if row is None:
+            permission_ids[name] = uuid.uuid4()
+            bit = None
+            diff.permissions_created.append(name)
+        else:
+            permission_ids[name] = row.id
+            bit = row.bit
+            if (row.resource, row.action, row.description) == (permission.resource, permission.action, permission.description):
+                continue
+            diff.permissions_updated.append(name)
+        diff._permission_rows.append({
+            'id': permission_ids[name], 'name': name, 'resource': permission.resource,
+            'action': permission.action, 'description': permission.description, 'bit': bit, 'created_at': now
+        })
+    # New permissions take the next free bits; existing ones keep theirs
+    if diff.permissions_created:
+        next_bit = reserve_permission_bits(db.session.connection(), len(diff.permissions_created))
+        for row in diff._permission_rows:
+            if row['bit'] is None:
+                row['bit'] = next_bit
+                next_bit += 1
+    if prune:
+        for name, row in existing.items():
+            if name not in catalog.permissions and row.resource in resources:
+                diff.permissions_removed.append(name)
+                diff._remove_ids.append(row.id)
+
+    existing_roles = {
+        row.name: row for row in db.session.execute(
+            select(Role.id, Role.name, Role.description, Role.is_system_role)
+            .where(Role.name.in_(list(catalog.roles)))
+        )
+    }
+    role_ids = {}
+    for name, role in catalog.roles.items():
+        row = existing_roles.get(name)
+        if row is None:
+            role_ids[name] = uuid.uuid4()
+            diff.roles_created.append(name)
+            diff._new_role_ids.append(role_ids[name])
+        else:
+            role_ids[name] = row.id
+            if (row.description, row.is_system_role) == (role.description, True):
+                continue
+            diff.roles_updated.append(name)
+        diff._role_rows.append({
+            'id': role_ids[name], 'name': name, 'description': role.description,
+            'is_system_role': True, 'created_at': now, 'updated_at': now
+        })
+
+    granted = {}
+    names_by_id = {row.id: name for name, row in existing.items()}
+    for role_id, permission_id in db.session.execute(
+        select(role_permissions.c.role_id, role_permissions.c.permission_id)
+        .where(role_permissions.c.role_id.in_(list(role_ids.values())))
+    ):
+        granted.setdefault(role_id, set()).add(permission_id)
+
+    for name, role in catalog.roles.items():
+        current = granted.get(role_ids[name], set())
+        for permission_name in sorted(role.grants):
+            if permission_ids[permission_name] not in current:
+                diff.grants_added.append(f'{name} {permission_name}')
+                diff._grant_rows.append({'role_id': role_ids[name], 'permission_id': permission_ids[permission_name]})
+        if prune:
+            wanted = {permission_ids[permission_name] for permission_name in role.grants}
+            extra = current - wanted
+            if extra:
+                diff._revoke[role_ids[name]] = list(extra)
+                diff.grants_revoked.extend(
+                    f'{name} {names_by_id.get(permission_id, permission_id)}' for permission_id in extra
+                )
+    return diff
+
+
+def _upsert(model, rows, update_columns):
+    """Insert `rows`, updating `update_columns` where the name already exists"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        statement = insert(model.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['name'],
+            set_={column: statement.excluded[column] for column in update_columns}
+        )
+        db.session.execute(statement, rows)
+        return
+
+    # Without ON CONFLICT, split into a multi-row insert and an executemany update
+    existing = set(db.session.execute(
+        select(model.name).where(model.name.in_([row['name'] for row in rows]))
+    ).scalars())
+    new_rows = [row for row in rows if row['name'] not in existing]
+    if new_rows:
+        db.session.execute(model.__table__.insert(), new_rows)
+    changed = [
+        dict({column: row[column] for column in update_columns}, b_name=row['name'])
+        for row in rows if row['name'] in existing
+    ]
+    if changed:
+        db.session.execute(
+            update(model.__table__)
+            .where(model.__table__.c.name == bindparam('b_name'))
+            .values({column: bindparam(column) for column in update_columns}),
+            changed
+        )
+
+
+def apply_diff(diff):
+    """Write a computed diff; the caller commits"""
+    if diff._permission_rows:
+        _upsert(Permission, diff._permission_rows, ['resource', 'action', 'description'])
+        permission_bits.invalidate()
+    if diff._role_rows:
+        _upsert(Role, diff._role_rows, ['description', 'is_system_role', 'updated_at'])
+        add_closure_self_rows(diff._new_role_ids)
+    if diff._grant_rows:
+        db.session.execute(role_permissions.insert(), diff._grant_rows)
+    for role_id, permission_ids in diff._revoke.items():
+        db.session.execute(role_permissions.delete().where(
+            role_permissions.c.role_id == role_id,
+            role_permissions.c.permission_id.in_(permission_ids)
+        ))
+    if diff._remove_ids:
+        db.session.execute(role_permissions.delete().where(role_permissions.c.permission_id.in_(diff._remove_ids)))
+        db.session.execute(Permission.__table__.delete().where(Permission.id.in_(diff._remove_ids)))
+    if diff._permission_rows or diff._remove_ids:
+        bump_versions(PERMISSIONS)
+    if diff._role_rows or diff._grant_rows or diff._revoke:
+        bump_versions(ROLES)
+
+
+def sync_catalog(catalog, prune=False, dry_run=False):
+    """Diff the catalog against the database and, unless `dry_run`, apply and commit it"""
+    diff = diff_catalog(catalog, prune=prune)
+    if dry_run or not diff:
+        db.session.rollback()
+        return diff
+    apply_diff(diff)
+    db.session.commit()
+    principal_cache.bump_roles()
+    return diff
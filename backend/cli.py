@@ -0,0 +1,102 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from audit_partitions import ensure_partitions, apply_retention
+from bootstrap import migrate_schema, seed
+from catalog import load_catalog, sync_catalog, DEFAULT_CATALOG_PATH
+from hashing import calibrate, MIN_ROUNDS, MAX_ROUNDS
+from tokens import generate_private_key
+
+# `flask ixion <command>` maintenance commands, meant for deploy hooks and cron
+ixion_cli = AppGroup('ixion', help='Ixion maintenance commands.')
+
+
+@ixion_cli.command('bootstrap')
+@click.option('--skip-migrate', is_flag=True, help='Seed without running schema migrations.')
+def bootstrap_command(skip_migrate):
+    """Migrate the schema and seed default roles, permissions and the admin user."""
+    if not skip_migrate:
+        migrate_schema()
+    diff, admin_created = seed(current_app.config['ADMIN_EMAIL'], current_app.config['ADMIN_PASSWORD'])
+    if not diff and not admin_created:
+        click.echo('Database already bootstrapped.')
+    _echo_diff(diff)
+    if admin_created:
+        click.echo(f'Created admin user {current_app.config["ADMIN_EMAIL"]}')
+    ensure_partitions()
+
+
+@ixion_cli.command('sync-permissions')
+@click.option('--catalog', 'path', default=DEFAULT_CATALOG_PATH, show_default=True, help='Permission catalog manifest.')
+@click.option('--prune', is_flag=True, help='Also revoke unlisted grants and remove undeclared permissions on catalog resources.')
+@click.option('--dry-run', is_flag=True, help='Report the changes without applying them.')
+def sync_permissions_command(path, prune, dry_run):
+    """Sync permissions, roles and grants with the catalog manifest."""
+    diff = sync_catalog(load_catalog(path), prune=prune, dry_run=dry_run)
+    if not diff:
+        click.echo('Permissions are in sync with the catalog.')
+    _echo_diff(diff)
+    if diff and dry_run:
+        click.echo('Dry run; nothing was changed.')
+
+
+def _echo_diff(diff):
+    for change, names in diff.summary().items():
+        for name in names:
+            click.echo(f'{change.replace("_", " ")}: {name}')
+
+
+@ixion_cli.command('audit-partitions')
+@click.option('--months-ahead', default=2, show_default=True, help='Future months to pre-create.')
+def audit_partitions_command(months_ahead):
+    """Create upcoming monthly audit log partitions."""
+    created = ensure_partitions(months_ahead=months_ahead)
+    if not created:
+        click.echo('Audit log partitions are up to date.')
+    for name in created:
+        click.echo(f'Created partition {name}')
+
+
+@ixion_cli.command('audit-retention')
+@click.option('--months', type=int, default=None, help='Months of audit history to keep online.')
+@click.option('--archive-dir', default=None, help='Directory for compressed NDJSON archives.')
+def audit_retention_command(months, archive_dir):
+    """Archive and drop audit log partitions older than the retention window."""
+    if months is None:
+        months = current_app.config['AUDIT_RETENTION_MONTHS']
+    if archive_dir is None:
+        archive_dir = current_app.config['AUDIT_ARCHIVE_DIR']
+
+    ensure_partitions()
+    archived = apply_retention(months, archive_dir)
+    if not archived:
+        click.echo('No audit log partitions past retention.')
+    for name, path, count in archived:
+        click.echo(f'Archived {count} rows from {name} to {path}')
+
+
+@ixion_cli.command('calibrate-hash')
+@click.option('--target-ms', default=250.0, show_default=True, help='Target password verify latency.')
+@click.option('--max-rounds', default=MAX_ROUNDS, show_default=True, help='Highest bcrypt cost to try.')
+def calibrate_hash_command(target_ms, max_rounds):
+    """Benchmark bcrypt on this host and recommend HASH_ROUNDS."""
+    rounds, timings = calibrate(target_ms, max_rounds=max_rounds)
+    for cost, elapsed in timings:
+        click.echo(f'cost {cost:2d}: {elapsed:8.1f} ms')
+    if timings[0][1] > target_ms:
+        click.echo(f'Even the minimum cost {MIN_ROUNDS} exceeds {target_ms:g} ms.')
+    click.echo(f'HASH_ROUNDS={rounds}  (currently {current_app.config["HASH_ROUNDS"]})')
+
+
+@ixion_cli.command('generate-signing-key')
+@click.option('--algorithm', type=click.Choice(['RS256', 'EdDSA']), default='EdDSA', show_default=True)
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def generate_signing_key_command(algorithm, path):
+    """Write a new private key for JWT_PRIVATE_KEYS to PATH."""
+    # Readable by the owner only, and never overwrite an existing key
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as key_file:
+        key_file.write(generate_private_key(algorithm))
+    click.echo(f'Wrote {algorithm} key to {path}; add it to JWT_PRIVATE_KEYS as <kid>:{path}')
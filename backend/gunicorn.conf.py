@@ -0,0 +1,19 @@
+# Loaded automatically by gunicorn from the working directory
+import os
+
+# Threaded workers, so requests waiting on password hashing do not hold a
+# whole process. Keep threads above HASH_WORKERS + HASH_QUEUE_SIZE (10 by
+# default): requests beyond that many hashes get a 503 with Retry-After
+# while the remaining threads keep serving everything else
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+
+def worker_exit(server, worker):
+    # Flush queued audit records before the worker process goes away
+    from audit import audit_sink
+    audit_sink.shutdown()
+    
+    # Stop this worker's password hashing processes
+    from hashing import password_hasher
+    password_hasher.shutdown()
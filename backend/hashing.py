@@ -0,0 +1,224 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+
+import bcrypt
+
+# bcrypt's own default cost; HASH_ROUNDS overrides it per deployment
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+SCHEME = '2b'
+# hash_many submits this many hashes per process at a time
+BULK_CHUNK = 4
+
+
+class HashingUnavailable(Exception):
+    """Raised when every hashing slot is taken; the request should be retried"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing is at capacity')
+        self.retry_after = retry_after
+
+
+# Module-level so the process pool can pickle them by reference
+def _hash_password(password, rounds=DEFAULT_ROUNDS):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify_password(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_parameters(password_hash):
+    """The (scheme, rounds) recorded in a bcrypt hash such as `$2b$12$...`"""
+    parts = password_hash.split('$')
+    if len(parts) != 4 or not parts[2].isdigit():
+        raise ValueError('not a bcrypt hash')
+    return parts[1], int(parts[2])
+
+
+def calibrate(target_ms, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS, samples=3):
+    """Pick the highest bcrypt cost whose verify time stays within `target_ms`.
+
+    Each extra round doubles the work, so the benchmark stops at the first
+    cost over the target. Returns `(rounds, timings)` where `timings` lists
+    `(rounds, milliseconds)` for every cost measured.
+    """
+    chosen = min_rounds
+    timings = []
+    for rounds in range(min_rounds, max_rounds + 1):
+        password_hash = _hash_password('calibration', rounds)
+        best = None
+        for _ in range(samples):
+            started = time.perf_counter()
+            _verify_password('calibration', password_hash)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append((rounds, best))
+        if best > target_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+class PasswordHasher:
+    """Runs bcrypt in a process pool behind a bounded admission gate.
+
+    At most `HASH_WORKERS` hashes run at once and `HASH_QUEUE_SIZE` more may
+    wait for a worker; anything beyond that raises HashingUnavailable at once
+    instead of queueing behind seconds of bcrypt work. With `HASH_WORKERS`
+    set to 0 hashing runs inline in the request, still behind the gate.
+    New hashes use the bcrypt cost `HASH_ROUNDS`, which bcrypt records in
+    the hash itself.
+
+    The gate is per process, so it only sheds load when a process serves
+    several requests at once; gunicorn.conf.py runs threaded workers with
+    more threads than HASH_WORKERS + HASH_QUEUE_SIZE for that reason.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.rounds = DEFAULT_ROUNDS
+        self.capacity = 1
+        self.retry_after = 1
+        self.timeout = None
+        self.rejected = 0
+        self._in_flight = 0
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HASH_WORKERS', 2)
+        app.config.setdefault('HASH_QUEUE_SIZE', 8)
+        app.config.setdefault('HASH_RETRY_AFTER', 1)
+        app.config.setdefault('HASH_TIMEOUT', 10)
+        app.config.setdefault('HASH_ROUNDS', DEFAULT_ROUNDS)
+        self.rounds = app.config['HASH_ROUNDS']
+        self.configure(
+            workers=app.config['HASH_WORKERS'],
+            queue_size=app.config['HASH_QUEUE_SIZE'],
+            retry_after=app.config['HASH_RETRY_AFTER'],
+            timeout=app.config['HASH_TIMEOUT']
+        )
+        app.extensions['password_hasher'] = self
+
+    def configure(self, workers, queue_size, retry_after=1, timeout=None):
+        self.shutdown()
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue_size
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.capacity)
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        return self._run(_verify_password, password, password_hash)
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords across every pool process.
+
+        The batch takes a single admission slot. Work is submitted a few
+        hashes per process at a time, so a login arriving mid-batch waits
+        behind one chunk rather than the whole batch.
+        """
+        with self._admit():
+            if self.workers == 0:
+                return [_hash_password(password, self.rounds) for password in passwords]
+            executor = self._get_executor()
+            step = self.workers * BULK_CHUNK
+            hashes = []
+            for start in range(0, len(passwords), step):
+                chunk = passwords[start:start + step]
+                hashes.extend(executor.map(_hash_password, chunk, [self.rounds] * len(chunk), chunksize=BULK_CHUNK))
+            return hashes
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with parameters other than the current policy"""
+        try:
+            scheme, rounds = hash_parameters(password_hash)
+        except ValueError:
+            return True
+        return scheme != SCHEME or rounds != self.rounds
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'rounds': self.rounds,
+            'capacity': self.capacity,
+            'in_flight': self._in_flight,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        # Pending tasks release their slots under the lock, so wait outside it
+        with self._lock:
+            executor = self._executor if self._pid == os.getpid() else None
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingUnavailable(self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def _admit(self):
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            with self._admit():
+                return fn(*args)
+
+        self._acquire()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot stays taken until the pool is done with the task, even
+        # when the request stops waiting, so the queue bound holds
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            raise HashingUnavailable(self.retry_after)
+
+    def _get_executor(self):
+        # A pool inherited across fork is unusable, so each worker builds its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+                atexit.register(self.shutdown)
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,31 @@
+"""Indexes for keyset-paginated, filtered user listing
+
+Revision ID: 0002_user_listing_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_user_listing_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_users_is_active_created_at_id', 'users', ['is_active', 'created_at', 'id'])
+    op.create_index('ix_users_is_admin_created_at_id', 'users', ['is_admin', 'created_at', 'id'])
+    op.create_index('ix_users_last_login', 'users', ['last_login'])
+    op.create_index('ix_user_roles_role_id_user_id', 'user_roles', ['role_id', 'user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_user_roles_role_id_user_id', table_name='user_roles')
+    op.drop_index('ix_users_last_login', table_name='users')
+    op.drop_index('ix_users_is_admin_created_at_id', table_name='users')
+    op.drop_index('ix_users_is_active_created_at_id', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
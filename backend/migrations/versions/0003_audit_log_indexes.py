@@ -0,0 +1,38 @@
+"""Indexes for filtered, keyset-paginated audit log queries
+
+Revision ID: 0003_audit_log_indexes
+Revises: 0002_user_listing_indexes
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_audit_log_indexes'
+down_revision = '0002_user_listing_indexes'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_audit_logs_timestamp_id', [sa.text('timestamp DESC'), sa.text('id DESC')]),
+    ('ix_audit_logs_user_id_timestamp', ['user_id', 'timestamp', 'id']),
+    ('ix_audit_logs_resource_timestamp', ['resource_type', 'resource_id', 'timestamp']),
+    ('ix_audit_logs_action_timestamp', ['action', 'timestamp']),
+    ('ix_audit_logs_ip_address_timestamp', ['ip_address', 'timestamp']),
+]
+
+
+def upgrade():
+    # audit_logs is large and hot; on Postgres build the indexes without
+    # blocking writes, which has to happen outside a transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'audit_logs', columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='audit_logs', postgresql_concurrently=True)
@@ -0,0 +1,122 @@
+"""Partition audit_logs by month on Postgres
+
+Revision ID: 0004_partition_audit_logs
+Revises: 0003_audit_log_indexes
+Create Date: 2026-10-17 00:00:00
+
+The table becomes a range-partitioned parent keyed on `timestamp` with one
+partition per month named audit_logs_pYYYY_MM, plus a default partition for
+rows outside every range. The primary key has to include the partition key,
+so it becomes (id, timestamp). Other databases keep the plain table.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_partition_audit_logs'
+down_revision = '0003_audit_log_indexes'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_audit_logs_timestamp_id', 'timestamp DESC, id DESC'),
+    ('ix_audit_logs_user_id_timestamp', 'user_id, timestamp, id'),
+    ('ix_audit_logs_resource_timestamp', 'resource_type, resource_id, timestamp'),
+    ('ix_audit_logs_action_timestamp', 'action, timestamp'),
+    ('ix_audit_logs_ip_address_timestamp', 'ip_address, timestamp'),
+]
+
+COLUMNS = 'id, user_id, action, resource_type, resource_id, details, ip_address, user_agent, timestamp'
+
+
+def _drop_indexes():
+    for name, _ in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def _create_indexes():
+    for name, columns in INDEXES:
+        op.execute(f'CREATE INDEX {name} ON audit_logs ({columns})')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned')
+    op.execute('ALTER TABLE audit_logs_unpartitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_unpartitioned_pkey')
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id UUID NOT NULL,
+            user_id UUID REFERENCES users (id),
+            action VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50),
+            resource_id VARCHAR(50),
+            details TEXT,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(255),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    # One partition per month from the oldest existing row through two
+    # months ahead; `flask ixion audit-partitions` keeps creating new ones
+    op.execute("""
+        DO $$
+        DECLARE
+            month DATE;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', COALESCE((SELECT min(timestamp) FROM audit_logs_unpartitioned), now())),
+                    date_trunc('month', now()) + INTERVAL '2 months',
+                    INTERVAL '1 month'
+                )::DATE
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    'audit_logs_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    (month + INTERVAL '1 month')::DATE
+                );
+            END LOOP;
+        END $$
+    """)
+
+    op.execute(f"""
+        INSERT INTO audit_logs ({COLUMNS})
+        SELECT id, user_id, action, resource_type, resource_id, details, ip_address, user_agent,
+               COALESCE(timestamp, now() AT TIME ZONE 'utc')
+        FROM audit_logs_unpartitioned
+    """)
+    op.execute('DROP TABLE audit_logs_unpartitioned')
+    _create_indexes()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+    op.execute('ALTER TABLE audit_logs_partitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_partitioned_pkey')
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id UUID PRIMARY KEY,
+            user_id UUID REFERENCES users (id),
+            action VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50),
+            resource_id VARCHAR(50),
+            details TEXT,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(255),
+            timestamp TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute(f'INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_partitioned')
+    op.execute('DROP TABLE audit_logs_partitioned')
+    _create_indexes()
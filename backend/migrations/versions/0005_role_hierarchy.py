@@ -0,0 +1,50 @@
+"""Role inheritance edges and their transitive closure
+
+Revision ID: 0005_role_hierarchy
+Revises: 0004_partition_audit_logs
+Create Date: 2026-10-17 00:00:00
+
+Every existing role gets its depth-0 row in role_closure, so effective
+permission lookups keep returning each role's own grants.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_role_hierarchy'
+down_revision = '0004_partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('role_parents',
+    sa.Column('child_id', sa.UUID(), nullable=False),
+    sa.Column('parent_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['child_id'], ['roles.id'], ),
+    sa.ForeignKeyConstraint(['parent_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('child_id', 'parent_id')
+    )
+    op.create_index('ix_role_parents_parent_id', 'role_parents', ['parent_id'])
+
+    op.create_table('role_closure',
+    sa.Column('ancestor_id', sa.UUID(), nullable=False),
+    sa.Column('descendant_id', sa.UUID(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['roles.id'], ),
+    sa.ForeignKeyConstraint(['descendant_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_role_closure_descendant_id_ancestor_id', 'role_closure', ['descendant_id', 'ancestor_id'])
+    op.execute('INSERT INTO role_closure (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM roles')
+
+    op.create_index('ix_role_permissions_role_id_permission_id', 'role_permissions', ['role_id', 'permission_id'])
+
+
+def downgrade():
+    op.drop_index('ix_role_permissions_role_id_permission_id', table_name='role_permissions')
+    op.drop_index('ix_role_closure_descendant_id_ancestor_id', table_name='role_closure')
+    op.drop_table('role_closure')
+    op.drop_index('ix_role_parents_parent_id', table_name='role_parents')
+    op.drop_table('role_parents')
@@ -0,0 +1,47 @@
+"""Stable bit index per permission for bitmask permission sets
+
+Revision ID: 0006_permission_bits
+Revises: 0005_role_hierarchy
+Create Date: 2026-10-17 00:00:00
+
+Existing permissions are numbered from 0 in creation order, and
+permission_catalog records the next free bit.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_permission_bits'
+down_revision = '0005_role_hierarchy'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('permissions', sa.Column('bit', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE permissions SET bit = (
+            SELECT ranked.n FROM (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY created_at, name) - 1 AS n FROM permissions
+            ) AS ranked
+            WHERE ranked.id = permissions.id
+        )
+    """)
+    with op.batch_alter_table('permissions') as batch_op:
+        batch_op.alter_column('bit', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_unique_constraint('permissions_bit_key', ['bit'])
+
+    op.create_table('permission_catalog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO permission_catalog (id, version) SELECT 1, COALESCE(MAX(bit) + 1, 0) FROM permissions')
+
+
+def downgrade():
+    op.drop_table('permission_catalog')
+    with op.batch_alter_table('permissions') as batch_op:
+        batch_op.drop_constraint('permissions_bit_key', type_='unique')
+        batch_op.drop_column('bit')
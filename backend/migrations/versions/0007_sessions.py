@@ -0,0 +1,49 @@
+"""Sessions with refresh tokens and the revocation log
+
+Revision ID: 0007_sessions
+Revises: 0006_permission_bits
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_sessions'
+down_revision = '0006_permission_bits'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sessions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('refresh_hash', sa.String(length=64), nullable=False),
+    sa.Column('previous_refresh_hash', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('user_agent', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sessions_user_id', 'sessions', ['user_id'])
+
+    op.create_table('session_revocations',
+    sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('session_id', sa.UUID(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+    op.create_index('ix_session_revocations_expires_at', 'session_revocations', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_session_revocations_expires_at', table_name='session_revocations')
+    op.drop_table('session_revocations')
+    op.drop_index('ix_sessions_user_id', table_name='sessions')
+    op.drop_table('sessions')
@@ -0,0 +1,30 @@
+"""Version counters for conditional GETs on roles, permissions and users
+
+Revision ID: 0008_resource_versions
+Revises: 0007_sessions
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_resource_versions'
+down_revision = '0007_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO resource_versions (name, version) VALUES ('roles', 1), ('permissions', 1)")
+    op.add_column('users', sa.Column('version', sa.BigInteger(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('users', 'version')
+    op.drop_table('resource_versions')
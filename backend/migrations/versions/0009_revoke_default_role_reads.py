@@ -0,0 +1,32 @@
+"""Revoke role:list and role:read from the default user role
+
+Revision ID: 0009_revoke_default_role_reads
+Revises: 0008_resource_versions
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_revoke_default_role_reads'
+down_revision = '0008_resource_versions'
+branch_labels = None
+depends_on = None
+
+USER_ROLE = "(SELECT id FROM roles WHERE name = 'user')"
+ROLE_READS = "(SELECT id FROM permissions WHERE name IN ('role:list', 'role:read'))"
+
+
+def upgrade():
+    # The role routes now authorize by permission instead of admin, so these
+    # seeded grants would let every user read all roles
+    op.execute(f"DELETE FROM role_permissions WHERE role_id IN {USER_ROLE} AND permission_id IN {ROLE_READS}")
+    op.execute("UPDATE resource_versions SET version = version + 1 WHERE name = 'roles'")
+
+
+def downgrade():
+    op.execute(
+        "INSERT INTO role_permissions (role_id, permission_id) "
+        f"SELECT r.id, p.id FROM roles r, permissions p WHERE r.id IN {USER_ROLE} AND p.id IN {ROLE_READS}"
+    )
+    op.execute("UPDATE resource_versions SET version = version + 1 WHERE name = 'roles'")
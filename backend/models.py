@@ -1,21 +1,32 @@
-import os
 import datetime
 import uuid
-import jwt
 import bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import UUID
 
+from hashing import password_hasher
+from tokens import token_service
+
 db = SQLAlchemy()
 
 # User-Role association table for many-to-many relationship
 user_roles = db.Table('user_roles',
     db.Column('user_id', UUID(as_uuid=True), db.ForeignKey('users.id')),
-    db.Column('role_id', UUID(as_uuid=True), db.ForeignKey('roles.id'))
+    db.Column('role_id', UUID(as_uuid=True), db.ForeignKey('roles.id')),
+    # Supports filtering users by role
+    db.Index('ix_user_roles_role_id_user_id', 'role_id', 'user_id')
 )
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), optionally narrowed by flag
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+        db.Index('ix_users_is_active_created_at_id', 'is_active', 'created_at', 'id'),
+        db.Index('ix_users_is_admin_created_at_id', 'is_admin', 'created_at', 'id'),
+        db.Index('ix_users_last_login', 'last_login'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -28,15 +39,19 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
+    # Counter for ETags, advanced in SQL by every UPDATE of the row
+    version = db.Column(db.BigInteger, nullable=False, default=1, server_default='1',
+                        onupdate=db.text('version + 1'))
     
     # Relationships
     roles = db.relationship('Role', secondary=user_roles, backref=db.backref('users', lazy='dynamic'))
     audit_logs = db.relationship('AuditLog', backref='user', lazy='dynamic')
     access_requests = db.relationship('AccessRequest', backref='requester', foreign_keys='AccessRequest.requester_id', lazy='dynamic')
     approved_requests = db.relationship('AccessRequest', backref='approver', foreign_keys='AccessRequest.approver_id', lazy='dynamic')
+    sessions = db.relationship('UserSession', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=password_hasher.rounds)).decode('utf-8')
     
     def check_password(self, password):
         return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
@@ -57,13 +72,13 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.email}>'
     
-    def generate_auth_token(self, expiration=3600):
+    def generate_auth_token(self, expiration=3600, claims=None):
         """Generate a JWT token for the user with their permissions"""
-        # Get all permissions from all roles
-        permissions = []
-        for role in self.roles:
-            for permission in role.permissions:
-                permissions.append(permission.name)
+        # Effective permissions of all roles, inherited ones included, as a
+        # bitmask; the catalog version tells verifiers which bit map to use
+        from permission_bits import permission_bits, encode_mask
+        from role_hierarchy import user_permission_mask
+        mask = user_permission_mask(self.id)
                 
         payload = {
             'user_id': str(self.id),
@@ -71,10 +86,12 @@ class User(db.Model):
             'role': self.role,  # Legacy field
             'roles': [role.name for role in self.roles],
             'is_admin': self.is_admin,
-            'permissions': list(set(permissions)),  # Remove duplicates
+            'permission_mask': encode_mask(mask),
+            'catalog_version': permission_bits.version,
             'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=expiration)
         }
-        return jwt.encode(payload, os.getenv('JWT_SECRET', 'fallback_secret_here'), algorithm='HS256')
+        payload.update(claims or {})
+        return token_service.encode(payload)
 
 class Role(db.Model):
     __tablename__ = 'roles'
@@ -88,6 +105,14 @@ class Role(db.Model):
     
     # Relationships
     permissions = db.relationship('Permission', secondary='role_permissions', backref=db.backref('roles', lazy='dynamic'))
+    # Read-only; edges are changed through role_hierarchy so role_closure stays in step
+    parents = db.relationship(
+        'Role',
+        secondary='role_parents',
+        primaryjoin='Role.id == role_parents.c.child_id',
+        secondaryjoin='Role.id == role_parents.c.parent_id',
+        viewonly=True
+    )
     
     def to_dict(self):
         return {
@@ -109,6 +134,8 @@ class Permission(db.Model):
     description = db.Column(db.String(200), nullable=True)
     resource = db.Column(db.String(50), nullable=False)
     action = db.Column(db.String(50), nullable=False)
+    # Position in permission bitmasks; assigned on insert and never reused
+    bit = db.Column(db.Integer, unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
     def to_dict(self):
@@ -117,7 +144,8 @@ class Permission(db.Model):
             'name': self.name,
             'description': self.description,
             'resource': self.resource,
-            'action': self.action
+            'action': self.action,
+            'bit': self.bit
         }
         
     def __repr__(self):
@@ -126,10 +154,74 @@ class Permission(db.Model):
 # Association table for Role-Permission relationship
 role_permissions = db.Table('role_permissions',
     db.Column('role_id', UUID(as_uuid=True), db.ForeignKey('roles.id')),
-    db.Column('permission_id', UUID(as_uuid=True), db.ForeignKey('permissions.id'))
+    db.Column('permission_id', UUID(as_uuid=True), db.ForeignKey('permissions.id')),
+    # Effective permission lookups join on role_id
+    db.Index('ix_role_permissions_role_id_permission_id', 'role_id', 'permission_id')
+)
+
+# Role inheritance edges: a child role holds every permission of its parents
+role_parents = db.Table('role_parents',
+    db.Column('child_id', UUID(as_uuid=True), db.ForeignKey('roles.id'), primary_key=True),
+    db.Column('parent_id', UUID(as_uuid=True), db.ForeignKey('roles.id'), primary_key=True),
+    db.Index('ix_role_parents_parent_id', 'parent_id')
+)
+
+# Transitive closure of role_parents: one row per (ancestor, descendant)
+# pair, including every role paired with itself at depth 0. Maintained by
+# role_hierarchy.py; never written directly
+role_closure = db.Table('role_closure',
+    db.Column('ancestor_id', UUID(as_uuid=True), db.ForeignKey('roles.id'), primary_key=True),
+    db.Column('descendant_id', UUID(as_uuid=True), db.ForeignKey('roles.id'), primary_key=True),
+    db.Column('depth', db.Integer, nullable=False),
+    db.Index('ix_role_closure_descendant_id_ancestor_id', 'descendant_id', 'ancestor_id')
+)
+
+# Single row holding the next free Permission.bit. Bits of deleted
+# permissions are never handed out again, so the value doubles as the
+# catalog version carried in tokens
+permission_catalog = db.Table('permission_catalog',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('version', db.Integer, nullable=False)
 )
 
+def reserve_permission_bits(connection, count):
+    """Reserve `count` consecutive bits and return the first.
+
+    The UPDATE locks the row, so concurrent reservations never overlap.
+    """
+    reserved = connection.execute(
+        permission_catalog.update().where(permission_catalog.c.id == 1)
+        .values(version=permission_catalog.c.version + count)
+    ).rowcount
+    if reserved:
+        return connection.execute(db.select(permission_catalog.c.version)).scalar() - count
+    start = connection.execute(db.select(db.func.coalesce(db.func.max(Permission.bit) + 1, 0))).scalar()
+    connection.execute(permission_catalog.insert().values(id=1, version=start + count))
+    return start
+
+# One row per resource collection whose version is bumped in the same
+# transaction as every write to it; conditional GETs compare ETags built
+# from these without loading the resources themselves
+resource_versions = db.Table('resource_versions',
+    db.Column('name', db.String(50), primary_key=True),
+    db.Column('version', db.BigInteger, nullable=False)
+)
+
+@event.listens_for(db.session, 'before_flush')
+def _assign_permission_bits(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Permission) and obj.bit is None]
+    if new:
+        start = reserve_permission_bits(session.connection(), len(new))
+        for offset, permission in enumerate(new):
+            permission.bit = start + offset
+
+@event.listens_for(Role, 'after_insert')
+def _add_role_closure_self_row(mapper, connection, role):
+    connection.execute(role_closure.insert().values(ancestor_id=role.id, descendant_id=role.id, depth=0))
+
 class AuditLog(db.Model):
+    # On Postgres this is a parent table range-partitioned by month on
+    # `timestamp` (migration 0004); see audit_partitions.py for maintenance
     __tablename__ = 'audit_logs'
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -158,6 +250,59 @@ class AuditLog(db.Model):
     def __repr__(self):
         return f'<AuditLog {self.id}>'
 
+# Audit log listing is keyset-paginated newest first, optionally narrowed by
+# actor, resource, action or client address
+db.Index('ix_audit_logs_timestamp_id', AuditLog.timestamp.desc(), AuditLog.id.desc())
+db.Index('ix_audit_logs_user_id_timestamp', AuditLog.user_id, AuditLog.timestamp, AuditLog.id)
+db.Index('ix_audit_logs_resource_timestamp', AuditLog.resource_type, AuditLog.resource_id, AuditLog.timestamp)
+db.Index('ix_audit_logs_action_timestamp', AuditLog.action, AuditLog.timestamp)
+db.Index('ix_audit_logs_ip_address_timestamp', AuditLog.ip_address, AuditLog.timestamp)
+
+class UserSession(db.Model):
+    """A login: one refresh token, rotated on use, and the access tokens minted from it"""
+    __tablename__ = 'sessions'
+    __table_args__ = (
+        db.Index('ix_sessions_user_id', 'user_id'),
+    )
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    # SHA-256 of the current refresh token secret; the secret itself is never stored
+    refresh_hash = db.Column(db.String(64), nullable=False)
+    # Hash of the secret rotated out by the last refresh; presenting it again is a replay
+    previous_refresh_hash = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+    user_agent = db.Column(db.String(255), nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'ip_address': self.ip_address,
+            'user_agent': self.user_agent
+        }
+        
+    def __repr__(self):
+        return f'<UserSession {self.id}>'
+
+# Append-only log of revoked sessions that workers tail by `seq` to keep their
+# in-memory revocation filters current. A row can be pruned once `expires_at`
+# passes, as every access token of the session has expired by then.
+# AUTOINCREMENT keeps SQLite from reusing the seq of a pruned last row
+session_revocations = db.Table('session_revocations',
+    db.Column('seq', db.Integer, primary_key=True, autoincrement=True),
+    db.Column('session_id', UUID(as_uuid=True), nullable=False),
+    db.Column('expires_at', db.DateTime, nullable=False),
+    db.Index('ix_session_revocations_expires_at', 'expires_at'),
+    sqlite_autoincrement=True
+)
+
 class AccessRequest(db.Model):
     __tablename__ = 'access_requests'
     
@@ -0,0 +1,94 @@
+import base64
+import time
+
+from sqlalchemy import event, select
+
+from models import db, Permission, permission_catalog
+
+# Shortest gap between reloads triggered by an unknown permission name
+MISS_RELOAD_INTERVAL = 5
+
+
+def encode_mask(mask):
+    """Unpadded base64url of the mask's little-endian bytes"""
+    raw = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_mask(value):
+    raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+    return int.from_bytes(raw, 'little')
+
+
+def mask_of(bits):
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return mask
+
+
+class PermissionBits:
+    """Per-worker map between permission names and their bit indexes.
+
+    Bits are assigned on insert and never reused, so a loaded map only goes
+    stale by missing newer permissions. `version` is the catalog version
+    (the next free bit) when the map was loaded: a mask with a bit beyond
+    it, or a token minted under a newer version, reloads the map before it
+    is checked. Permission inserts and
+    deletes in this worker drop the map outright.
+    """
+
+    def __init__(self):
+        # (bits by name, names by bit, version, loaded_at), swapped as a whole
+        self._map = None
+
+    @property
+    def version(self):
+        return self._current()[2]
+
+    def load(self):
+        rows = db.session.execute(select(Permission.name, Permission.bit)).all()
+        names = {bit: name for name, bit in rows}
+        version = db.session.execute(select(permission_catalog.c.version)).scalar() or 0
+        self._map = (dict(rows), names, max(version, max(names, default=-1) + 1), time.monotonic())
+        return self._map
+
+    def _current(self, mask=0, version=0):
+        current = self._map
+        if current is None or mask.bit_length() > current[2] or version > current[2]:
+            current = self.load()
+        return current
+
+    def ensure(self, version):
+        """Reload unless the map covers catalog `version`"""
+        self._current(version=version)
+
+    def invalidate(self):
+        self._map = None
+
+    def bit(self, name, mask=0):
+        """Bit index of a permission, or None if it does not exist"""
+        bits, _, _, loaded_at = self._current(mask)
+        bit = bits.get(name)
+        if bit is None and time.monotonic() - loaded_at >= MISS_RELOAD_INTERVAL:
+            # Possibly created by another worker since the last load
+            bit = self.load()[0].get(name)
+        return bit
+
+    def test(self, mask, name):
+        """Check one permission against a mask with a single AND"""
+        bit = self.bit(name, mask)
+        return bit is not None and bool(mask & (1 << bit))
+
+    def names(self, mask):
+        _, names, _, _ = self._current(mask)
+        return {name for bit, name in names.items() if mask >> bit & 1}
+
+
+permission_bits = PermissionBits()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _permissions_changed(session, flush_context):
+    if any(isinstance(obj, Permission) for obj in (*session.new, *session.deleted)):
+        permission_bits.invalidate()
@@ -0,0 +1,188 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import select
+
+from models import db, User, Permission, user_roles, role_permissions, role_closure
+from permission_bits import mask_of
+from role_hierarchy import user_permission_mask
+
+# Immutable snapshot of the fields the auth layer needs from a user row.
+# Views only touch `id`, `email` and `is_admin` on `current_user`, so a
+# Principal can stand in for the ORM object. `permissions` is a bitmask
+# over Permission.bit; test it with permission_bits.test.
+Principal = namedtuple('Principal', ['id', 'email', 'is_active', 'is_admin', 'permissions'])
+
+
+class PrincipalCache:
+    """Per-worker LRU cache of Principal snapshots keyed by user id.
+
+    Entries expire after `ttl` seconds and are stamped with the user's version
+    and the global role version at load time. Bumping either version makes the
+    stale entry miss on its next lookup.
+    """
+
+    def __init__(self, ttl=30, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._user_versions = {}
+        self._role_version = 0
+        self._lock = threading.Lock()
+
+    def configure(self, ttl=None, max_size=None):
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if max_size is not None:
+                self.max_size = max_size
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def version(self, user_id):
+        """Return the version stamp a freshly loaded entry should carry"""
+        key = str(user_id)
+        with self._lock:
+            return (self._user_versions.get(key, 0), self._role_version)
+
+    def get(self, user_id):
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, stamp, expires_at = entry
+            current = (self._user_versions.get(key, 0), self._role_version)
+            if stamp != current or expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, user_id, principal, stamp):
+        key = str(user_id)
+        with self._lock:
+            # A version bump that raced with the load makes this snapshot stale
+            if stamp != (self._user_versions.get(key, 0), self._role_version):
+                return
+            self._entries[key] = (principal, stamp, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def bump_user(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            self._user_versions[key] = self._user_versions.get(key, 0) + 1
+            self._entries.pop(key, None)
+
+    def bump_roles(self):
+        with self._lock:
+            self._role_version += 1
+            self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache()
+
+
+def load_principal(user_id):
+    """Build a Principal from the database, bypassing the cache"""
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+
+    return Principal(
+        id=user.id,
+        email=user.email,
+        is_active=bool(user.is_active),
+        is_admin=bool(user.is_admin),
+        permissions=user_permission_mask(user.id)
+    )
+
+
+def get_principal(user_id):
+    """Return the cached Principal for a user, loading it on a miss"""
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        return None
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    stamp = principal_cache.version(user_id)
+    principal = load_principal(user_id)
+    if principal is not None:
+        principal_cache.put(user_id, principal, stamp)
+    return principal
+
+
+def load_principals(user_ids):
+    """Build Principals for many users in one query, bypassing the cache.
+
+    Users are outer-joined through user_roles, role_closure and
+    role_permissions, so users without permissions still come back.
+    Unknown ids are left out of the result.
+    """
+    if not user_ids:
+        return {}
+    rows = db.session.execute(
+        select(User.id, User.email, User.is_active, User.is_admin, Permission.bit)
+        .outerjoin(user_roles, user_roles.c.user_id == User.id)
+        .outerjoin(role_closure, role_closure.c.descendant_id == user_roles.c.role_id)
+        .outerjoin(role_permissions, role_permissions.c.role_id == role_closure.c.ancestor_id)
+        .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+        .where(User.id.in_(list(user_ids)))
+    )
+    users, permissions = {}, {}
+    for user_id, email, is_active, is_admin, bit in rows:
+        users[user_id] = (email, is_active, is_admin)
+        if bit is not None:
+            permissions.setdefault(user_id, set()).add(bit)
+
+    return {
+        user_id: Principal(
+            id=user_id,
+            email=email,
+            is_active=bool(is_active),
+            is_admin=bool(is_admin),
+            permissions=mask_of(permissions.get(user_id, ()))
+        )
+        for user_id, (email, is_active, is_admin) in users.items()
+    }
+
+
+def get_principals(user_ids):
+    """Return cached Principals for many users, loading all misses in one query.
+
+    Keys are the UUIDs of the users found; invalid or unknown ids are absent.
+    """
+    principals, stamps = {}, {}
+    for user_id in user_ids:
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            continue
+        if user_id in principals or user_id in stamps:
+            continue
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            principals[user_id] = principal
+        else:
+            stamps[user_id] = principal_cache.version(user_id)
+
+    for user_id, principal in load_principals(stamps).items():
+        principal_cache.put(user_id, principal, stamps[user_id])
+        principals[user_id] = principal
+    return principals
@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+
+import jwt
+from flask import request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+
+from tokens import token_service
+
+# Expired counters are purged once every this many writes per process
+PURGE_EVERY = 1000
+
+
+def _path_from_uri(uri):
+    # Same convention as SQLAlchemy: sqlite:///relative.db, sqlite:////abs.db
+    path = uri.split('://', 1)[1]
+    if path.startswith('/'):
+        path = path[1:]
+    if not path:
+        raise ValueError('sqlite rate limit storage needs a file path')
+    return path
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate limit counters in a SQLite file in WAL mode.
+
+    Every gunicorn worker on the host opens the same file, so limits are
+    counted once per host rather than once per worker, without running an
+    external service. Each check-and-increment runs in a `BEGIN IMMEDIATE`
+    transaction, which serializes it against the other workers.
+
+    Registered with `limits` as `sqlite:///path/to/file.db`.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        self.path = _path_from_uri(uri)
+        self.timeout = float(options.get('timeout', 5))
+        self._local = threading.local()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        # sqlite3 connections cannot cross threads or fork, so each thread of
+        # each worker keeps its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM rate_limits WHERE expires_at <= ?', (time.time(),))
+
+    def _get(self, conn, key, now):
+        row = conn.execute(
+            'SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _incr(self, conn, key, expiry, amount, now):
+        # An expired counter restarts from `amount` with a fresh expiry
+        conn.execute(
+            'INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END, '
+            'expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END',
+            (key, amount, now + expiry, now, now)
+        )
+        return self._get(conn, key, now)
+
+    def incr(self, key, expiry, amount=1):
+        with self._transaction() as conn:
+            return self._incr(conn, key, expiry, amount, time.time())
+
+    def get(self, key):
+        return self._get(self._connection(), key, time.time())
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM rate_limits').rowcount
+
+    def clear(self, key):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def _sliding_window(self, conn, previous_key, current_key, expiry, now):
+        previous_count = self._get(conn, previous_key, now)
+        current_count = self._get(conn, current_key, now)
+        if previous_count == 0:
+            previous_ttl = 0.0
+        else:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        with self._transaction() as conn:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                conn, previous_key, current_key, expiry, now
+            )
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            # Keep the counter for two windows so it can serve as the previous one
+            self._incr(conn, current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._sliding_window(self._connection(), previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM rate_limits WHERE key IN (?, ?)', (previous_key, current_key))
+
+
+def login_account_key():
+    """Rate limit key for the account a login attempt targets"""
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    if not isinstance(email, str) or not email.strip():
+        return f'ip:{get_remote_address()}'
+    return f'account:{email.strip().lower()}'
+
+
+def principal_key():
+    """Rate limit key for the calling user, or the client IP without a valid token.
+
+    Service endpoints are called by a few principals from a few addresses,
+    so a per-IP budget would throttle a whole gateway at once. Limit checks
+    run before the view, so the token is decoded here; verified tokens come
+    from the token cache.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            user_id = token_service.decode(header.split(' ', 1)[1]).get('user_id')
+        except jwt.InvalidTokenError:
+            user_id = None
+        if user_id:
+            return f'principal:{user_id}'
+    return f'ip:{get_remote_address()}'
+
+
+def login_failed(response):
+    """Only failed logins count towards the login limits"""
+    return response.status_code == 401
+
+
+limiter = Limiter(
+    get_remote_address,
+    default_limits=["200 per day", "50 per hour"],
+    strategy='sliding-window-counter',
+)
@@ -0,0 +1,100 @@
+import uuid
+
+from flask import request, make_response
+from sqlalchemy import select, update
+
+from models import db, resource_versions, User
+
+ROLES = 'roles'
+PERMISSIONS = 'permissions'
+
+
+def bump_versions(*names):
+    """Advance the versions of the named collections; the caller commits.
+
+    Call before the commit that writes to them, so the new version and the
+    new data become visible together. Each bump is a single upsert, so two
+    transactions creating a missing row cannot collide, and rows are locked
+    in name order, so transactions bumping several collections cannot
+    deadlock.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    for name in sorted(set(names)):
+        if insert is not None:
+            statement = insert(resource_versions).values(name=name, version=1)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['name'],
+                set_={'version': resource_versions.c.version + 1}
+            ))
+            continue
+        # Without ON CONFLICT, update and insert the row if it is missing
+        bumped = db.session.execute(
+            resource_versions.update().where(resource_versions.c.name == name)
+            .values(version=resource_versions.c.version + 1)
+        ).rowcount
+        if not bumped:
+            db.session.execute(resource_versions.insert().values(name=name, version=1))
+
+
+def touch_users(*criteria):
+    """Advance the version of every user matching `criteria`; the caller commits.
+
+    A user's version is its `version` counter, which any UPDATE of the row
+    advances. Writes that change what a user embeds without updating the row
+    itself, such as role memberships, call this instead.
+    """
+    db.session.execute(
+        update(User).where(*criteria).values(version=User.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def etag(*names):
+    """Strong ETag over the current versions of the named collections, in one query.
+
+    Read it before the resources: a write committed in between then yields
+    new data under an old tag, which only costs the client a refetch.
+    """
+    versions = dict(db.session.execute(
+        select(resource_versions.c.name, resource_versions.c.version)
+        .where(resource_versions.c.name.in_(names))
+    ).all())
+    return '-'.join(f'{name[0]}{versions.get(name, 0)}' for name in names)
+
+
+def user_etag(user_id):
+    """ETag for one user with its roles and permissions, or None if there is no such user.
+
+    Users are versioned one by one, so a login touching one user does not
+    invalidate the others.
+    """
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        return None
+    version = db.session.execute(select(User.version).where(User.id == user_id)).scalar()
+    if version is None:
+        return None
+    return f'u{version}-{etag(ROLES, PERMISSIONS)}'
+
+
+def not_modified(tag):
+    """304 response if the request's If-None-Match already holds `tag`, else None"""
+    if not request.if_none_match.contains_weak(tag):
+        return None
+    response = make_response('', 304)
+    return tagged(response, tag)
+
+
+def tagged(response, tag):
+    response.set_etag(tag)
+    # Cache, but revalidate on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import threading
+import time
+
+from sqlalchemy import select, or_
+
+from models import db, session_revocations
+
+# A seq missing from a refresh is re-read until it shows up (a transaction
+# that had not committed yet) or this many seconds pass (a rolled-back one)
+GAP_TIMEOUT = 60
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over session ids; no false negatives"""
+
+    def __init__(self, size_bits=1 << 20, hashes=4):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[8 * i:8 * i + 8], 'little') % self.size_bits
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationFilter:
+    """Per-worker view of revoked sessions, tailed from session_revocations.
+
+    A lookup checks a Bloom filter first and confirms hits against the
+    exact set, so the common case (a session that was never revoked) is a
+    few hashes. At most once every `refresh_interval` seconds a lookup
+    first reads the rows appended since the last seq it saw; no other
+    lookup touches the database. Entries are dropped once every access
+    token of their session has expired, and the Bloom filter is rebuilt
+    without them.
+    """
+
+    def __init__(self, refresh_interval=1.0, size_bits=1 << 20):
+        self.refresh_interval = refresh_interval
+        self.size_bits = size_bits
+        self._lock = threading.Lock()
+        self.reset()
+
+    def configure(self, refresh_interval=None, size_bits=None):
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        if size_bits is not None:
+            self.size_bits = size_bits
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._bloom = BloomFilter(self.size_bits)
+            self._revoked = {}
+            self._last_seq = 0
+            self._gaps = {}
+            self._refreshed_at = None
+
+    def add(self, session_id, expires_at):
+        """Record a revocation made by this worker without waiting for a refresh"""
+        key = str(session_id)
+        with self._lock:
+            self._revoked[key] = max(expires_at, self._revoked.get(key, expires_at))
+            self._bloom.add(key)
+
+    def refresh(self):
+        with self._lock:
+            last_seq, gaps = self._last_seq, list(self._gaps)
+        condition = session_revocations.c.seq > last_seq
+        if gaps:
+            condition = or_(condition, session_revocations.c.seq.in_(gaps))
+        rows = db.session.execute(
+            select(session_revocations.c.seq, session_revocations.c.session_id, session_revocations.c.expires_at)
+            .where(condition).order_by(session_revocations.c.seq)
+        ).all()
+
+        now = time.monotonic()
+        utcnow = datetime.datetime.utcnow()
+        with self._lock:
+            if self._refreshed_at is None and rows:
+                # Everything below the first seq read is already committed
+                self._last_seq = rows[0].seq - 1
+            for seq, session_id, expires_at in rows:
+                self._gaps.pop(seq, None)
+                if seq > self._last_seq:
+                    # Lower seqs not seen yet may belong to transactions still in flight
+                    for missing in range(self._last_seq + 1, seq):
+                        self._gaps.setdefault(missing, now)
+                    self._last_seq = seq
+                if expires_at > utcnow:
+                    key = str(session_id)
+                    self._revoked[key] = max(expires_at, self._revoked.get(key, expires_at))
+                    self._bloom.add(key)
+            self._gaps = {seq: seen for seq, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+
+            expired = [key for key, expires_at in self._revoked.items() if expires_at <= utcnow]
+            if expired:
+                for key in expired:
+                    del self._revoked[key]
+                self._bloom = BloomFilter(self.size_bits)
+                for key in self._revoked:
+                    self._bloom.add(key)
+            self._refreshed_at = now
+
+    def is_revoked(self, session_id):
+        refreshed_at = self._refreshed_at
+        if refreshed_at is None or time.monotonic() - refreshed_at >= self.refresh_interval:
+            self.refresh()
+        key = str(session_id)
+        return key in self._bloom and key in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revocation_filter = RevocationFilter()
@@ -0,0 +1,202 @@
+from sqlalchemy import select, text, tuple_
+
+from models import db, Permission, user_roles, role_permissions, role_parents, role_closure
+from permission_bits import mask_of
+
+
+# Key of the Postgres advisory lock serializing hierarchy writes
+HIERARCHY_LOCK_KEY = 0x726f6c65
+
+
+class RoleCycleError(ValueError):
+    """Raised when an inheritance edge would make a role its own ancestor"""
+
+
+def _lock_hierarchy():
+    """Serialize hierarchy writes until the transaction ends.
+
+    Two transactions can each pass the cycle check and together close a
+    cycle, so every edge change takes this lock before reading the closure.
+    On Postgres it is a transaction-scoped advisory lock; SQLite already
+    lets only one transaction write at a time.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': HIERARCHY_LOCK_KEY})
+
+
+def user_permission_mask(user_id):
+    """Bitmask of the user's effective permissions, in the same join"""
+    bits = db.session.execute(
+        select(Permission.bit).distinct()
+        .join(role_permissions, role_permissions.c.permission_id == Permission.id)
+        .join(role_closure, role_closure.c.ancestor_id == role_permissions.c.role_id)
+        .join(user_roles, user_roles.c.role_id == role_closure.c.descendant_id)
+        .where(user_roles.c.user_id == user_id)
+    ).scalars()
+    return mask_of(bits)
+
+
+def role_permissions_query(role_id):
+    """Query for the effective permissions of a role, inherited ones included"""
+    return Permission.query.join(
+        role_permissions, role_permissions.c.permission_id == Permission.id
+    ).join(
+        role_closure, role_closure.c.ancestor_id == role_permissions.c.role_id
+    ).filter(role_closure.c.descendant_id == role_id).distinct()
+
+
+def descendants(role_id):
+    """Ids of the role and every role inheriting from it"""
+    return set(db.session.execute(
+        select(role_closure.c.descendant_id).where(role_closure.c.ancestor_id == role_id)
+    ).scalars())
+
+
+def _check_cycle(child_id, parent_id):
+    # The edge closes a cycle exactly when the parent already inherits from the child
+    if child_id == parent_id or db.session.execute(
+        select(role_closure.c.depth).where(
+            role_closure.c.ancestor_id == child_id,
+            role_closure.c.descendant_id == parent_id
+        )
+    ).first():
+        raise RoleCycleError('Role inheritance cannot contain cycles')
+
+
+def _refresh_closure(role_ids):
+    """Recompute the closure rows of `role_ids` from role_parents.
+
+    Only rows whose descendant is in `role_ids` are touched; callers pass
+    the subtree below the edge that changed. Each role's ancestors are its
+    parents' ancestors one level further up, so only the edges into the
+    subtree and the closure rows of parents outside it are read. Depth is
+    the shortest path.
+    """
+    if not role_ids:
+        return
+    role_ids = set(role_ids)
+    parents = {}
+    for child_id, parent_id in db.session.execute(
+        select(role_parents.c.child_id, role_parents.c.parent_id)
+        .where(role_parents.c.child_id.in_(list(role_ids)))
+    ):
+        parents.setdefault(child_id, []).append(parent_id)
+
+    # Roles outside the subtree keep their closure rows, which are already right
+    outside = {parent_id for ids in parents.values() for parent_id in ids} - role_ids
+    ancestors = {}
+    if outside:
+        for ancestor_id, descendant_id, depth in db.session.execute(
+            select(role_closure.c.ancestor_id, role_closure.c.descendant_id, role_closure.c.depth)
+            .where(role_closure.c.descendant_id.in_(list(outside)))
+        ):
+            ancestors.setdefault(descendant_id, {})[ancestor_id] = depth
+
+    def resolve(role_id):
+        # The subtree is acyclic, so each role resolves after its parents
+        if role_id not in ancestors:
+            depths = {role_id: 0}
+            for parent_id in parents.get(role_id, ()):
+                for ancestor_id, depth in resolve(parent_id).items():
+                    if ancestor_id not in depths or depth + 1 < depths[ancestor_id]:
+                        depths[ancestor_id] = depth + 1
+            ancestors[role_id] = depths
+        return ancestors[role_id]
+
+    wanted = {}
+    for role_id in role_ids:
+        for ancestor_id, depth in resolve(role_id).items():
+            wanted[(ancestor_id, role_id)] = depth
+
+    existing = {
+        (ancestor_id, descendant_id): depth
+        for ancestor_id, descendant_id, depth in db.session.execute(
+            select(role_closure.c.ancestor_id, role_closure.c.descendant_id, role_closure.c.depth)
+            .where(role_closure.c.descendant_id.in_(list(role_ids)))
+        )
+    }
+
+    stale = [pair for pair, depth in existing.items() if wanted.get(pair) != depth]
+    if stale:
+        db.session.execute(role_closure.delete().where(
+            tuple_(role_closure.c.ancestor_id, role_closure.c.descendant_id).in_(stale)
+        ))
+    fresh = [
+        {'ancestor_id': ancestor_id, 'descendant_id': descendant_id, 'depth': depth}
+        for (ancestor_id, descendant_id), depth in wanted.items()
+        if existing.get((ancestor_id, descendant_id)) != depth
+    ]
+    if fresh:
+        db.session.execute(role_closure.insert(), fresh)
+
+
+def add_parent(child_id, parent_id):
+    """Make `child_id` inherit from `parent_id`; a no-op if it already does directly"""
+    _lock_hierarchy()
+    _check_cycle(child_id, parent_id)
+    exists = db.session.execute(
+        select(role_parents.c.child_id).where(
+            role_parents.c.child_id == child_id,
+            role_parents.c.parent_id == parent_id
+        )
+    ).first()
+    if exists:
+        return False
+    db.session.execute(role_parents.insert().values(child_id=child_id, parent_id=parent_id))
+    _refresh_closure(descendants(child_id))
+    return True
+
+
+def remove_parent(child_id, parent_id):
+    _lock_hierarchy()
+    removed = db.session.execute(role_parents.delete().where(
+        role_parents.c.child_id == child_id,
+        role_parents.c.parent_id == parent_id
+    )).rowcount
+    if removed:
+        _refresh_closure(descendants(child_id))
+    return bool(removed)
+
+
+def set_parents(child_id, parent_ids):
+    """Replace the direct parents of a role, rejecting any edge that closes a cycle"""
+    parent_ids = set(parent_ids)
+    _lock_hierarchy()
+    for parent_id in parent_ids:
+        _check_cycle(child_id, parent_id)
+    current = set(db.session.execute(
+        select(role_parents.c.parent_id).where(role_parents.c.child_id == child_id)
+    ).scalars())
+    if current == parent_ids:
+        return
+    if current - parent_ids:
+        db.session.execute(role_parents.delete().where(
+            role_parents.c.child_id == child_id,
+            role_parents.c.parent_id.in_(list(current - parent_ids))
+        ))
+    if parent_ids - current:
+        db.session.execute(role_parents.insert(), [
+            {'child_id': child_id, 'parent_id': parent_id} for parent_id in parent_ids - current
+        ])
+    _refresh_closure(descendants(child_id))
+
+
+def detach_role(role_id):
+    """Remove a role from the hierarchy before it is deleted"""
+    _lock_hierarchy()
+    below = descendants(role_id) - {role_id}
+    db.session.execute(role_parents.delete().where(
+        (role_parents.c.child_id == role_id) | (role_parents.c.parent_id == role_id)
+    ))
+    db.session.execute(role_closure.delete().where(
+        (role_closure.c.ancestor_id == role_id) | (role_closure.c.descendant_id == role_id)
+    ))
+    _refresh_closure(below)
+
+
+def add_closure_self_rows(role_ids):
+    """Closure rows for roles inserted without the ORM (the Role after_insert hook covers the rest)"""
+    if role_ids:
+        db.session.execute(role_closure.insert(), [
+            {'ancestor_id': role_id, 'descendant_id': role_id, 'depth': 0} for role_id in role_ids
+        ])
@@ -1,11 +1,30 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app, g, Response, stream_with_context
+from datetime import datetime
 import uuid
+import csv
+import io
+import json
 import secrets
 import jwt
-from models import db, User, Role, Permission, AuditLog, AccessRequest, UserInvitation
+from models import db, User, Role, Permission, AuditLog, AccessRequest, UserInvitation, UserSession, user_roles, role_permissions
+from principal_cache import Principal, principal_cache, get_principal
+from permission_bits import permission_bits, decode_mask
+from tokens import token_service
+from sessions import start_session, refresh_session, revoke_sessions, revoke_user_sessions, InvalidRefreshToken
+from revocation import revocation_filter
+from pagination import keyset_page, parse_limit, parse_bool, parse_datetime
+from audit import audit_sink
+from hashing import password_hasher, HashingUnavailable
+from rate_limits import limiter, login_account_key, login_failed, principal_key
+from serializers import user_serializer, role_summary_serializer, invitation_serializer
+from user_import import parse_import, take_rows, import_users
+from authz import parse_checks, check_batch
+from introspection import parse_tokens, introspect, max_age
+from resource_versions import bump_versions, touch_users, etag, user_etag, not_modified, tagged, ROLES, PERMISSIONS
+from role_hierarchy import (
+    RoleCycleError, add_parent, remove_parent, set_parents, detach_role, role_permissions_query
+)
 from functools import wraps
-import os
 from flask_cors import CORS
 
 bp = Blueprint('api', __name__)
@@ -13,6 +32,34 @@ bp = Blueprint('api', __name__)
 # Enable CORS for all routes
 CORS(bp, resources={r"/*": {"origins": "*"}})  # Allow all origins for testing
 
+def principal_from_token(data):
+    """Resolve the caller from a decoded token.
+    
+    In stateless mode a claim-bearing token is trusted as is and no query is
+    issued; otherwise the principal comes from the per-worker cache.
+    """
+    if current_app.config.get('AUTH_STATELESS') and 'permission_mask' in data:
+        try:
+            user_id = uuid.UUID(data['user_id'])
+            permissions = decode_mask(data['permission_mask'])
+            permission_bits.ensure(int(data.get('catalog_version', 0)))
+        except (KeyError, TypeError, ValueError):
+            return None
+        return Principal(
+            id=user_id,
+            email=data.get('email'),
+            is_active=True,
+            is_admin=bool(data.get('is_admin')),
+            permissions=permissions
+        )
+    return get_principal(data['user_id'])
+
+@bp.errorhandler(HashingUnavailable)
+def hashing_unavailable(e):
+    response = jsonify({'message': 'Server is busy, please retry shortly.'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
 # Authentication middleware
 def token_required(f):
     @wraps(f)
@@ -28,13 +75,21 @@ def token_required(f):
             return jsonify({'message': 'Authentication token is missing!'}), 401
         
         try:
-            # Decode the JWT token using the standardized JWT_SECRET
-            data = jwt.decode(token, os.environ.get('JWT_SECRET'), algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            # Verified against the keyring; repeat tokens come from the cache
+            data = token_service.decode(token)
+            
+            # Checked in memory; see revocation.RevocationFilter
+            if data.get('sid') and revocation_filter.is_revoked(data['sid']):
+                return jsonify({'message': 'Session has been revoked!'}), 401
+            g.token_claims = data
+            current_user = principal_from_token(data)
             
             if not current_user:
                 print("DEBUG: Invalid authentication token!")  # Debug log
                 return jsonify({'message': 'Invalid authentication token!'}), 401
+            
+            if not current_user.is_active:
+                return jsonify({'message': 'Account is deactivated. Please contact an administrator.'}), 403
                 
         except jwt.ExpiredSignatureError:
             print("DEBUG: Token has expired!")  # Debug log
@@ -58,8 +113,39 @@ def admin_required(f):
     
     return decorated
 
+# Check if user holds a permission middleware
+def permission_required(permission):
+    """Authorize from the caller's permission set; admins hold every permission"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            if not current_user.is_admin and not permission_bits.test(current_user.permissions, permission):
+                return jsonify({'message': 'Permission denied!'}), 403
+            return f(current_user, *args, **kwargs)
+        
+        return token_required(decorated)
+    
+    return decorator
+
+def log_audit(user_id, action, resource_type=None, resource_id=None, details=None):
+    """Queue an audit record for the current request"""
+    audit_sink.record(
+        user_id=user_id,
+        action=action,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        details=details,
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get('User-Agent')
+    )
+
 # Authentication Routes
+# Checked before the view runs, so a blocked attempt costs no bcrypt work
 @bp.route('/auth/login', methods=['POST'])
+@limiter.limit(lambda: current_app.config['LOGIN_RATE_LIMIT_IP'],
+               deduct_when=login_failed, override_defaults=False)
+@limiter.limit(lambda: current_app.config['LOGIN_RATE_LIMIT_ACCOUNT'], key_func=login_account_key,
+               deduct_when=login_failed, override_defaults=False)
 def login():
     data = request.get_json()
     
@@ -68,40 +154,85 @@ def login():
         
     user = User.query.filter(db.func.lower(User.email) == data['email'].lower()).first()
     
-    if not user or not user.check_password(data['password']):
+    if not user or not password_hasher.verify(data['password'], user.password_hash):
         return jsonify({'message': 'Invalid email or password!'}), 401
         
     if not user.is_active:
         return jsonify({'message': 'Account is deactivated. Please contact an administrator.'}), 403
     
+    # Upgrade hashes made under an older cost policy while the password is at hand;
+    # the login has already succeeded, so a busy hasher just defers it
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(data['password'])
+        except HashingUnavailable:
+            pass
+    
     # Update last login timestamp
     user.last_login = datetime.utcnow()
     db.session.commit()
     
-    # Create JWT token
-    token_payload = {
-        'user_id': str(user.id),
-        'is_admin': user.is_admin,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }
-    
-    token = jwt.encode(token_payload, os.environ.get('JWT_SECRET'), algorithm='HS256')  # Updated to JWT_SECRET
+    # Open a session: short-lived access token plus refresh token
+    tokens = start_session(user)
     
     # Log the login activity
-    log = AuditLog(
+    log_audit(
         user_id=user.id,
         action='login',
+        resource_type='auth'
+    )
+    
+    return jsonify(dict(tokens, user=user.to_dict())), 200
+
+@bp.route('/auth/refresh', methods=['POST'])
+def refresh():
+    data = request.get_json(silent=True) or {}
+    try:
+        tokens = refresh_session(data.get('refresh_token'))
+    except InvalidRefreshToken as e:
+        return jsonify({'message': str(e)}), 401
+    return jsonify(tokens), 200
+
+@bp.route('/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    session_id = g.token_claims.get('sid')
+    user_session = db.session.get(UserSession, uuid.UUID(session_id)) if session_id else None
+    if user_session:
+        revoke_sessions([user_session])
+    
+    log_audit(
+        user_id=current_user.id,
+        action='logout',
+        resource_type='auth'
+    )
+    
+    return jsonify({'message': 'Logged out successfully!'}), 200
+
+@bp.route('/auth/logout-all', methods=['POST'])
+@token_required
+def logout_all(current_user):
+    revoked = revoke_user_sessions(current_user.id)
+    
+    log_audit(
+        user_id=current_user.id,
+        action='logout_all',
         resource_type='auth',
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Revoked {revoked} sessions"
     )
-    db.session.add(log)
-    db.session.commit()
     
-    return jsonify({
-        'token': token,
-        'user': user.to_dict()
-    }), 200
+    return jsonify({'message': 'All sessions revoked!', 'revoked': revoked}), 200
+
+@bp.route('/auth/sessions', methods=['GET'])
+@token_required
+def list_sessions(current_user):
+    sessions = UserSession.query.filter(
+        UserSession.user_id == current_user.id,
+        UserSession.revoked_at.is_(None),
+        UserSession.expires_at > datetime.utcnow()
+    ).order_by(UserSession.last_used_at.desc()).all()
+    current = g.token_claims.get('sid')
+    return jsonify([dict(s.to_dict(), current=str(s.id) == current) for s in sessions]), 200
 
 @bp.route('/auth/signup', methods=['POST'])
 def signup():
@@ -125,48 +256,76 @@ def signup():
         last_name=data.get('last_name'),
         is_admin=is_first_user  # First user is admin
     )
-    new_user.set_password(data['password'])
+    new_user.password_hash = password_hasher.hash(data['password'])
     
     db.session.add(new_user)
     db.session.commit()
     
     # Log the registration
-    log = AuditLog(
+    log_audit(
         user_id=new_user.id,
         action='register',
         resource_type='user',
-        resource_id=str(new_user.id),
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        resource_id=str(new_user.id)
     )
-    db.session.add(log)
-    db.session.commit()
     
-    # Create JWT token
-    token_payload = {
-        'user_id': str(new_user.id),
-        'email': new_user.email,  # Include email in the token payload
-        'is_admin': new_user.is_admin,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }
-    
-    token = jwt.encode(token_payload, os.environ.get('JWT_SECRET'), algorithm='HS256')
+    # Open a session for the new user
+    tokens = start_session(new_user)
     
-    return jsonify({
-        'message': 'User registered successfully!',
-        'token': token,
-        'user': new_user.to_dict()
-    }), 201
+    return jsonify(dict(tokens, message='User registered successfully!', user=new_user.to_dict())), 201
+
+def _selected(serializer):
+    """Narrow a serializer to the request's `fields` and `include` parameters"""
+    return serializer.select(request.args.get('fields'), request.args.get('include'))
 
 # User management routes
+USER_FILTERS = ('is_active', 'is_admin', 'role', 'created_from', 'created_to', 'last_login_from', 'last_login_to')
+
+def _user_filters(args):
+    """Build filter criteria from user list query parameters"""
+    criteria = []
+    for flag in ('is_active', 'is_admin'):
+        value = parse_bool(args.get(flag))
+        if value is not None:
+            criteria.append(getattr(User, flag) == value)
+    if args.get('role'):
+        if not isinstance(args['role'], str):
+            raise ValueError(f"invalid role: {args['role']}")
+        criteria.append(User.roles.any(Role.name == args['role']))
+    for column, field in ((User.created_at, 'created'), (User.last_login, 'last_login')):
+        start = parse_datetime(args.get(f'{field}_from'))
+        if start:
+            criteria.append(column >= start)
+        end = parse_datetime(args.get(f'{field}_to'))
+        if end:
+            criteria.append(column < end)
+    return criteria
+
 @bp.route('/users', methods=['GET'])
-@token_required
-@admin_required
+@permission_required('user:list')
 def get_users(current_user):
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        criteria = _user_filters(request.args)
+        serializer = _selected(user_serializer)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
     try:
         print(f"Admin Access: {current_user.email}")  # Debug log
-        users = User.query.all()
-        return jsonify([user.to_dict() for user in users]), 200
+        query = serializer.query().filter(*criteria)
+        
+        try:
+            users, next_cursor = keyset_page(
+                query, [User.created_at, User.id], request.args.get('cursor'), limit
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor!'}), 400
+        
+        return jsonify({
+            'users': serializer.dump_all(users),
+            'next_cursor': next_cursor
+        }), 200
     except Exception as e:
         print(f"Error fetching users: {str(e)}")  # Debug log
         return jsonify({'message': 'Failed to fetch users', 'error': str(e)}), 500
@@ -177,12 +336,24 @@ def get_user(current_user, user_id):
     # Regular users can only see their own information
     if not current_user.is_admin and str(current_user.id) != user_id:
         return jsonify({'message': 'Permission denied!'}), 403
-        
-    user = User.query.get(user_id)
+    try:
+        serializer = _selected(user_serializer)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
+    # Answered from the version counters alone when the client's copy is current
+    tag = user_etag(user_id)
+    if tag is None:
+        return jsonify({'message': 'User not found!'}), 404
+    unchanged = not_modified(tag)
+    if unchanged:
+        return unchanged
+    
+    user = serializer.query().filter(User.id == uuid.UUID(user_id)).first()
     if not user:
         return jsonify({'message': 'User not found!'}), 404
         
-    return jsonify(user.to_dict()), 200
+    return tagged(jsonify(serializer.dump(user)), tag), 200
 
 @bp.route('/users/<user_id>', methods=['PUT'])
 @token_required
@@ -210,21 +381,20 @@ def update_user(current_user, user_id):
     if 'last_name' in data:
         user.last_name = data['last_name']
     if 'password' in data and data['password']:
-        user.set_password(data['password'])
+        user.password_hash = password_hasher.hash(data['password'])
     
     db.session.commit()
+    principal_cache.bump_user(user.id)
+    if not user.is_active:
+        revoke_user_sessions(user.id)
     
     # Log the update
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='update',
         resource_type='user',
-        resource_id=str(user.id),
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        resource_id=str(user.id)
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({
         'message': 'User updated successfully!',
@@ -243,23 +413,44 @@ def delete_user(current_user, user_id):
     if str(current_user.id) == user_id:
         return jsonify({'message': 'Cannot delete your own account!'}), 400
         
+    revoke_user_sessions(user.id)
     db.session.delete(user)
     db.session.commit()
+    principal_cache.bump_user(user.id)
     
     # Log the deletion
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='delete',
         resource_type='user',
-        resource_id=user_id,
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        resource_id=user_id
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({'message': 'User deleted successfully!'}), 200
 
+@bp.route('/users/<user_id>/sessions', methods=['DELETE'])
+@token_required
+@admin_required
+def revoke_user_sessions_route(current_user, user_id):
+    try:
+        user = db.session.get(User, uuid.UUID(user_id))
+    except ValueError:
+        user = None
+    if not user:
+        return jsonify({'message': 'User not found!'}), 404
+    
+    revoked = revoke_user_sessions(user.id)
+    
+    log_audit(
+        user_id=current_user.id,
+        action='revoke_sessions',
+        resource_type='user',
+        resource_id=str(user.id),
+        details=f"Revoked {revoked} sessions"
+    )
+    
+    return jsonify({'message': 'Sessions revoked!', 'revoked': revoked}), 200
+
 @bp.route('/users', methods=['POST'])
 @token_required
 @admin_required
@@ -282,7 +473,7 @@ def create_user(current_user):
         is_active=data.get('is_active', True),
         is_admin=data.get('is_admin', False)
     )
-    new_user.set_password(data['password'])
+    new_user.password_hash = password_hasher.hash(data['password'])
     
     # Assign roles if provided
     if 'role_ids' in data:
@@ -293,33 +484,100 @@ def create_user(current_user):
     db.session.commit()
     
     # Log the creation
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='create',
         resource_type='user',
         resource_id=str(new_user.id),
-        details=f"Created user {data['email']}",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Created user {data['email']}"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({'message': 'User created successfully!', 'user': new_user.to_dict()}), 201
 
-# Role management routes
-@bp.route('/roles', methods=['GET'])
+@bp.route('/users/bulk', methods=['POST'])
 @token_required
 @admin_required
+def bulk_create_users(current_user):
+    try:
+        rows = parse_import(request.stream, request.mimetype)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 415
+    
+    try:
+        rows = take_rows(rows, current_app.config['USER_IMPORT_MAX_ROWS'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 413
+    
+    report = import_users(rows, batch_size=current_app.config['USER_IMPORT_BATCH_SIZE'])
+    
+    # One summarized record instead of one per user
+    log_audit(
+        user_id=current_user.id,
+        action='bulk_create',
+        resource_type='user',
+        details=f"Imported users: {report['created']} created, {report['skipped']} skipped, {report['failed']} failed"
+    )
+    
+    return jsonify(report), 200
+
+# Role management routes
+# Roles outer-joined to their permissions, for ?shape=normalized
+NORMALIZED_ROLE_COLUMNS = (
+    Role.id, Role.name, Role.description, Permission.id.label('permission_id'),
+    Permission.name.label('permission_name'), Permission.description.label('permission_description'),
+    Permission.resource, Permission.action, Permission.bit
+)
+
+def _normalized_roles():
+    """Roles with `permission_ids` plus one `permissions` map keyed by id, from a single query"""
+    rows = db.session.execute(
+        db.select(*NORMALIZED_ROLE_COLUMNS)
+        .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+        .order_by(Role.created_at, Role.id, Permission.bit)
+    )
+    roles, permissions = {}, {}
+    for row in rows:
+        role = roles.get(row.id)
+        if role is None:
+            role = roles[row.id] = {
+                'id': str(row.id), 'name': row.name, 'description': row.description, 'permission_ids': []
+            }
+        if row.permission_id is None:
+            continue
+        permission_id = str(row.permission_id)
+        if permission_id not in permissions:
+            permissions[permission_id] = {
+                'id': permission_id, 'name': row.permission_name, 'description': row.permission_description,
+                'resource': row.resource, 'action': row.action, 'bit': row.bit
+            }
+        if permission_id not in role['permission_ids']:
+            role['permission_ids'].append(permission_id)
+    return {'roles': list(roles.values()), 'permissions': permissions}
+
+@bp.route('/roles', methods=['GET'])
+@permission_required('role:list')
 def get_roles(current_user):
+    shape = request.args.get('shape')
+    if shape not in (None, 'normalized'):
+        return jsonify({'message': 'Invalid query parameter: shape must be normalized'}), 400
+    if shape and ('fields' in request.args or 'include' in request.args):
+        return jsonify({'message': 'Invalid query parameter: shape=normalized takes no fields or include'}), 400
+    try:
+        serializer = _selected(role_summary_serializer)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
+    tag = etag(ROLES, PERMISSIONS)
+    unchanged = not_modified(tag)
+    if unchanged:
+        return unchanged
+    
     try:
-        roles = Role.query.all()
-        return jsonify([{
-            'id': str(role.id),  # Ensure role ID is included
-            'name': role.name,
-            'description': role.description,
-            'permissions': [permission.to_dict() for permission in role.permissions]
-        } for role in roles]), 200
+        if shape:
+            return tagged(jsonify(_normalized_roles()), tag), 200
+        roles = serializer.query().all()
+        return tagged(jsonify(serializer.dump_all(roles)), tag), 200
     except Exception as e:
         return jsonify({'message': 'Failed to fetch roles', 'error': str(e)}), 500
 
@@ -348,19 +606,16 @@ def create_role(current_user):
         new_role.permissions = permissions
     
     db.session.add(new_role)
+    bump_versions(ROLES)
     db.session.commit()
     
     # Log the creation
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='create',
         resource_type='role',
-        resource_id=str(new_role.id),
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        resource_id=str(new_role.id)
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({
         'message': 'Role created successfully!',
@@ -384,21 +639,29 @@ def update_role(current_user, role_id):
     if 'permission_ids' in data:
         permissions = Permission.query.filter(Permission.id.in_(data['permission_ids'])).all()
         role.permissions = permissions
+    if 'parent_ids' in data:
+        try:
+            parents = _get_roles(data['parent_ids'])
+            set_parents(role.id, [parent.id for parent in parents])
+        except RoleCycleError as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 409
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 400
     
+    bump_versions(ROLES)
     db.session.commit()
+    principal_cache.bump_roles()
     
     # Log the update
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='update',
         resource_type='role',
         resource_id=str(role.id),
-        details=f"Updated role {role.name}",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Updated role {role.name}"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({
         'message': 'Role updated successfully!',
@@ -417,24 +680,212 @@ def delete_role(current_user, role_id):
     if role.is_system_role:
         return jsonify({'message': 'System roles cannot be deleted!'}), 403
 
+    detach_role(role.id)
     db.session.delete(role)
+    bump_versions(ROLES)
     db.session.commit()
+    principal_cache.bump_roles()
 
     # Log the deletion
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='delete',
         resource_type='role',
         resource_id=str(role.id),
-        details=f"Deleted role {role.name}",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Deleted role {role.name}"
     )
-    db.session.add(log)
-    db.session.commit()
 
     return jsonify({'message': 'Role deleted successfully!'}), 200
 
+def _member_selection(data):
+    """Turn a members request body into criteria on User plus a description.
+
+    The body names users either by `user_ids` or by a `filter` taking the
+    same fields as the GET /users query parameters. A filter must set at
+    least one of them; selecting every user takes an explicit `all: true`.
+    """
+    if not isinstance(data, dict) or ('user_ids' in data) == ('filter' in data):
+        raise ValueError('Provide either user_ids or filter')
+    if 'user_ids' in data:
+        if not isinstance(data['user_ids'], list):
+            raise ValueError('user_ids must be a list')
+        user_ids = [uuid.UUID(str(user_id)) for user_id in data['user_ids']]
+        return [User.id.in_(user_ids)], f'{len(user_ids)} listed users'
+    
+    user_filter = data['filter']
+    if not isinstance(user_filter, dict):
+        raise ValueError('filter must be an object')
+    unknown = set(user_filter) - set(USER_FILTERS) - {'all'}
+    if unknown:
+        raise ValueError(f'unknown filter fields: {", ".join(sorted(unknown))}')
+    select_all = user_filter.get('all', False)
+    if not isinstance(select_all, bool):
+        raise ValueError('all must be a boolean')
+    criteria = _user_filters(user_filter)
+    if not criteria and not select_all:
+        raise ValueError('filter must set at least one field, or all: true to select every user')
+    return criteria, f'users matching {json.dumps(user_filter, sort_keys=True)}'
+
+def _get_role(role_id):
+    try:
+        return db.session.get(Role, uuid.UUID(role_id))
+    except ValueError:
+        return None
+
+def _get_roles(role_ids):
+    """Load roles by id, raising ValueError unless every id exists"""
+    if not isinstance(role_ids, list):
+        raise ValueError('parent_ids must be a list')
+    ids = {uuid.UUID(str(role_id)) for role_id in role_ids}
+    roles = Role.query.filter(Role.id.in_(ids)).all() if ids else []
+    if len(roles) != len(ids):
+        raise ValueError('Unknown parent role')
+    return roles
+
+# Role inheritance: a role holds its own permissions plus those of every ancestor
+@bp.route('/roles/<role_id>/parents', methods=['GET'])
+@permission_required('role:read')
+def get_role_parents(current_user, role_id):
+    role = _get_role(role_id)
+    if not role:
+        return jsonify({'message': 'Role not found!'}), 404
+    return jsonify([{'id': str(parent.id), 'name': parent.name} for parent in role.parents]), 200
+
+@bp.route('/roles/<role_id>/parents', methods=['POST'])
+@token_required
+@admin_required
+def add_role_parent(current_user, role_id):
+    role = _get_role(role_id)
+    if not role:
+        return jsonify({'message': 'Role not found!'}), 404
+    data = request.get_json(silent=True) or {}
+    parent = _get_role(str(data.get('parent_id', '')))
+    if not parent:
+        return jsonify({'message': 'Parent role not found!'}), 404
+    
+    try:
+        added = add_parent(role.id, parent.id)
+    except RoleCycleError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 409
+    bump_versions(ROLES)
+    db.session.commit()
+    
+    if added:
+        principal_cache.bump_roles()
+        log_audit(
+            user_id=current_user.id,
+            action='add_parent',
+            resource_type='role',
+            resource_id=str(role.id),
+            details=f"Role {role.name} now inherits from {parent.name}"
+        )
+    
+    return jsonify({'message': 'Parent role added!' if added else 'Role already inherits from this parent.'}), 200
+
+@bp.route('/roles/<role_id>/parents/<parent_id>', methods=['DELETE'])
+@token_required
+@admin_required
+def remove_role_parent(current_user, role_id, parent_id):
+    role = _get_role(role_id)
+    parent = _get_role(parent_id)
+    if not role or not parent:
+        return jsonify({'message': 'Role not found!'}), 404
+    
+    if not remove_parent(role.id, parent.id):
+        return jsonify({'message': 'Role does not inherit from this parent!'}), 404
+    bump_versions(ROLES)
+    db.session.commit()
+    principal_cache.bump_roles()
+    
+    log_audit(
+        user_id=current_user.id,
+        action='remove_parent',
+        resource_type='role',
+        resource_id=str(role.id),
+        details=f"Role {role.name} no longer inherits from {parent.name}"
+    )
+    
+    return jsonify({'message': 'Parent role removed!'}), 200
+
+@bp.route('/roles/<role_id>/effective-permissions', methods=['GET'])
+@permission_required('role:read')
+def get_role_effective_permissions(current_user, role_id):
+    role = _get_role(role_id)
+    if not role:
+        return jsonify({'message': 'Role not found!'}), 404
+    permissions = role_permissions_query(role.id).order_by(Permission.name).all()
+    return jsonify([permission.to_dict() for permission in permissions]), 200
+
+@bp.route('/roles/<role_id>/members', methods=['POST'])
+@token_required
+@admin_required
+def add_role_members(current_user, role_id):
+    role = _get_role(role_id)
+    if not role:
+        return jsonify({'message': 'Role not found!'}), 404
+    try:
+        criteria, selection = _member_selection(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # One INSERT ... SELECT; users who already hold the role are skipped, so retries add nothing
+    already_member = db.exists().where(
+        user_roles.c.user_id == User.id,
+        user_roles.c.role_id == role.id
+    )
+    # Memberships are part of each user's ETag
+    touch_users(*criteria, ~already_member)
+    source = db.select(User.id, db.literal(role.id, user_roles.c.role_id.type)).where(*criteria, ~already_member)
+    added = db.session.execute(
+        user_roles.insert().from_select(['user_id', 'role_id'], source)
+    ).rowcount
+    db.session.commit()
+    principal_cache.bump_roles()
+    
+    log_audit(
+        user_id=current_user.id,
+        action='add_members',
+        resource_type='role',
+        resource_id=str(role.id),
+        details=f"Added {added} users to role {role.name} ({selection})"
+    )
+    
+    return jsonify({'added': added}), 200
+
+@bp.route('/roles/<role_id>/members', methods=['DELETE'])
+@token_required
+@admin_required
+def remove_role_members(current_user, role_id):
+    role = _get_role(role_id)
+    if not role:
+        return jsonify({'message': 'Role not found!'}), 404
+    try:
+        criteria, selection = _member_selection(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Memberships are part of each user's ETag
+    touch_users(*criteria, User.id.in_(db.select(user_roles.c.user_id).where(user_roles.c.role_id == role.id)))
+    removed = db.session.execute(
+        user_roles.delete().where(
+            user_roles.c.role_id == role.id,
+            user_roles.c.user_id.in_(db.select(User.id).where(*criteria))
+        )
+    ).rowcount
+    db.session.commit()
+    principal_cache.bump_roles()
+    
+    log_audit(
+        user_id=current_user.id,
+        action='remove_members',
+        resource_type='role',
+        resource_id=str(role.id),
+        details=f"Removed {removed} users from role {role.name} ({selection})"
+    )
+    
+    return jsonify({'removed': removed}), 200
+
 # Invitation System Routes
 from uuid import UUID
 
@@ -467,7 +918,7 @@ def create_invitation(current_user):
         is_active=True,
         is_admin=False  # Default to non-admin; can be changed by admins later
     )
-    new_user.set_password(data['password'])
+    new_user.password_hash = password_hasher.hash(data['password'])
     
     # Assign roles if provided
     if role_ids:
@@ -478,42 +929,34 @@ def create_invitation(current_user):
     db.session.commit()
     
     # Log the creation
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='create',
         resource_type='user',
         resource_id=str(new_user.id),
-        details=f"Created user {data['email']} via invitation",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Created user {data['email']} via invitation"
     )
-    db.session.add(log)
-    db.session.commit()
     
-    # Generate JWT token for the new user
-    token_payload = {
-        'user_id': str(new_user.id),
-        'is_admin': new_user.is_admin,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }
-    token = jwt.encode(token_payload, os.environ.get('JWT_SECRET'), algorithm='HS256')
+    # Open a session for the new user
+    tokens = start_session(new_user)
     
-    return jsonify({
-        'message': 'User invited and created successfully!',
-        'user': new_user.to_dict(),
-        'token': token
-    }), 201
+    return jsonify(dict(tokens, message='User invited and created successfully!', user=new_user.to_dict())), 201
 
 @bp.route('/invitations', methods=['GET'])
 @token_required
 @admin_required
 def list_invitations(current_user):
+    try:
+        serializer = _selected(invitation_serializer)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
     # Get active (unused and not expired) invitations
-    active_invitations = UserInvitation.query.filter_by(used=False).filter(
+    active_invitations = serializer.query().filter_by(used=False).filter(
         UserInvitation.expires_at > datetime.utcnow()
     ).all()
     
-    return jsonify([inv.to_dict() for inv in active_invitations]), 200
+    return jsonify(serializer.dump_all(active_invitations)), 200
 
 @bp.route('/invitations/<invitation_id>', methods=['DELETE'])
 @token_required
@@ -527,17 +970,13 @@ def revoke_invitation(current_user, invitation_id):
     db.session.commit()
     
     # Log the revocation
-    log = AuditLog(
+    log_audit(
         user_id=current_user.id,
         action='revoke',
         resource_type='user_invitation',
         resource_id=str(invitation.id),
-        details=f"Revoked invitation for {invitation.email}",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details=f"Revoked invitation for {invitation.email}"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify({'message': 'Invitation revoked successfully!'}), 200
 
@@ -564,7 +1003,7 @@ def accept_invitation():
         last_name=invitation.last_name,
         is_admin=False  # Default to non-admin; can be changed by admins later
     )
-    new_user.set_password(data['password'])
+    new_user.password_hash = password_hasher.hash(data['password'])
     
     # Assign role if specified in the invitation
     if invitation.role_id:
@@ -579,40 +1018,59 @@ def accept_invitation():
     db.session.commit()
     
     # Log the acceptance
-    log = AuditLog(
+    log_audit(
         user_id=new_user.id,
         action='register',
         resource_type='user',
         resource_id=str(new_user.id),
-        details="Registered via invitation",
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent')
+        details="Registered via invitation"
     )
-    db.session.add(log)
-    db.session.commit()
     
-    # Create JWT token
-    token_payload = {
-        'user_id': str(new_user.id),
-        'is_admin': new_user.is_admin,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }
+    # Open a session for the new user
+    tokens = start_session(new_user)
     
-    token = jwt.encode(token_payload, os.environ.get('JWT_SECRET'), algorithm='HS256')
+    return jsonify(dict(tokens, message='Account created successfully!', user=new_user.to_dict())), 201
+
+# Batch authorization decisions for downstream services
+@bp.route('/authz/check', methods=['POST'])
+@limiter.limit(lambda: current_app.config['AUTHZ_RATE_LIMIT'], key_func=principal_key)
+@permission_required('authz:check')
+def authz_check(current_user):
+    try:
+        checks = parse_checks(request.get_json(silent=True), current_app.config['AUTHZ_MAX_CHECKS'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify({'results': check_batch(checks)}), 200
+
+# RFC 7662 token introspection for gateways and resource servers
+@bp.route('/oauth/introspect', methods=['POST'])
+@limiter.limit(lambda: current_app.config['INTROSPECTION_RATE_LIMIT'], key_func=principal_key)
+@permission_required('token:introspect')
+def introspect_tokens(current_user):
+    # RFC 7662 clients send a form-encoded `token`; batches are JSON
+    data = request.form.to_dict() if request.form else request.get_json(silent=True)
+    try:
+        tokens, batch = parse_tokens(data, current_app.config['INTROSPECTION_MAX_TOKENS'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    return jsonify({
-        'message': 'Account created successfully!',
-        'token': token,
-        'user': new_user.to_dict()
-    }), 201
+    results = introspect(tokens)
+    response = jsonify({'results': results} if batch else results[0])
+    seconds = max_age(results, current_app.config['INTROSPECTION_MAX_AGE'])
+    response.headers['Cache-Control'] = f'private, max-age={seconds}' if seconds else 'no-store'
+    return response
 
 @bp.route('/permissions', methods=['GET'])
-@token_required
-@admin_required
+@permission_required('permission:list')
 def get_permissions(current_user):
+    tag = etag(PERMISSIONS)
+    unchanged = not_modified(tag)
+    if unchanged:
+        return unchanged
+    
     try:
         permissions = Permission.query.all()
-        return jsonify([permission.to_dict() for permission in permissions]), 200
+        return tagged(jsonify([permission.to_dict() for permission in permissions]), tag), 200
     except Exception as e:
         return jsonify({'message': 'Failed to fetch permissions', 'error': str(e)}), 500
 
@@ -640,6 +1098,7 @@ def create_permission(current_user):
     )
 
     db.session.add(new_permission)
+    bump_versions(PERMISSIONS)
     db.session.commit()
 
     return jsonify({
@@ -647,12 +1106,120 @@ def create_permission(current_user):
         'permission': new_permission.to_dict()
     }), 201
 
+# Plain columns with the actor email joined in, so audit rows never become
+# ORM objects or trigger a per-row lookup of the user
+AUDIT_LOG_COLUMNS = (
+    AuditLog.id, AuditLog.timestamp, AuditLog.user_id, User.email.label('user_email'),
+    AuditLog.action, AuditLog.resource_type, AuditLog.resource_id, AuditLog.details,
+    AuditLog.ip_address, AuditLog.user_agent
+)
+AUDIT_LOG_FIELDS = ['id', 'timestamp', 'user_id', 'user_email', 'action', 'resource_type',
+                    'resource_id', 'details', 'ip_address', 'user_agent']
+EXPORT_BATCH_SIZE = 1000
+
+def _audit_log_row(row):
+    return {
+        'id': str(row.id),
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'user_id': str(row.user_id) if row.user_id else None,
+        'user_email': row.user_email,
+        'action': row.action,
+        'resource_type': row.resource_type,
+        'resource_id': row.resource_id,
+        'details': row.details,
+        'ip_address': row.ip_address,
+        'user_agent': row.user_agent
+    }
+
+def _audit_log_filters(args):
+    """Build filter criteria from audit log query parameters"""
+    criteria = []
+    if args.get('user_id'):
+        criteria.append(AuditLog.user_id == uuid.UUID(args['user_id']))
+    for field in ('action', 'resource_type', 'resource_id', 'ip_address'):
+        if args.get(field):
+            criteria.append(getattr(AuditLog, field) == args[field])
+    start = parse_datetime(args.get('from'))
+    if start:
+        criteria.append(AuditLog.timestamp >= start)
+    end = parse_datetime(args.get('to'))
+    if end:
+        criteria.append(AuditLog.timestamp < end)
+    return criteria
+
 @bp.route('/audit-logs', methods=['GET'])
-@token_required
-@admin_required
+@permission_required('audit:list')
 def get_audit_logs(current_user):
     try:
-        logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).all()
-        return jsonify([log.to_dict() for log in logs]), 200
+        limit = parse_limit(request.args.get('limit'))
+        criteria = _audit_log_filters(request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
+    try:
+        query = db.session.query(*AUDIT_LOG_COLUMNS).outerjoin(
+            User, User.id == AuditLog.user_id
+        ).filter(*criteria)
+        
+        try:
+            rows, next_cursor = keyset_page(
+                query, [AuditLog.timestamp, AuditLog.id], request.args.get('cursor'), limit,
+                descending=True
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor!'}), 400
+        
+        return jsonify({
+            'audit_logs': [_audit_log_row(row) for row in rows],
+            'next_cursor': next_cursor
+        }), 200
     except Exception as e:
-        return jsonify({'message': 'Failed to fetch audit logs', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to fetch audit logs', 'error': str(e)}), 500
+
+@bp.route('/audit-logs/export', methods=['GET'])
+@permission_required('audit:list')
+def export_audit_logs(current_user):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'Format must be ndjson or csv!'}), 400
+    
+    try:
+        criteria = _audit_log_filters(request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameter: {e}'}), 400
+    
+    stmt = db.select(*AUDIT_LOG_COLUMNS).outerjoin(
+        User, User.id == AuditLog.user_id
+    ).where(*criteria).order_by(AuditLog.timestamp, AuditLog.id)
+    
+    def generate():
+        # yield_per streams from a server-side cursor one batch at a time
+        result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=AUDIT_LOG_FIELDS)
+            writer.writeheader()
+            yield buffer.getvalue()
+        for batch in result.partitions():
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=AUDIT_LOG_FIELDS)
+                writer.writerows(_audit_log_row(row) for row in batch)
+                yield buffer.getvalue()
+            else:
+                yield ''.join(json.dumps(_audit_log_row(row)) + '\n' for row in batch)
+        result.close()
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=audit-logs.{export_format}'}
+    )
+
+@bp.route('/system/hashing', methods=['GET'])
+@token_required
+@admin_required
+def hashing_stats(current_user):
+    # Pool load and bcrypt cost; admin-only so callers cannot time hashing floods
+    return jsonify(password_hasher.stats()), 200
@@ -0,0 +1,170 @@
+import datetime
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload, joinedload
+
+from models import User, Role, Permission, UserInvitation
+
+# A field of a shaped serializer; `path` names the relationship it reads, if any
+Field = namedtuple('Field', ['get', 'path'])
+
+
+def _column(name):
+    def get(obj):
+        value = getattr(obj, name)
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+    return Field(get, None)
+
+
+def _columns(*names):
+    return {name: _column(name) for name in names}
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Serializer:
+    """Pairs a serialized shape with the relationships it walks.
+
+    Relationship paths are dotted attribute names such as 'roles.permissions'.
+    Collections are loaded with one SELECT ... IN per level and scalar
+    references are joined into the main query, so serializing a list costs a
+    fixed number of queries however many rows it holds.
+
+    A serializer built with `fields` (name -> Field) and `embeds`
+    (relationship name -> Serializer) also supports sparse fieldsets via
+    `select`; its `paths` are then the relationships embedded by default.
+    Fields that read a relationship, like an invitation's `role_name`,
+    load it only when requested.
+    """
+
+    def __init__(self, model, *paths, dump=None, fields=None, embeds=None):
+        self.model = model
+        self.fields = fields
+        self.embeds = embeds or {}
+        if fields is not None:
+            tree = self._include_tree(paths)
+            paths = self._load_paths(list(fields), tree)
+            dump = dump or (lambda obj: self._dump_shaped(obj, list(self.fields), tree))
+        self.paths = paths
+        self._dump = dump or (lambda obj: obj.to_dict())
+
+    def options(self):
+        return [self._loader(path) for path in self.paths]
+
+    def _loader(self, path):
+        model, loader = self.model, None
+        for name in path.split('.'):
+            relationship = inspect(model).relationships[name]
+            attr = getattr(model, name)
+            if relationship.uselist:
+                loader = selectinload(attr) if loader is None else loader.selectinload(attr)
+            else:
+                loader = joinedload(attr) if loader is None else loader.joinedload(attr)
+            model = relationship.mapper.class_
+        return loader
+
+    def query(self, query=None):
+        """Apply the eager loaders to `query` (defaults to the model's query)"""
+        if query is None:
+            query = self.model.query
+        return query.options(*self.options())
+
+    def dump(self, obj):
+        return self._dump(obj)
+
+    def dump_all(self, objs):
+        return [self._dump(obj) for obj in objs]
+
+    def select(self, fields=None, include=None):
+        """Serializer limited to `fields` and the relationships in `include`.
+
+        Both are comma-separated strings as given in query parameters; None
+        keeps the default shape. `include` takes dotted paths and replaces
+        the default embeds. Relationships named in `fields` are embedded
+        too, so `fields=id,email` embeds nothing. Only the relationships
+        the result reads are loaded. Raises ValueError on unknown names.
+        """
+        if fields is None and include is None:
+            return self
+        names = list(self.fields) if fields is None else _split(fields)
+        paths = _split(include or '')
+        unknown = [name for name in names if name not in self.fields and name not in self.embeds]
+        if unknown:
+            raise ValueError(f'unknown fields: {", ".join(unknown)}')
+        paths = list(paths) + [name for name in names if name in self.embeds]
+        tree = self._include_tree(paths)
+        names = [name for name in names if name in self.fields]
+        return Serializer(
+            self.model, *self._load_paths(names, tree),
+            dump=lambda obj: self._dump_shaped(obj, names, tree)
+        )
+
+    def _include_tree(self, paths):
+        """Nested dict of embeds from dotted paths, validated against `embeds`"""
+        tree = {}
+        for path in paths:
+            serializer, node = self, tree
+            for name in path.split('.'):
+                if name not in serializer.embeds:
+                    raise ValueError(f'cannot include {path}')
+                serializer, node = serializer.embeds[name], node.setdefault(name, {})
+        return tree
+
+    def _load_paths(self, names, tree, prefix=''):
+        paths = {prefix + self.fields[name].path for name in names if self.fields[name].path}
+        for name, subtree in tree.items():
+            embedded = self.embeds[name]
+            nested = embedded._load_paths(list(embedded.fields), subtree, f'{prefix}{name}.')
+            paths.update(nested or {prefix + name})
+        # The deepest paths load their parents too
+        return sorted(path for path in paths if not any(other.startswith(path + '.') for other in paths))
+
+    def _dump_shaped(self, obj, names, tree):
+        data = {name: self.fields[name].get(obj) for name in names}
+        for name, subtree in tree.items():
+            embedded, value = self.embeds[name], getattr(obj, name)
+            if value is None:
+                data[name] = None
+            elif isinstance(value, (list, tuple)):
+                data[name] = [embedded._dump_shaped(item, list(embedded.fields), subtree) for item in value]
+            else:
+                data[name] = embedded._dump_shaped(value, list(embedded.fields), subtree)
+        return data
+
+
+permission_serializer = Serializer(
+    Permission, fields=_columns('id', 'name', 'description', 'resource', 'action', 'bit')
+)
+role_serializer = Serializer(
+    Role, 'permissions',
+    fields=_columns('id', 'name', 'description', 'created_at'),
+    embeds={'permissions': permission_serializer}
+)
+role_summary_serializer = Serializer(
+    Role, 'permissions',
+    fields=_columns('id', 'name', 'description'),
+    embeds={'permissions': permission_serializer}
+)
+user_serializer = Serializer(
+    User, 'roles.permissions',
+    fields=_columns('id', 'email', 'first_name', 'last_name', 'is_active', 'is_admin', 'created_at', 'last_login'),
+    embeds={'roles': role_serializer}
+)
+invitation_serializer = Serializer(
+    UserInvitation,
+    fields=dict(
+        _columns('id', 'email', 'first_name', 'last_name', 'role_id', 'invited_by', 'used', 'expires_at', 'created_at'),
+        role_name=Field(lambda invitation: invitation.role.name if invitation.role else None, 'role'),
+        inviter_email=Field(lambda invitation: invitation.inviter.email if invitation.inviter else None, 'inviter'),
+        is_expired=Field(lambda invitation: invitation.is_expired(), None)
+    ),
+    embeds={'role': role_summary_serializer, 'inviter': user_serializer}
+)
@@ -0,0 +1,136 @@
+import datetime
+import hashlib
+import hmac
+import secrets
+import uuid
+
+from flask import current_app, request
+from sqlalchemy import select, func
+
+from models import db, UserSession, session_revocations
+from revocation import revocation_filter
+from tokens import token_service
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def _hash_secret(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def _access_token(user, user_session):
+    """Mint a short-lived access token bound to a session"""
+    ttl = current_app.config['ACCESS_TOKEN_TTL']
+    claims = {'sid': str(user_session.id), 'jti': uuid.uuid4().hex}
+    if current_app.config.get('AUTH_STATELESS'):
+        return user.generate_auth_token(expiration=ttl, claims=claims)
+    return token_service.encode(dict(claims, **{
+        'user_id': str(user.id),
+        'email': user.email,
+        'is_admin': user.is_admin,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+    }))
+
+
+def _tokens(user, user_session, secret):
+    return {
+        'token': _access_token(user, user_session),
+        'refresh_token': f'{user_session.id}.{secret}',
+        'expires_in': current_app.config['ACCESS_TOKEN_TTL']
+    }
+
+
+def start_session(user):
+    """Open a session for a user who just authenticated and commit it.
+
+    Returns the response fields: `token` (access token), `refresh_token`
+    and `expires_in` seconds.
+    """
+    now = datetime.datetime.utcnow()
+    secret = secrets.token_urlsafe(32)
+    user_session = UserSession(
+        user_id=user.id,
+        refresh_hash=_hash_secret(secret),
+        created_at=now,
+        last_used_at=now,
+        expires_at=now + datetime.timedelta(seconds=current_app.config['REFRESH_TOKEN_TTL']),
+        ip_address=request.remote_addr,
+        user_agent=(request.headers.get('User-Agent') or '')[:255] or None
+    )
+    db.session.add(user_session)
+    db.session.commit()
+    return _tokens(user, user_session, secret)
+
+
+def refresh_session(refresh_token):
+    """Exchange a refresh token for a new access token and a rotated refresh token.
+
+    Each refresh token works once. Presenting the one rotated out by the
+    last refresh means it was copied, so the whole session is revoked. Any
+    other wrong secret is refused without touching the session: session ids
+    are not secret, so a guess must not be able to log the owner out.
+    Raises InvalidRefreshToken.
+    """
+    session_id, _, secret = (refresh_token or '').partition('.')
+    try:
+        user_session = db.session.get(UserSession, uuid.UUID(session_id))
+    except ValueError:
+        user_session = None
+    now = datetime.datetime.utcnow()
+    if not user_session or user_session.revoked_at or user_session.expires_at <= now:
+        raise InvalidRefreshToken('Invalid or expired refresh token')
+    secret_hash = _hash_secret(secret)
+    if not hmac.compare_digest(user_session.refresh_hash, secret_hash):
+        if user_session.previous_refresh_hash and hmac.compare_digest(user_session.previous_refresh_hash, secret_hash):
+            revoke_sessions([user_session])
+            raise InvalidRefreshToken('Refresh token was already used; session revoked')
+        raise InvalidRefreshToken('Invalid or expired refresh token')
+    if not user_session.user.is_active:
+        raise InvalidRefreshToken('Account is deactivated')
+
+    secret = secrets.token_urlsafe(32)
+    user_session.previous_refresh_hash = secret_hash
+    user_session.refresh_hash = _hash_secret(secret)
+    user_session.last_used_at = now
+    db.session.commit()
+    return _tokens(user_session.user, user_session, secret)
+
+
+def revoke_sessions(user_sessions):
+    """Revoke sessions and commit.
+
+    Each revocation is appended to session_revocations for the other
+    workers' filters and applied to this worker's filter at once. Log rows
+    whose sessions can no longer have live access tokens are pruned, except
+    the newest, which keeps the next seq above every one already handed out.
+    """
+    now = datetime.datetime.utcnow()
+    # Access tokens minted just before now outlive the session by at most their TTL
+    expires_at = now + datetime.timedelta(seconds=current_app.config['ACCESS_TOKEN_TTL'])
+    revoked = [user_session for user_session in user_sessions if not user_session.revoked_at]
+    if not revoked:
+        return 0
+    for user_session in revoked:
+        user_session.revoked_at = now
+    db.session.execute(session_revocations.insert(), [
+        {'session_id': user_session.id, 'expires_at': expires_at} for user_session in revoked
+    ])
+    newest = select(func.max(session_revocations.c.seq)).scalar_subquery()
+    db.session.execute(session_revocations.delete().where(
+        session_revocations.c.expires_at <= now, session_revocations.c.seq < newest
+    ))
+    db.session.commit()
+    for user_session in revoked:
+        revocation_filter.add(user_session.id, expires_at)
+    return len(revoked)
+
+
+def revoke_user_sessions(user_id):
+    """Revoke every live session of a user; returns how many were revoked"""
+    return revoke_sessions(UserSession.query.filter(
+        UserSession.user_id == user_id,
+        UserSession.revoked_at.is_(None),
+        UserSession.expires_at > datetime.datetime.utcnow()
+    ).all())
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+@contextmanager
+def count_queries(engine):
+    """Collect every SQL statement executed on `engine` inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+class QueryBudgetMixin:
+    """Assertions that an endpoint issues a bounded number of queries"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, engine):
+        with count_queries(engine) as statements:
+            yield statements
+        self.assertLessEqual(
+            len(statements), budget,
+            f'{len(statements)} queries exceeded budget of {budget}:\n' + '\n'.join(statements)
+        )
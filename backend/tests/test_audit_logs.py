@@ -0,0 +1,354 @@
+import unittest
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, AuditLog
+from audit import AuditSink
+import audit_partitions
+from audit_partitions import archive_table, apply_retention, ensure_partitions, partition_name, _add_months
+
+class AuditLogTestCase(unittest.TestCase):
+    """Test cases for audit log queries and export"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        
+        with self.app.app_context():
+            db.create_all()
+            
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            db.session.add(admin_user)
+            db.session.flush()
+            
+            self.base_time = datetime(2024, 1, 1, 12, 0, 0)
+            for i in range(5):
+                db.session.add(AuditLog(
+                    user_id=admin_user.id,
+                    action='login',
+                    resource_type='auth',
+                    details=f'event {i}, with comma',
+                    timestamp=self.base_time + timedelta(days=i)
+                ))
+            db.session.commit()
+            
+            self.admin_token = admin_user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get(self, url):
+        return self.client.get(url, headers={'Authorization': f'Bearer {self.admin_token}'})
+
+    def test_list_newest_first_with_cursor(self):
+        """Test keyset pagination of audit logs, newest first"""
+        response = self.get('/api/audit-logs?limit=3')
+        data = json.loads(response.data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([log['details'] for log in data['audit_logs']],
+                         ['event 4, with comma', 'event 3, with comma', 'event 2, with comma'])
+        self.assertEqual(data['audit_logs'][0]['user_email'], 'admin@test.com')
+        
+        response = self.get(f"/api/audit-logs?limit=3&cursor={data['next_cursor']}")
+        data = json.loads(response.data)
+        self.assertEqual([log['details'] for log in data['audit_logs']],
+                         ['event 1, with comma', 'event 0, with comma'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_list_rejects_malformed_cursor(self):
+        """Test that a decodable cursor holding the wrong types is a 400"""
+        for values in ([None, None], [5, 5], ['2024-01-01T00:00:00', 'not-a-uuid']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+            response = self.get(f'/api/audit-logs?cursor={cursor}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['message'], 'Invalid cursor!')
+
+    def test_list_filters(self):
+        """Test filtering audit logs by actor, resource and time range"""
+        with self.app.app_context():
+            db.session.add(AuditLog(action='delete', resource_type='role', resource_id='r1',
+                                    ip_address='10.0.0.1', timestamp=self.base_time))
+            db.session.commit()
+            admin_id = str(User.query.filter_by(email='admin@test.com').first().id)
+        
+        data = json.loads(self.get('/api/audit-logs?resource_type=role&resource_id=r1').data)
+        self.assertEqual([log['action'] for log in data['audit_logs']], ['delete'])
+        self.assertIsNone(data['audit_logs'][0]['user_email'])
+        
+        data = json.loads(self.get('/api/audit-logs?ip_address=10.0.0.1').data)
+        self.assertEqual(len(data['audit_logs']), 1)
+        
+        start = (self.base_time + timedelta(days=3)).isoformat()
+        data = json.loads(self.get(f'/api/audit-logs?user_id={admin_id}&action=login&from={start}').data)
+        self.assertEqual(len(data['audit_logs']), 2)
+        
+        response = self.get('/api/audit-logs?user_id=not-a-uuid')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_ndjson(self):
+        """Test streaming audit logs as NDJSON"""
+        response = self.get('/api/audit-logs/export?format=ndjson')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['user_email'], 'admin@test.com')
+        self.assertEqual(rows[0]['details'], 'event 0, with comma')
+
+    def test_export_csv_with_range(self):
+        """Test streaming a time range of audit logs as CSV"""
+        start = (self.base_time + timedelta(days=1)).isoformat()
+        end = (self.base_time + timedelta(days=3)).isoformat()
+        response = self.get(f'/api/audit-logs/export?format=csv&from={start}&to={end}')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([row['details'] for row in rows], ['event 1, with comma', 'event 2, with comma'])
+
+    def test_export_rejects_unknown_format(self):
+        """Test that unsupported export formats are rejected"""
+        response = self.get('/api/audit-logs/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_is_audited(self):
+        """Test that routes record audit events through the sink"""
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'email': 'admin@test.com', 'password': 'admin123'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(AuditLog.query.filter_by(action='login', resource_type='auth').count(), 6)
+
+class AuditSinkTestCase(unittest.TestCase):
+    """Test cases for the write-behind audit sink"""
+
+    def setUp(self):
+        """Set up a sink with its own queue and spool file"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.spool_path = os.path.join(self.tempdir.name, 'audit-spool.ndjson')
+        self.quarantine_path = os.path.join(self.tempdir.name, 'audit-quarantine.ndjson')
+        
+        self.patches = [
+            mock.patch.dict(self.app.config, {
+                'AUDIT_WRITE_BEHIND': True,
+                'AUDIT_QUEUE_SIZE': 2,
+                'AUDIT_BATCH_SIZE': 10,
+                'AUDIT_SPOOL_PATH': self.spool_path,
+                'AUDIT_QUARANTINE_PATH': self.quarantine_path
+            }),
+            mock.patch.dict(self.app.extensions)
+        ]
+        for patch in self.patches:
+            patch.start()
+        
+        self.sink = AuditSink(self.app)
+        # Flush explicitly instead of from a background thread
+        self.sink._ensure_started = lambda: None
+        
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tempdir.cleanup()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_flush_writes_queued_records(self):
+        """Test that queued records are written on flush"""
+        with self.app.app_context():
+            self.sink.record(action='login', resource_type='auth')
+            self.sink.record(action='logout', resource_type='auth')
+            self.assertEqual(AuditLog.query.count(), 0)
+            
+            self.sink.flush()
+            self.assertEqual(AuditLog.query.count(), 2)
+
+    def test_full_queue_spools_and_replays(self):
+        """Test that overflow goes to the spool and is replayed on flush"""
+        with self.app.app_context():
+            for i in range(3):
+                self.sink.record(action='login', resource_type='auth', details=f'event {i}')
+            self.assertTrue(os.path.exists(self.spool_path))
+            
+            self.sink.flush()
+            self.assertEqual(AuditLog.query.count(), 3)
+            self.assertFalse(os.path.exists(self.spool_path))
+
+    def test_failed_insert_spools_batch(self):
+        """Test that a failed batch insert is kept in the spool"""
+        with self.app.app_context():
+            self.sink.record(action='login', resource_type='auth')
+            down = OperationalError('INSERT', {}, RuntimeError('database down'))
+            with mock.patch.object(self.sink, '_execute', side_effect=down):
+                self.sink.flush()
+            self.assertEqual(AuditLog.query.count(), 0)
+            
+            self.sink.flush()
+            self.assertEqual(AuditLog.query.count(), 1)
+
+    def test_rejected_record_is_quarantined(self):
+        """Test that one bad record is quarantined while the rest of its batch is written"""
+        with self.app.app_context():
+            self.sink.record(action='login', resource_type='auth')
+            self.sink.record(action='logout', resource_type='auth')
+            execute = self.sink._execute
+            
+            def reject_logout(records):
+                if any(record['action'] == 'logout' for record in records):
+                    raise ValueError('bad record')
+                execute(records)
+            
+            with mock.patch.object(self.sink, '_execute', side_effect=reject_logout):
+                self.sink.flush()
+            self.assertEqual([log.action for log in AuditLog.query.all()], ['login'])
+            self.assertFalse(os.path.exists(self.spool_path))
+            with open(self.quarantine_path, encoding='utf-8') as quarantine:
+                self.assertEqual([json.loads(line)['action'] for line in quarantine], ['logout'])
+
+    def test_replay_quarantines_unreadable_lines(self):
+        """Test that a corrupt spool line does not stop the rest of the spool from replaying"""
+        with self.app.app_context():
+            self.sink.record(action='a', resource_type='auth')
+            self.sink.record(action='b', resource_type='auth')
+            self.sink.record(action='c', resource_type='auth')
+            with open(self.spool_path, 'a', encoding='utf-8') as spool:
+                spool.write('{not json\n')
+            
+            self.sink.flush()
+            self.assertEqual(AuditLog.query.count(), 3)
+            self.assertFalse(os.path.exists(self.spool_path))
+            with open(self.quarantine_path, encoding='utf-8') as quarantine:
+                self.assertEqual(quarantine.read(), '{not json\n')
+
+    def test_sweeps_replays_left_by_dead_workers(self):
+        """Test that spool files claimed by a worker that died are replayed"""
+        with self.app.app_context():
+            for i in range(3):
+                self.sink.record(action='login', resource_type='auth', details=f'event {i}')
+            # A pid that cannot belong to a live process
+            os.rename(self.spool_path, f'{self.spool_path}.99999999.replay')
+            
+            self.sink._sweep_replays()
+            self.assertEqual(AuditLog.query.count(), 1)
+            self.assertEqual(os.listdir(self.tempdir.name), [])
+
+class AuditPartitionTestCase(unittest.TestCase):
+    """Test cases for audit log partition maintenance helpers"""
+
+    def setUp(self):
+        """Set up database with a few audit rows"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.tempdir = tempfile.TemporaryDirectory()
+        with self.app.app_context():
+            db.create_all()
+            for i in range(3):
+                db.session.add(AuditLog(action='login', resource_type='auth',
+                                        timestamp=datetime(2024, 1, 1 + i)))
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.tempdir.cleanup()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_month_arithmetic(self):
+        """Test partition naming across year boundaries"""
+        from datetime import date
+        self.assertEqual(_add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(_add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(partition_name(date(2024, 3, 1)), 'audit_logs_p2024_03')
+
+    def test_archive_table_writes_compressed_ndjson(self):
+        """Test that archiving streams every row into a gzip NDJSON file"""
+        with self.app.app_context():
+            path, count = archive_table('audit_logs', self.tempdir.name)
+        
+        self.assertEqual(count, 3)
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['timestamp'][:10] for row in rows], ['2024-01-01', '2024-01-02', '2024-01-03'])
+
+    def test_retention_is_noop_without_partitions(self):
+        """Test that retention leaves an unpartitioned table alone"""
+        with self.app.app_context():
+            self.assertEqual(apply_retention(0, self.tempdir.name), [])
+            self.assertEqual(AuditLog.query.count(), 3)
+
+    def run_ensure_partitions(self, execute):
+        """Run ensure_partitions against a fake partitioned table, returning the SQL issued"""
+        statements = []
+        
+        def record(statement, *args, **kwargs):
+            statements.append(str(statement))
+            return execute(str(statement))
+        
+        with mock.patch.object(audit_partitions, 'is_partitioned', return_value=True), \
+                mock.patch.object(audit_partitions, '_monthly_tables', return_value={}), \
+                mock.patch.object(audit_partitions, '_attached_partitions', return_value={'audit_logs_default'}), \
+                mock.patch.object(db.session, 'execute', side_effect=record), \
+                mock.patch.object(db.session, 'commit'), mock.patch.object(db.session, 'rollback'):
+            created = ensure_partitions(months_ahead=0, today=datetime(2024, 5, 10))
+        return created, statements
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        """Test that rows stranded in the default partition move into the new month"""
+        with self.app.app_context():
+            created, statements = self.run_ensure_partitions(lambda sql: mock.Mock(first=lambda: (1,)))
+        
+        self.assertEqual(created, ['audit_logs_p2024_05'])
+        self.assertEqual([sql.split(' (')[0][:40] for sql in statements[1:]], [
+            'ALTER TABLE audit_logs DETACH PARTITION ',
+            'CREATE TABLE audit_logs_p2024_05 PARTITI',
+            'WITH moved AS',
+            'ALTER TABLE audit_logs ATTACH PARTITION '
+        ])
+
+    def test_ensure_partitions_logs_failures(self):
+        """Test that a partition that cannot be created does not fail the caller"""
+        def execute(sql):
+            if sql.startswith('CREATE'):
+                raise RuntimeError('partition constraint violated')
+            return mock.Mock(first=lambda: None)
+        
+        with self.app.app_context():
+            with self.assertLogs('audit_partitions', 'ERROR'):
+                created, _ = self.run_ensure_partitions(execute)
+        self.assertEqual(created, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,18 @@
 import unittest
 import json
+import jwt
 import os
 import sys
 from datetime import datetime, timedelta
+from unittest import mock
 
 # Add the parent directory to sys.path to import backend modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app, db
 from models import User, Role, Permission
+from principal_cache import principal_cache
+from permission_bits import permission_bits, decode_mask
 
 class AuthTestCase(unittest.TestCase):
     """Test cases for authentication functionality"""
@@ -17,6 +21,7 @@ class AuthTestCase(unittest.TestCase):
         """Set up test client and database"""
         self.app = app
         self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
         self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.client = self.app.test_client()
         
@@ -108,5 +113,75 @@ class AuthTestCase(unittest.TestCase):
         response = self.client.get('/api/protected')
         self.assertEqual(response.status_code, 401)
 
+class StatelessAuthTestCase(unittest.TestCase):
+    """Test cases for claims-only authorization"""
+
+    def setUp(self):
+        """Set up test client and database in stateless mode"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.app.config['AUTH_STATELESS'] = True
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            
+            role_list = Permission(name='role:list', description='List roles', resource='role', action='list')
+            viewer_role = Role(name='viewer', description='Read-only role')
+            viewer_role.permissions.append(role_list)
+            viewer = User(email='viewer@test.com', is_active=True, is_admin=False, role='user')
+            viewer.set_password('viewer123')
+            viewer.roles.append(viewer_role)
+            plain_user = User(email='plain@test.com', is_active=True, is_admin=False, role='user')
+            plain_user.set_password('plain123')
+            
+            db.session.add_all([role_list, viewer_role, viewer, plain_user])
+            db.session.commit()
+            
+            self.plain_token = plain_user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.app.config['AUTH_STATELESS'] = False
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_login_issues_claim_bearing_token(self):
+        """Test that login issues a token carrying roles and permissions"""
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'email': 'viewer@test.com', 'password': 'viewer123'}),
+            content_type='application/json'
+        )
+        token = json.loads(response.data)['token']
+        claims = jwt.decode(token, os.environ.get('JWT_SECRET'), algorithms=['HS256'])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(claims['roles'], ['viewer'])
+        self.assertNotIn('permissions', claims)
+        with self.app.app_context():
+            self.assertEqual(permission_bits.names(decode_mask(claims['permission_mask'])), {'role:list'})
+            self.assertEqual(claims['catalog_version'], permission_bits.version)
+        
+        # Authorization must come from the claims alone
+        with mock.patch('routes.get_principal', side_effect=AssertionError('principal lookup')):
+            response = self.client.get(
+                '/api/roles',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_permission_required_denies_missing_claim(self):
+        """Test that a token without the permission claim is denied"""
+        with mock.patch('routes.get_principal', side_effect=AssertionError('principal lookup')):
+            response = self.client.get(
+                '/api/roles',
+                headers={'Authorization': f'Bearer {self.plain_token}'}
+            )
+        self.assertEqual(response.status_code, 403)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
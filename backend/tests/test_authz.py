@@ -0,0 +1,137 @@
+import unittest
+import json
+import os
+import sys
+import uuid
+from unittest import mock
+
+from sqlalchemy import event
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission
+from principal_cache import principal_cache, get_principals
+from rate_limits import limiter
+
+class AuthzCheckTestCase(unittest.TestCase):
+    """Test cases for the batch authorization endpoint"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            check = Permission(name='authz:check', resource='authz', action='check')
+            read = Permission(name='report:read', resource='report', action='read')
+            write = Permission(name='report:write', resource='report', action='write')
+            service = User(email='service@test.com', is_active=True, is_admin=False, role='user',
+                           roles=[Role(name='service', permissions=[check])])
+            reader = User(email='reader@test.com', is_active=True, is_admin=False, role='user',
+                          roles=[Role(name='reader', permissions=[read])])
+            inactive = User(email='inactive@test.com', is_active=False, is_admin=False, role='user',
+                            roles=[Role(name='writer', permissions=[write])])
+            admin = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            plain = User(email='plain@test.com', is_active=True, is_admin=False, role='user')
+            for user in (service, reader, inactive, admin, plain):
+                user.set_password('password123')
+            db.session.add_all([service, reader, inactive, admin, plain])
+            db.session.commit()
+            
+            self.service_token = service.generate_auth_token()
+            self.plain_token = plain.generate_auth_token()
+            self.reader_id, self.inactive_id, self.admin_id = str(reader.id), str(inactive.id), str(admin.id)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def check(self, checks, token=None):
+        return self.client.post(
+            '/api/authz/check',
+            data=json.dumps({'checks': checks}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token or self.service_token}'}
+        )
+
+    def test_batch_decisions(self):
+        """Test that each tuple is decided in request order"""
+        unknown = str(uuid.uuid4())
+        response = self.check([
+            {'subject': self.reader_id, 'resource': 'report', 'action': 'read'},
+            {'subject': self.reader_id, 'resource': 'report', 'action': 'write'},
+            {'subject': self.inactive_id, 'resource': 'report', 'action': 'write'},
+            {'subject': self.admin_id, 'resource': 'anything', 'action': 'delete'},
+            {'subject': unknown, 'resource': 'report', 'action': 'read'},
+            {'subject': 'not-a-uuid', 'resource': 'report', 'action': 'read'}
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.data)['results']
+        self.assertEqual([result['allowed'] for result in results], [True, False, False, True, False, False])
+        self.assertEqual(results[1]['reason'], 'permission not granted')
+        self.assertEqual(results[2]['reason'], 'subject is deactivated')
+        self.assertEqual(results[4]['reason'], 'unknown subject')
+        self.assertNotIn('reason', results[0])
+
+    def test_batch_loads_subjects_in_one_query(self):
+        """Test that a batch of uncached subjects costs one query"""
+        checks = [
+            {'subject': subject, 'resource': 'report', 'action': action}
+            for subject in (self.reader_id, self.inactive_id, self.admin_id)
+            for action in ('read', 'write')
+        ]
+        self.check(checks[:1])  # warm the caller's own principal
+        principal_cache.clear()
+        with self.app.app_context():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                principals = get_principals([check['subject'] for check in checks])
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(len(principals), 3)
+
+    def test_requires_permission(self):
+        """Test that callers need authz:check"""
+        response = self.check([{'subject': self.reader_id, 'resource': 'report', 'action': 'read'}], self.plain_token)
+        self.assertEqual(response.status_code, 403)
+
+    def test_rate_limited_per_principal(self):
+        """Test that the endpoint has its own budget per caller instead of the per-IP default"""
+        limiter.reset()
+        check = [{'subject': self.reader_id, 'resource': 'report', 'action': 'read'}]
+        try:
+            statuses = {self.check(check).status_code for _ in range(60)}
+            self.assertEqual(statuses, {200})
+            
+            with mock.patch.dict(self.app.config, {'AUTHZ_RATE_LIMIT': '2 per minute'}):
+                limiter.reset()
+                self.assertEqual(self.check(check).status_code, 200)
+                self.assertEqual(self.check(check).status_code, 200)
+                self.assertEqual(self.check(check).status_code, 429)
+                # Another principal from the same address is unaffected
+                self.assertEqual(self.check(check, self.plain_token).status_code, 403)
+        finally:
+            limiter.reset()
+
+    def test_invalid_batches(self):
+        """Test that malformed or oversized batches are rejected"""
+        self.assertEqual(self.check([]).status_code, 400)
+        self.assertEqual(self.check([{'subject': self.reader_id, 'resource': 'report'}]).status_code, 400)
+        
+        with mock.patch.dict(self.app.config, {'AUTHZ_MAX_CHECKS': 2}):
+            check = {'subject': self.reader_id, 'resource': 'report', 'action': 'read'}
+            self.assertEqual(self.check([check] * 3).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
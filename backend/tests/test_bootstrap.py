@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission, role_permissions
+from bootstrap import seed, migrate_schema, CREATE_ALL_REVISION
+from catalog import load_catalog
+
+class BootstrapTestCase(unittest.TestCase):
+    """Test cases for the out-of-band bootstrap seeding"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_seed_creates_defaults(self):
+        """Test that seeding an empty database creates roles, permissions and admin"""
+        with self.app.app_context():
+            diff, admin_created = seed('admin@test.com', 'admin123')
+            permission_count = len(load_catalog().permissions)
+            self.assertTrue(admin_created)
+            self.assertEqual(len(diff.permissions_created), permission_count)
+            self.assertEqual(sorted(diff.roles_created), ['admin', 'user'])
+            self.assertEqual(len(diff.grants_added), permission_count + 3)
+            
+            admin = User.query.filter_by(email='admin@test.com').first()
+            self.assertTrue(admin.is_admin)
+            self.assertTrue(admin.check_password('admin123'))
+            self.assertEqual([role.name for role in admin.roles], ['admin'])
+            
+            user_role = Role.query.filter_by(name='user').first()
+            self.assertEqual(
+                sorted(p.name for p in user_role.permissions),
+                ['group:list', 'group:read', 'user:read']
+            )
+
+    def test_create_all_database_is_stamped_before_later_migrations(self):
+        """Test that a create_all() database is stamped at the last revision it could match, not head"""
+        with self.app.app_context():
+            with mock.patch('flask_migrate.stamp') as stamp, mock.patch('flask_migrate.upgrade') as upgrade:
+                migrate_schema()
+        stamp.assert_called_once_with(revision=CREATE_ALL_REVISION)
+        self.assertEqual(CREATE_ALL_REVISION, '0003_audit_log_indexes')
+        upgrade.assert_called_once_with()
+
+    def test_seed_is_idempotent(self):
+        """Test that seeding again only fills in what is missing"""
+        with self.app.app_context():
+            seed('admin@test.com', 'admin123')
+            diff, admin_created = seed('admin@test.com', 'changed')
+            self.assertFalse(diff)
+            self.assertFalse(admin_created)
+            self.assertTrue(User.query.filter_by(email='admin@test.com').first().check_password('admin123'))
+            
+            permission = Permission.query.filter_by(name='audit:list').first()
+            db.session.execute(role_permissions.delete().where(role_permissions.c.permission_id == permission.id))
+            db.session.delete(permission)
+            db.session.commit()
+            
+            diff, _ = seed('admin@test.com', 'admin123')
+            self.assertEqual(diff.permissions_created, ['audit:list'])
+            self.assertEqual(diff.grants_added, ['admin audit:list'])
+            self.assertEqual(Permission.query.count(), len(load_catalog().permissions))
+
+    def test_bootstrap_command(self):
+        """Test the flask ixion bootstrap command"""
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['ixion', 'bootstrap', '--skip-migrate'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('roles created: admin', result.output)
+        self.assertIn('Created admin user', result.output)
+        
+        result = runner.invoke(args=['ixion', 'bootstrap', '--skip-migrate'])
+        self.assertIn('Database already bootstrapped.', result.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import Role, Permission
+from catalog import parse_catalog, sync_catalog, CatalogError
+
+MANIFEST = {
+    'resources': {
+        'report': {'list': 'List reports', 'read': 'View reports'},
+        'widget': {'list': 'List widgets'}
+    },
+    'roles': {
+        'auditor': {'description': 'Read-only auditor', 'grants': ['report:*']},
+        'owner': {'description': 'Owns everything', 'grants': ['*']}
+    }
+}
+
+class CatalogParseTestCase(unittest.TestCase):
+    """Test cases for parsing the permission catalog manifest"""
+
+    def test_expands_grants(self):
+        """Test that wildcard grants expand to catalog permission names"""
+        catalog = parse_catalog(MANIFEST)
+        self.assertEqual(sorted(catalog.permissions), ['report:list', 'report:read', 'widget:list'])
+        self.assertEqual(catalog.roles['auditor'].grants, {'report:list', 'report:read'})
+        self.assertEqual(catalog.roles['owner'].grants, set(catalog.permissions))
+
+    def test_unknown_grant_rejected(self):
+        """Test that a grant of an undeclared permission is an error"""
+        with self.assertRaises(CatalogError):
+            parse_catalog({'resources': {}, 'roles': {'r': {'grants': ['report:list']}}})
+
+class CatalogSyncTestCase(unittest.TestCase):
+    """Test cases for the diff-based catalog sync"""
+
+    def setUp(self):
+        """Set up test database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_sync_creates_then_noop(self):
+        """Test that a first sync creates everything and a second changes nothing"""
+        with self.app.app_context():
+            diff = sync_catalog(parse_catalog(MANIFEST))
+            self.assertEqual(sorted(diff.permissions_created), ['report:list', 'report:read', 'widget:list'])
+            self.assertEqual(sorted(diff.roles_created), ['auditor', 'owner'])
+            self.assertEqual(len(diff.grants_added), 5)
+            
+            auditor = Role.query.filter_by(name='auditor').first()
+            self.assertTrue(auditor.is_system_role)
+            self.assertEqual(sorted(p.name for p in auditor.permissions), ['report:list', 'report:read'])
+            
+            self.assertFalse(sync_catalog(parse_catalog(MANIFEST)))
+
+    def test_sync_updates_and_dry_run(self):
+        """Test that changed descriptions are updated, and dry runs change nothing"""
+        manifest = {
+            'resources': {'report': {'list': 'List all reports', 'read': 'View reports'}, 'widget': {'list': 'List widgets'}},
+            'roles': MANIFEST['roles']
+        }
+        with self.app.app_context():
+            sync_catalog(parse_catalog(MANIFEST))
+            
+            diff = sync_catalog(parse_catalog(manifest), dry_run=True)
+            self.assertEqual(diff.permissions_updated, ['report:list'])
+            self.assertEqual(Permission.query.filter_by(name='report:list').first().description, 'List reports')
+            
+            sync_catalog(parse_catalog(manifest))
+            self.assertEqual(Permission.query.filter_by(name='report:list').first().description, 'List all reports')
+
+    def test_prune_removes_only_catalog_resources(self):
+        """Test that pruning revokes unlisted grants and drops undeclared catalog permissions"""
+        with self.app.app_context():
+            sync_catalog(parse_catalog(MANIFEST))
+            db.session.add(Permission(name='custom:run', description='Custom', resource='custom', action='run'))
+            db.session.commit()
+            
+            manifest = {
+                'resources': {'report': {'list': 'List reports'}, 'widget': {'list': 'List widgets'}},
+                'roles': {'auditor': MANIFEST['roles']['auditor'], 'owner': {'description': 'Owns everything', 'grants': ['widget:list']}}
+            }
+            diff = sync_catalog(parse_catalog(manifest))
+            self.assertEqual(diff.permissions_removed, [])
+            self.assertEqual(diff.grants_revoked, [])
+            
+            diff = sync_catalog(parse_catalog(manifest), prune=True)
+            self.assertEqual(diff.permissions_removed, ['report:read'])
+            self.assertEqual(sorted(diff.grants_revoked), ['auditor report:read', 'owner report:list', 'owner report:read'])
+            self.assertIsNotNone(Permission.query.filter_by(name='custom:run').first())
+            self.assertIsNone(Permission.query.filter_by(name='report:read').first())
+            
+            owner = Role.query.filter_by(name='owner').first()
+            self.assertEqual([p.name for p in owner.permissions], ['widget:list'])
+
+if __name__ == '__main__':
+    unittest.main()
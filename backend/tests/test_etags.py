@@ -0,0 +1,170 @@
+import unittest
+import json
+import os
+import sys
+import uuid
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from catalog import parse_catalog, sync_catalog
+from models import User, Role, Permission
+from principal_cache import principal_cache
+from resource_versions import bump_versions, etag, user_etag, touch_users, ROLES, PERMISSIONS
+from query_budget import count_queries
+
+class ETagTestCase(unittest.TestCase):
+    """Test cases for ETags and conditional GETs"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            read = Permission(name='report:read', resource='report', action='read')
+            admin = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin.set_password('admin123')
+            user = User(email='user@test.com', is_active=True, is_admin=False, role='user')
+            user.set_password('user123')
+            db.session.add_all([admin, user, Role(name='reader', permissions=[read])])
+            db.session.commit()
+            self.admin_token = admin.generate_auth_token()
+            self.user_token = user.generate_auth_token()
+            self.admin_id, self.user_id = str(admin.id), str(user.id)
+            self.engine = db.engine
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def get(self, url, tag=None, token=None):
+        headers = {'Authorization': f'Bearer {token or self.admin_token}'}
+        if tag:
+            headers['If-None-Match'] = tag
+        return self.client.get(url, headers=headers)
+
+    def test_conditional_get_skips_loading(self):
+        """Test that a current ETag gets a 304 after one version lookup"""
+        for url in ('/api/roles', '/api/permissions'):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            tag = response.headers['ETag']
+            self.assertFalse(tag.startswith('W/'))
+            self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+            
+            with count_queries(self.engine) as statements:
+                response = self.get(url, tag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers['ETag'], tag)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(len(statements), 1)
+            self.assertIn('resource_versions', statements[0])
+
+    def test_writes_change_etags(self):
+        """Test that mutations move the affected ETags only"""
+        roles_tag = self.get('/api/roles').headers['ETag']
+        permissions_tag = self.get('/api/permissions').headers['ETag']
+        
+        response = self.client.post(
+            '/api/permissions',
+            data=json.dumps({'name': 'report:write', 'resource': 'report', 'action': 'write'}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(response.status_code, 201)
+        # Role summaries embed permissions, so both collections changed
+        self.assertEqual(self.get('/api/permissions', permissions_tag).status_code, 200)
+        response = self.get('/api/roles', roles_tag)
+        self.assertEqual(response.status_code, 200)
+        roles_tag = response.headers['ETag']
+        
+        with self.app.app_context():
+            role_id = str(db.session.execute(db.select(Role.id)).scalar())
+        self.client.post(
+            f'/api/roles/{role_id}/members',
+            data=json.dumps({'user_ids': [self.user_id]}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(self.get('/api/roles', roles_tag).status_code, 304)
+
+    def test_user_etag(self):
+        """Test conditional GETs on a single user"""
+        response = self.get(f'/api/users/{self.user_id}', token=self.user_token)
+        tag = response.headers['ETag']
+        response = self.get(f'/api/users/{self.user_id}', tag, self.user_token)
+        self.assertEqual(response.status_code, 304)
+        
+        # Authorization is decided before the ETag
+        response = self.get(f'/api/users/{self.admin_id}', tag, self.user_token)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get('/api/users/not-a-uuid').status_code, 404)
+        
+        # Role memberships are part of the user
+        with self.app.app_context():
+            role_id = str(db.session.execute(db.select(Role.id)).scalar())
+        self.client.post(
+            f'/api/roles/{role_id}/members',
+            data=json.dumps({'user_ids': [self.user_id]}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        response = self.get(f'/api/users/{self.user_id}', tag, self.user_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([role['name'] for role in json.loads(response.data)['roles']], ['reader'])
+
+    def test_login_touches_only_its_user(self):
+        """Test that logging in changes that user's ETag without bumping any collection"""
+        with self.app.app_context():
+            user_tag, admin_tag = user_etag(self.user_id), user_etag(self.admin_id)
+            collections_tag = etag(ROLES, PERMISSIONS)
+        
+        with count_queries(self.engine) as statements:
+            self.client.post(
+                '/api/auth/login',
+                data=json.dumps({'email': 'user@test.com', 'password': 'user123'}),
+                content_type='application/json'
+            )
+        self.assertFalse([s for s in statements if 'resource_versions' in s])
+        with self.app.app_context():
+            # last_login is part of the user, so its own tag moves
+            self.assertNotEqual(user_etag(self.user_id), user_tag)
+            self.assertEqual(user_etag(self.admin_id), admin_tag)
+            self.assertEqual(etag(ROLES, PERMISSIONS), collections_tag)
+
+    def test_user_version_counts_writes(self):
+        """Test that each write to a user advances its version by one, whatever the clock says"""
+        with self.app.app_context():
+            user = db.session.get(User, uuid.UUID(self.user_id))
+            start = user.version
+            user.first_name = 'First'
+            db.session.commit()
+            touch_users(User.id == user.id)
+            db.session.commit()
+            db.session.refresh(user)
+            self.assertEqual(user.version, start + 2)
+            self.assertTrue(user_etag(self.user_id).startswith(f'u{start + 2}-'))
+
+    def test_bump_versions(self):
+        """Test that versions start on first bump and only increase"""
+        with self.app.app_context():
+            self.assertEqual(etag(ROLES, PERMISSIONS), 'r0-p0')
+            bump_versions(ROLES, PERMISSIONS, ROLES)
+            db.session.commit()
+            bump_versions(PERMISSIONS)
+            db.session.commit()
+            self.assertEqual(etag(ROLES, PERMISSIONS), 'r1-p2')
+            
+            sync_catalog(parse_catalog({'resources': {'report': {'read': 'Read reports'}}}))
+            self.assertEqual(etag(PERMISSIONS), 'p3')
+
+if __name__ == '__main__':
+    unittest.main()
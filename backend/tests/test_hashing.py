@@ -0,0 +1,184 @@
+import unittest
+import json
+import os
+import sys
+import threading
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User
+from hashing import PasswordHasher, HashingUnavailable, password_hasher, hash_parameters, calibrate
+
+class PasswordHasherTestCase(unittest.TestCase):
+    """Test cases for the bounded password hashing service"""
+
+    def test_pool_hashes_verify(self):
+        """Test that hashes made in the process pool verify"""
+        hasher = PasswordHasher()
+        hasher.configure(workers=1, queue_size=0)
+        try:
+            password_hash = hasher.hash('s3cret')
+            self.assertTrue(hasher.verify('s3cret', password_hash))
+            self.assertFalse(hasher.verify('wrong', password_hash))
+        finally:
+            hasher.shutdown()
+
+    def test_hash_many(self):
+        """Test that batch hashing spreads across the pool and keeps order"""
+        hasher = PasswordHasher()
+        hasher.configure(workers=2, queue_size=0)
+        hasher.rounds = 4
+        try:
+            passwords = [f'pw{i}' for i in range(10)]
+            hashes = hasher.hash_many(passwords)
+            self.assertEqual(len(hashes), 10)
+            self.assertTrue(all(hasher.verify(p, h) for p, h in zip(passwords, hashes)))
+            self.assertFalse(hasher.verify('pw0', hashes[1]))
+        finally:
+            hasher.shutdown()
+
+    def test_saturated_hasher_rejects(self):
+        """Test that requests beyond capacity are rejected immediately"""
+        hasher = PasswordHasher()
+        hasher.configure(workers=0, queue_size=0, retry_after=3)
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_hash(password):
+            started.set()
+            release.wait(5)
+            return password
+        
+        worker = threading.Thread(target=hasher._run, args=(slow_hash, 'first'))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingUnavailable) as raised:
+                hasher.hash('second')
+            self.assertEqual(raised.exception.retry_after, 3)
+            self.assertEqual(hasher.stats()['rejected'], 1)
+        finally:
+            release.set()
+            worker.join()
+
+    def test_timed_out_hash_keeps_its_slot(self):
+        """Test that a request giving up on a hash does not free the slot the pool still uses"""
+        hasher = PasswordHasher()
+        hasher.configure(workers=1, queue_size=0, timeout=0.05)
+        hasher.rounds = 14
+        try:
+            with self.assertRaises(HashingUnavailable):
+                hasher.hash('first')
+            self.assertEqual(hasher.stats()['in_flight'], 1)
+            with self.assertRaises(HashingUnavailable):
+                hasher.hash('second')
+            self.assertEqual(hasher.stats()['rejected'], 1)
+        finally:
+            hasher.shutdown()
+        self.assertEqual(hasher.stats()['in_flight'], 0)
+
+    def test_hash_records_policy_rounds(self):
+        """Test that new hashes carry the configured cost and older ones need a rehash"""
+        hasher = PasswordHasher()
+        hasher.configure(workers=0, queue_size=0)
+        hasher.rounds = 4
+        password_hash = hasher.hash('s3cret')
+        self.assertEqual(hash_parameters(password_hash), ('2b', 4))
+        self.assertFalse(hasher.needs_rehash(password_hash))
+        
+        hasher.rounds = 5
+        self.assertTrue(hasher.needs_rehash(password_hash))
+        self.assertTrue(hasher.needs_rehash('not-a-hash'))
+
+    def test_calibrate_stays_within_target(self):
+        """Test that calibration stops at the first cost over the target"""
+        rounds, timings = calibrate(0, max_rounds=6, samples=1)
+        self.assertEqual(rounds, 4)
+        self.assertEqual(len(timings), 1)
+
+class HashingRouteTestCase(unittest.TestCase):
+    """Test cases for routes when hashing is saturated"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        
+        with self.app.app_context():
+            db.create_all()
+            user = User(email='user@test.com', is_active=True, is_admin=False, role='user')
+            user.set_password('user123')
+            admin = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin.set_password('admin123')
+            db.session.add_all([user, admin])
+            db.session.commit()
+            self.user_token = user.generate_auth_token()
+            self.admin_token = admin.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_login_returns_503_when_saturated(self):
+        """Test that login answers 503 with Retry-After when hashing is full"""
+        original_run = password_hasher._run
+        def saturated(fn, *args):
+            raise HashingUnavailable(2)
+        password_hasher._run = saturated
+        try:
+            response = self.client.post(
+                '/api/auth/login',
+                data=json.dumps({'email': 'user@test.com', 'password': 'user123'}),
+                content_type='application/json'
+            )
+        finally:
+            password_hasher._run = original_run
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '2')
+
+    def test_login_rehashes_outdated_hash(self):
+        """Test that a successful login upgrades a hash made at another cost"""
+        original_rounds = password_hasher.rounds
+        password_hasher.rounds = 4
+        try:
+            with self.app.app_context():
+                user = User.query.filter_by(email='user@test.com').first()
+                user.set_password('user123')
+                db.session.commit()
+            
+            password_hasher.rounds = 5
+            response = self.client.post(
+                '/api/auth/login',
+                data=json.dumps({'email': 'user@test.com', 'password': 'user123'}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+            
+            with self.app.app_context():
+                user = User.query.filter_by(email='user@test.com').first()
+                self.assertEqual(hash_parameters(user.password_hash), ('2b', 5))
+                self.assertTrue(user.check_password('user123'))
+        finally:
+            password_hasher.rounds = original_rounds
+
+    def test_hashing_stats_are_admin_only(self):
+        """Test that pool stats are served only to admins and not in the public status"""
+        status = json.loads(self.client.get('/api/system/status').data)
+        self.assertNotIn('hashing', status)
+        
+        self.assertEqual(self.client.get('/api/system/hashing').status_code, 401)
+        response = self.client.get('/api/system/hashing', headers={'Authorization': f'Bearer {self.user_token}'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/system/hashing', headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), password_hasher.stats())
+
+if __name__ == '__main__':
+    unittest.main()
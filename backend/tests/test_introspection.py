@@ -0,0 +1,168 @@
+import unittest
+import json
+import os
+import sys
+from unittest import mock
+
+from sqlalchemy import event
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission
+from principal_cache import principal_cache
+from revocation import revocation_filter
+from rate_limits import limiter
+from tokens import token_service
+
+class IntrospectionTestCase(unittest.TestCase):
+    """Test cases for the token introspection endpoint"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        revocation_filter.reset()
+        
+        with self.app.app_context():
+            db.create_all()
+            introspect = Permission(name='token:introspect', resource='token', action='introspect')
+            read = Permission(name='report:read', resource='report', action='read')
+            gateway = User(email='gateway@test.com', is_active=True, is_admin=False, role='user',
+                           roles=[Role(name='gateway', permissions=[introspect])])
+            reader = User(email='reader@test.com', is_active=True, is_admin=False, role='user',
+                          roles=[Role(name='reader', permissions=[read])])
+            inactive = User(email='inactive@test.com', is_active=False, is_admin=False, role='user')
+            for user in (gateway, reader, inactive):
+                user.set_password('password123')
+            db.session.add_all([gateway, reader, inactive])
+            db.session.commit()
+            
+            self.gateway_token = gateway.generate_auth_token()
+            self.reader_token = reader.generate_auth_token()
+            self.short_token = reader.generate_auth_token(expiration=3)
+            self.expired_token = reader.generate_auth_token(expiration=-10)
+            self.inactive_token = inactive.generate_auth_token()
+            self.reader_id = str(reader.id)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        revocation_filter.reset()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def introspect(self, body, token=None):
+        return self.client.post(
+            '/api/oauth/introspect',
+            data=json.dumps(body),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token or self.gateway_token}'}
+        )
+
+    def test_single_form_encoded_token(self):
+        """Test an RFC 7662 style form request"""
+        response = self.client.post(
+            '/api/oauth/introspect',
+            data={'token': self.reader_token},
+            headers={'Authorization': f'Bearer {self.gateway_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['active'])
+        self.assertEqual(data['sub'], self.reader_id)
+        self.assertEqual(data['username'], 'reader@test.com')
+        self.assertEqual(data['scope'], 'report:read')
+        self.assertEqual(data['token_type'], 'access_token')
+        self.assertEqual(response.headers['Cache-Control'], f"private, max-age={self.app.config['INTROSPECTION_MAX_AGE']}")
+
+    def test_batch_in_request_order(self):
+        """Test that every kind of dead token comes back inactive"""
+        login = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'email': 'reader@test.com', 'password': 'password123'}),
+            content_type='application/json'
+        )
+        revoked = json.loads(login.data)['token']
+        self.client.post('/api/auth/logout', headers={'Authorization': f'Bearer {revoked}'})
+        
+        response = self.introspect({'tokens': [
+            self.reader_token, self.expired_token, 'garbage', revoked, self.inactive_token, self.short_token
+        ]})
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.data)['results']
+        self.assertEqual([result['active'] for result in results], [True, False, False, False, False, True])
+        self.assertEqual(results[1], {'active': False})
+        # Capped by the token that expires first
+        max_age = int(response.headers['Cache-Control'].rpartition('=')[2])
+        self.assertLessEqual(max_age, 3)
+
+    def test_token_without_expiry(self):
+        """Test that a validly signed token without exp is introspected without one"""
+        with self.app.app_context():
+            token = token_service.encode({'user_id': self.reader_id})
+        response = self.introspect({'token': token})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['active'])
+        self.assertNotIn('exp', data)
+        self.assertEqual(response.headers['Cache-Control'], f"private, max-age={self.app.config['INTROSPECTION_MAX_AGE']}")
+
+    def test_inactive_only_batch_is_cacheable(self):
+        """Test that dead tokens do not shorten the cache lifetime"""
+        response = self.introspect({'tokens': [self.expired_token, 'garbage']})
+        self.assertEqual(response.headers['Cache-Control'], f"private, max-age={self.app.config['INTROSPECTION_MAX_AGE']}")
+
+    def test_repeat_batch_skips_database(self):
+        """Test that a repeated batch is answered from the worker's caches"""
+        interval = revocation_filter.refresh_interval
+        revocation_filter.refresh_interval = 3600
+        try:
+            body = {'tokens': [self.reader_token, self.inactive_token, self.expired_token]}
+            self.introspect(body)
+            with self.app.app_context():
+                statements = []
+                listener = lambda *args: statements.append(args[2])
+                event.listen(db.engine, 'before_cursor_execute', listener)
+                try:
+                    response = self.introspect(body)
+                finally:
+                    event.remove(db.engine, 'before_cursor_execute', listener)
+        finally:
+            revocation_filter.refresh_interval = interval
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(statements, [])
+
+    def test_rate_limited_per_principal(self):
+        """Test that gateways get their own budget instead of the per-IP default"""
+        limiter.reset()
+        try:
+            statuses = {self.introspect({'token': self.reader_token}).status_code for _ in range(60)}
+            self.assertEqual(statuses, {200})
+            
+            with mock.patch.dict(self.app.config, {'INTROSPECTION_RATE_LIMIT': '1 per minute'}):
+                limiter.reset()
+                self.assertEqual(self.introspect({'token': self.reader_token}).status_code, 200)
+                self.assertEqual(self.introspect({'token': self.reader_token}).status_code, 429)
+        finally:
+            limiter.reset()
+
+    def test_requires_permission(self):
+        """Test that callers need token:introspect"""
+        response = self.introspect({'token': self.gateway_token}, self.reader_token)
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_requests(self):
+        """Test that malformed or oversized requests are rejected"""
+        self.assertEqual(self.introspect({}).status_code, 400)
+        self.assertEqual(self.introspect({'tokens': []}).status_code, 400)
+        self.assertEqual(self.introspect({'tokens': [1]}).status_code, 400)
+        too_many = ['x'] * (self.app.config['INTROSPECTION_MAX_TOKENS'] + 1)
+        self.assertEqual(self.introspect({'tokens': too_many}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import jwt
+import os
+import sys
+import uuid
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission
+from catalog import load_catalog, parse_catalog, sync_catalog
+from permission_bits import permission_bits, encode_mask, decode_mask, mask_of
+from principal_cache import principal_cache, load_principal
+
+class MaskEncodingTestCase(unittest.TestCase):
+    """Test cases for the token encoding of permission masks"""
+
+    def test_round_trip(self):
+        """Test that masks survive base64 encoding"""
+        for mask in (0, 1, 0b1011, 1 << 63, (1 << 200) - 1):
+            self.assertEqual(decode_mask(encode_mask(mask)), mask)
+        self.assertEqual(encode_mask(0), '')
+        self.assertEqual(mask_of([0, 3]), 0b1001)
+
+class PermissionBitsTestCase(unittest.TestCase):
+    """Test cases for permission bit assignment and mask checks"""
+
+    def setUp(self):
+        """Set up test database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_bits_are_never_reused(self):
+        """Test that bits are assigned in order and not handed out again"""
+        with self.app.app_context():
+            first = Permission(name='report:read', resource='report', action='read')
+            second = Permission(name='report:write', resource='report', action='write')
+            db.session.add_all([first, second])
+            db.session.commit()
+            self.assertEqual(sorted([first.bit, second.bit]), [0, 1])
+            
+            db.session.delete(second)
+            db.session.commit()
+            third = Permission(name='report:delete', resource='report', action='delete')
+            db.session.add(third)
+            db.session.commit()
+            self.assertEqual(third.bit, 2)
+            self.assertEqual(permission_bits.version, 3)
+
+    def test_catalog_sync_keeps_existing_bits(self):
+        """Test that a catalog sync numbers only new permissions"""
+        with self.app.app_context():
+            db.session.add(Permission(name='report:list', resource='report', action='list'))
+            db.session.commit()
+            sync_catalog(parse_catalog({'resources': {'report': {'list': 'List', 'read': 'Read'}}}))
+            bits = dict(db.session.execute(db.select(Permission.name, Permission.bit)).all())
+            self.assertEqual(bits, {'report:list': 0, 'report:read': 1})
+
+    def test_checks_are_bitwise(self):
+        """Test that principals carry a mask of their effective permissions"""
+        with self.app.app_context():
+            read = Permission(name='report:read', resource='report', action='read')
+            write = Permission(name='report:write', resource='report', action='write')
+            user = User(email='user@test.com', is_active=True, is_admin=False, role='user',
+                        roles=[Role(name='reader', permissions=[read])])
+            user.set_password('password123')
+            db.session.add_all([write, user])
+            db.session.commit()
+            
+            principal = load_principal(user.id)
+            self.assertEqual(principal.permissions, 1 << read.bit)
+            self.assertTrue(permission_bits.test(principal.permissions, 'report:read'))
+            self.assertFalse(permission_bits.test(principal.permissions, 'report:write'))
+            self.assertFalse(permission_bits.test(principal.permissions, 'report:missing'))
+
+    def test_wider_mask_reloads_map(self):
+        """Test that a bit unknown to the worker's map triggers a reload"""
+        with self.app.app_context():
+            db.session.add(Permission(name='report:read', resource='report', action='read'))
+            db.session.commit()
+            self.assertEqual(permission_bits.version, 1)
+            
+            # Written by "another worker": no flush in this session to invalidate the map
+            db.session.execute(Permission.__table__.insert(), [{
+                'id': uuid.uuid4(), 'name': 'report:write', 'resource': 'report', 'action': 'write', 'bit': 1
+            }])
+            self.assertTrue(permission_bits.test(0b10, 'report:write'))
+            self.assertEqual(permission_bits.version, 2)
+
+    def test_admin_token_is_compact(self):
+        """Test that a token for every catalog permission carries a short mask"""
+        with self.app.app_context():
+            sync_catalog(load_catalog())
+            admin = User(email='admin@test.com', is_active=True, is_admin=True, role='admin',
+                         roles=[Role.query.filter_by(name='admin').one()])
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+            
+            claims = jwt.decode(admin.generate_auth_token(), os.environ.get('JWT_SECRET'), algorithms=['HS256'])
+            count = Permission.query.count()
+            self.assertEqual(decode_mask(claims['permission_mask']), (1 << count) - 1)
+            self.assertEqual(claims['catalog_version'], count)
+            self.assertLessEqual(len(claims['permission_mask']), (count + 5) // 6 + 1)
+
+if __name__ == '__main__':
+    unittest.main()
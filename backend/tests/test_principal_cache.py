@@ -0,0 +1,121 @@
+import unittest
+import json
+import os
+import sys
+import time
+import uuid
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User
+from principal_cache import PrincipalCache, Principal, principal_cache
+
+def make_principal(user_id):
+    return Principal(id=user_id, email='p@test.com', is_active=True, is_admin=False, permissions=0)
+
+class PrincipalCacheUnitTestCase(unittest.TestCase):
+    """Test cases for the principal cache data structure"""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = PrincipalCache(ttl=60, max_size=2)
+        ids = [uuid.uuid4() for _ in range(3)]
+        for user_id in ids[:2]:
+            cache.put(user_id, make_principal(user_id), cache.version(user_id))
+        
+        # Touch the first entry so the second becomes least recently used
+        self.assertIsNotNone(cache.get(ids[0]))
+        cache.put(ids[2], make_principal(ids[2]), cache.version(ids[2]))
+        
+        self.assertIsNotNone(cache.get(ids[0]))
+        self.assertIsNone(cache.get(ids[1]))
+        self.assertIsNotNone(cache.get(ids[2]))
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        cache = PrincipalCache(ttl=0.01, max_size=10)
+        user_id = uuid.uuid4()
+        cache.put(user_id, make_principal(user_id), cache.version(user_id))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(user_id))
+
+    def test_version_bumps_invalidate(self):
+        """Test that user and role version bumps invalidate entries"""
+        cache = PrincipalCache(ttl=60, max_size=10)
+        user_id = uuid.uuid4()
+        cache.put(user_id, make_principal(user_id), cache.version(user_id))
+        cache.bump_user(user_id)
+        self.assertIsNone(cache.get(user_id))
+        
+        cache.put(user_id, make_principal(user_id), cache.version(user_id))
+        cache.bump_roles()
+        self.assertIsNone(cache.get(user_id))
+
+    def test_stale_load_is_discarded(self):
+        """Test that a snapshot loaded before a version bump is not stored"""
+        cache = PrincipalCache(ttl=60, max_size=10)
+        user_id = uuid.uuid4()
+        stamp = cache.version(user_id)
+        cache.bump_user(user_id)
+        cache.put(user_id, make_principal(user_id), stamp)
+        self.assertIsNone(cache.get(user_id))
+
+class PrincipalCacheIntegrationTestCase(unittest.TestCase):
+    """Test cases for principal cache invalidation through the API"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            regular_user = User(email='user@test.com', is_active=True, is_admin=False, role='user')
+            regular_user.set_password('user123')
+            
+            db.session.add(admin_user)
+            db.session.add(regular_user)
+            db.session.commit()
+            
+            self.admin_token = admin_user.generate_auth_token()
+            self.user_token = regular_user.generate_auth_token()
+            self.user_id = str(regular_user.id)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_deactivated_user_is_rejected(self):
+        """Test that deactivating a user takes effect despite a cached principal"""
+        response = self.client.get(
+            f'/api/users/{self.user_id}',
+            headers={'Authorization': f'Bearer {self.user_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.put(
+            f'/api/users/{self.user_id}',
+            headers={'Authorization': f'Bearer {self.admin_token}'},
+            data=json.dumps({'is_active': False}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.get(
+            f'/api/users/{self.user_id}',
+            headers={'Authorization': f'Bearer {self.user_token}'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
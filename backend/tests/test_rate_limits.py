@@ -0,0 +1,122 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+from app import app, db
+from models import User
+from hashing import password_hasher
+from rate_limits import SQLiteStorage, limiter
+
+class SQLiteStorageTestCase(unittest.TestCase):
+    """Test cases for the host-wide SQLite rate limit storage"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.uri = f"sqlite:///{os.path.join(self.tmpdir.name, 'ratelimit.db')}"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_registered_scheme(self):
+        """Test that limits resolves sqlite:// URIs to the storage"""
+        self.assertIsInstance(storage_from_string(self.uri), SQLiteStorage)
+
+    def test_counters_shared_between_instances(self):
+        """Test that two workers opening the same file see one counter"""
+        first = SQLiteStorage(self.uri)
+        second = SQLiteStorage(self.uri)
+        self.assertEqual(first.incr('key', 60), 1)
+        self.assertEqual(second.incr('key', 60), 2)
+        self.assertEqual(first.get('key'), 2)
+        
+        second.clear('key')
+        self.assertEqual(first.get('key'), 0)
+
+    def test_expired_counter_restarts(self):
+        """Test that an expired counter starts over"""
+        storage = SQLiteStorage(self.uri)
+        storage.incr('key', 60, amount=5)
+        with mock.patch('rate_limits.time.time', return_value=10 ** 10):
+            self.assertEqual(storage.get('key'), 0)
+            self.assertEqual(storage.incr('key', 60), 1)
+
+    def test_sliding_window_across_instances(self):
+        """Test that the sliding window limit holds across workers"""
+        item = parse('3 per minute')
+        workers = [SlidingWindowCounterRateLimiter(SQLiteStorage(self.uri)) for _ in range(3)]
+        self.assertTrue(all(worker.hit(item, 'client') for worker in workers))
+        self.assertFalse(workers[0].hit(item, 'client'))
+        self.assertFalse(workers[1].test(item, 'client'))
+        self.assertTrue(workers[2].hit(item, 'other'))
+
+class LoginThrottleTestCase(unittest.TestCase):
+    """Test cases for login rate limits per IP and per account"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        limiter.reset()
+        
+        with self.app.app_context():
+            db.create_all()
+            for email in ('throttled@test.com', 'other@test.com'):
+                user = User(email=email, is_active=True, is_admin=False, role='user')
+                user.set_password('user123')
+                db.session.add(user)
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        limiter.reset()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email, password):
+        return self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'email': email, 'password': password}),
+            content_type='application/json'
+        )
+
+    def test_account_blocked_after_failed_logins(self):
+        """Test that failed logins lock the account without hashing the blocked attempt"""
+        with mock.patch.dict(self.app.config, {'LOGIN_RATE_LIMIT_ACCOUNT': '2 per minute'}):
+            self.assertEqual(self.login('throttled@test.com', 'wrong').status_code, 401)
+            self.assertEqual(self.login(' Throttled@Test.com', 'wrong').status_code, 401)
+            
+            with mock.patch.object(password_hasher, 'verify') as verify:
+                response = self.login('THROTTLED@test.com', 'user123')
+            self.assertEqual(response.status_code, 429)
+            verify.assert_not_called()
+            
+            # Other accounts from the same client are unaffected
+            self.assertEqual(self.login('other@test.com', 'user123').status_code, 200)
+
+    def test_successful_logins_do_not_count(self):
+        """Test that successful logins leave the failure budget untouched"""
+        with mock.patch.dict(self.app.config, {'LOGIN_RATE_LIMIT_ACCOUNT': '1 per minute'}):
+            self.assertEqual(self.login('other@test.com', 'user123').status_code, 200)
+            self.assertEqual(self.login('other@test.com', 'user123').status_code, 200)
+
+    def test_ip_blocked_after_failed_logins(self):
+        """Test that failed logins across accounts lock out the client IP"""
+        with mock.patch.dict(self.app.config, {'LOGIN_RATE_LIMIT_IP': '2 per minute'}):
+            self.assertEqual(self.login('throttled@test.com', 'wrong').status_code, 401)
+            self.assertEqual(self.login('nobody@test.com', 'wrong').status_code, 401)
+            self.assertEqual(self.login('other@test.com', 'user123').status_code, 429)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import json
+import os
+import sys
+import uuid
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission, AuditLog, role_closure
+from principal_cache import principal_cache
+from permission_bits import permission_bits
+from query_budget import count_queries
+from role_hierarchy import RoleCycleError, set_parents, detach_role, user_permission_mask
+
+class RoleHierarchyTestCase(unittest.TestCase):
+    """Test cases for role inheritance and the closure table"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            read = Permission(name='report:read', resource='report', action='read')
+            write = Permission(name='report:write', resource='report', action='write')
+            approve = Permission(name='report:approve', resource='report', action='approve')
+            role_read = Permission(name='role:read', resource='role', action='read')
+            # viewer <- editor <- manager
+            viewer = Role(name='viewer', permissions=[read, role_read])
+            editor = Role(name='editor', permissions=[write])
+            manager = Role(name='manager', permissions=[approve])
+            
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            user = User(email='user@test.com', is_active=True, is_admin=False, role='user', roles=[manager])
+            user.set_password('user123')
+            db.session.add_all([viewer, editor, manager, admin_user, user])
+            db.session.commit()
+            
+            self.viewer_id, self.editor_id, self.manager_id = str(viewer.id), str(editor.id), str(manager.id)
+            self.user_id = user.id
+            self.admin_token = admin_user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_parent(self, role_id, parent_id):
+        return self.client.post(
+            f'/api/roles/{role_id}/parents',
+            data=json.dumps({'parent_id': parent_id}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+
+    def closure(self):
+        with self.app.app_context():
+            names = {role.id: role.name for role in Role.query.all()}
+            return {
+                (names[ancestor_id], names[descendant_id]): depth
+                for ancestor_id, descendant_id, depth in db.session.execute(db.select(role_closure))
+            }
+
+    def test_new_roles_have_self_rows(self):
+        """Test that every role is its own ancestor at depth 0"""
+        self.assertEqual(self.closure(), {('viewer', 'viewer'): 0, ('editor', 'editor'): 0, ('manager', 'manager'): 0})
+
+    def test_chain_inherits_permissions(self):
+        """Test that permissions flow down a chain of parents"""
+        self.assertEqual(self.add_parent(self.editor_id, self.viewer_id).status_code, 200)
+        self.assertEqual(self.add_parent(self.manager_id, self.editor_id).status_code, 200)
+        
+        closure = self.closure()
+        self.assertEqual(closure[('viewer', 'manager')], 2)
+        self.assertEqual(closure[('editor', 'manager')], 1)
+        self.assertNotIn(('manager', 'viewer'), closure)
+        
+        with self.app.app_context():
+            self.assertEqual(
+                permission_bits.names(user_permission_mask(self.user_id)),
+                {'report:read', 'report:write', 'report:approve', 'role:read'}
+            )
+            self.assertEqual(AuditLog.query.filter_by(action='add_parent').count(), 2)
+        
+        response = self.client.get(
+            f'/api/roles/{self.manager_id}/effective-permissions',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [permission['name'] for permission in json.loads(response.data)],
+            ['report:approve', 'report:read', 'report:write', 'role:read']
+        )
+
+    def test_cycle_is_rejected(self):
+        """Test that an edge closing a cycle returns 409 and changes nothing"""
+        self.add_parent(self.editor_id, self.viewer_id)
+        self.add_parent(self.manager_id, self.editor_id)
+        before = self.closure()
+        
+        self.assertEqual(self.add_parent(self.viewer_id, self.manager_id).status_code, 409)
+        self.assertEqual(self.add_parent(self.viewer_id, self.viewer_id).status_code, 409)
+        self.assertEqual(self.closure(), before)
+        
+        with self.app.app_context():
+            with self.assertRaises(RoleCycleError):
+                set_parents(uuid.UUID(self.viewer_id), [uuid.UUID(self.editor_id)])
+
+    def test_remove_parent_refreshes_descendants(self):
+        """Test that removing an edge drops inherited rows below it"""
+        self.add_parent(self.editor_id, self.viewer_id)
+        self.add_parent(self.manager_id, self.editor_id)
+        
+        response = self.client.delete(
+            f'/api/roles/{self.editor_id}/parents/{self.viewer_id}',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        closure = self.closure()
+        self.assertNotIn(('viewer', 'manager'), closure)
+        self.assertNotIn(('viewer', 'editor'), closure)
+        self.assertEqual(closure[('editor', 'manager')], 1)
+        
+        response = self.client.delete(
+            f'/api/roles/{self.editor_id}/parents/{self.viewer_id}',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_set_parents_and_detach(self):
+        """Test replacing parents and removing a role from the hierarchy"""
+        with self.app.app_context():
+            set_parents(uuid.UUID(self.manager_id), [uuid.UUID(self.viewer_id), uuid.UUID(self.editor_id)])
+            db.session.commit()
+        closure = self.closure()
+        self.assertEqual(closure[('viewer', 'manager')], 1)
+        self.assertEqual(closure[('editor', 'manager')], 1)
+        
+        with self.app.app_context():
+            detach_role(uuid.UUID(self.viewer_id))
+            db.session.commit()
+            self.assertEqual(permission_bits.names(user_permission_mask(self.user_id)), {'report:write', 'report:approve'})
+        self.assertNotIn(('viewer', 'manager'), self.closure())
+
+    def test_refresh_reads_only_the_affected_subtree(self):
+        """Test that an edge change reads edges into its subtree, not the whole hierarchy"""
+        self.add_parent(self.editor_id, self.viewer_id)
+        with self.app.app_context():
+            other = Role(name='other')
+            db.session.add(other)
+            db.session.commit()
+            with count_queries(db.engine) as statements:
+                self.assertEqual(self.add_parent(self.manager_id, self.editor_id).status_code, 200)
+        
+        edge_reads = [s for s in statements if 'FROM role_parents' in s and s.lstrip().startswith('SELECT')]
+        self.assertTrue(edge_reads)
+        self.assertTrue(all('WHERE' in s for s in edge_reads))
+        closure = self.closure()
+        self.assertEqual(closure[('viewer', 'manager')], 2)
+        self.assertEqual([pair for pair in closure if 'other' in pair], [('other', 'other')])
+
+    def test_token_carries_inherited_permissions(self):
+        """Test that an inherited permission authorizes a request"""
+        with self.app.app_context():
+            user_token = db.session.get(User, self.user_id).generate_auth_token()
+        headers = {'Authorization': f'Bearer {user_token}'}
+        
+        response = self.client.get(f'/api/roles/{self.manager_id}/parents', headers=headers)
+        self.assertEqual(response.status_code, 403)
+        
+        self.add_parent(self.manager_id, self.viewer_id)
+        response = self.client.get(f'/api/roles/{self.manager_id}/parents', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([parent['name'] for parent in json.loads(response.data)], ['viewer'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import json
+import os
+import sys
+import uuid
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, AuditLog, user_roles
+from principal_cache import principal_cache
+
+class RoleMembersTestCase(unittest.TestCase):
+    """Test cases for bulk role membership endpoints"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            role = Role(name='auditor', description='Auditor')
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            db.session.add_all([role, admin_user])
+            self.user_ids = []
+            for i in range(4):
+                user = User(email=f'member{i}@test.com', is_active=i != 3, is_admin=False, role='user')
+                user.set_password('user123')
+                db.session.add(user)
+                db.session.flush()
+                self.user_ids.append(str(user.id))
+            db.session.commit()
+            
+            self.role_id = str(role.id)
+            self.admin_token = admin_user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def members(self, method, body, role_id=None):
+        return self.client.open(
+            f'/api/roles/{role_id or self.role_id}/members',
+            method=method,
+            data=json.dumps(body),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+
+    def member_emails(self):
+        with self.app.app_context():
+            role = db.session.get(Role, uuid.UUID(self.role_id))
+            return sorted(user.email for user in role.users)
+
+    def test_add_by_ids_is_idempotent(self):
+        """Test that adding listed users twice adds them once"""
+        response = self.members('POST', {'user_ids': self.user_ids[:2]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'added': 2})
+        
+        response = self.members('POST', {'user_ids': self.user_ids[:3]})
+        self.assertEqual(json.loads(response.data), {'added': 1})
+        self.assertEqual(self.member_emails(), ['member0@test.com', 'member1@test.com', 'member2@test.com'])
+        
+        with self.app.app_context():
+            self.assertEqual(db.session.query(user_roles).count(), 3)
+            logs = AuditLog.query.filter_by(action='add_members').all()
+            self.assertEqual(len(logs), 2)
+
+    def test_add_and_remove_by_filter(self):
+        """Test granting and revoking a role for users matching a filter"""
+        response = self.members('POST', {'filter': {'is_active': True, 'is_admin': 'false'}})
+        self.assertEqual(json.loads(response.data), {'added': 3})
+        
+        response = self.members('DELETE', {'filter': {'role': 'auditor'}})
+        self.assertEqual(json.loads(response.data), {'removed': 3})
+        self.assertEqual(self.member_emails(), [])
+        
+        response = self.members('DELETE', {'filter': {'role': 'auditor'}})
+        self.assertEqual(json.loads(response.data), {'removed': 0})
+
+    def test_filter_all_selects_every_user(self):
+        """Test that an explicit all: true selects the whole directory"""
+        response = self.members('POST', {'filter': {'all': True}})
+        self.assertEqual(json.loads(response.data), {'added': 5})
+
+    def test_remove_by_ids(self):
+        """Test revoking a role from listed users"""
+        self.members('POST', {'user_ids': self.user_ids})
+        response = self.members('DELETE', {'user_ids': self.user_ids[1:]})
+        self.assertEqual(json.loads(response.data), {'removed': 3})
+        self.assertEqual(self.member_emails(), ['member0@test.com'])
+
+    def test_invalid_requests(self):
+        """Test validation of the selection and role"""
+        self.assertEqual(self.members('POST', {}).status_code, 400)
+        self.assertEqual(self.members('POST', {'user_ids': ['not-a-uuid']}).status_code, 400)
+        self.assertEqual(self.members('POST', {'filter': {'email': 'x'}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'user_ids': [], 'filter': {}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'filter': {}}).status_code, 400)
+        self.assertEqual(self.members('DELETE', {'filter': {'all': False}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'filter': {'is_active': 5}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'filter': {'created_from': 123}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'filter': {'role': ['auditor']}}).status_code, 400)
+        self.assertEqual(self.members('POST', {'user_ids': []}, role_id=self.user_ids[0]).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,7 @@ class RolesPermissionsTestCase(unittest.TestCase):
         """Set up test client and database"""
         self.app = app
         self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
         self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.client = self.app.test_client()
         
@@ -0,0 +1,167 @@
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission, AuditLog, UserInvitation
+from principal_cache import principal_cache
+from query_budget import QueryBudgetMixin
+
+class SerializerQueryBudgetTestCase(QueryBudgetMixin, unittest.TestCase):
+    """Test that list endpoints issue a fixed number of queries"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        self.batch = 0
+        
+        with self.app.app_context():
+            db.create_all()
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            db.session.add(admin_user)
+            db.session.commit()
+            
+            self.admin_id = admin_user.id
+            self.admin_token = admin_user.generate_auth_token()
+            self.engine = db.engine
+        
+        self.add_rows(2)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_rows(self, count):
+        """Add `count` users, each with its own role, permission, invitation and log"""
+        with self.app.app_context():
+            for i in range(count):
+                suffix = f'{self.batch}_{i}'
+                permission = Permission(name=f'thing:{suffix}', resource='thing', action=suffix)
+                role = Role(name=f'role_{suffix}')
+                role.permissions.append(permission)
+                user = User(email=f'user_{suffix}@test.com', password_hash='not-a-real-hash')
+                user.roles.append(role)
+                db.session.add_all([permission, role, user])
+                db.session.flush()
+                
+                db.session.add(UserInvitation(
+                    email=f'invitee_{suffix}@test.com',
+                    token=f'token_{suffix}',
+                    role_id=role.id,
+                    invited_by=self.admin_id,
+                    expires_at=datetime.utcnow() + timedelta(days=1)
+                ))
+                db.session.add(AuditLog(user_id=user.id, action='login', resource_type='auth'))
+            db.session.commit()
+        self.batch += 1
+
+    def assertFixedQueries(self, url, budget):
+        """Assert `url` stays within `budget` queries as the row count grows"""
+        counts = []
+        for _ in range(2):
+            principal_cache.clear()
+            with self.assertMaxQueries(budget, self.engine) as statements:
+                response = self.client.get(url, headers={'Authorization': f'Bearer {self.admin_token}'})
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(statements))
+            self.add_rows(5)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_get_users_query_budget(self):
+        """Test listing users with nested roles and permissions"""
+        self.assertFixedQueries('/api/users', 5)
+
+    def test_get_roles_query_budget(self):
+        """Test listing roles with their permissions"""
+        # One of these reads the ETag version counters
+        self.assertFixedQueries('/api/roles', 5)
+
+    def test_list_invitations_query_budget(self):
+        """Test listing invitations with inviter and role"""
+        self.assertFixedQueries('/api/invitations', 3)
+
+    def test_get_audit_logs_query_budget(self):
+        """Test listing audit logs with the acting user"""
+        self.assertFixedQueries('/api/audit-logs', 3)
+
+    def test_sparse_fieldsets_skip_relationships(self):
+        """Test that unrequested relationships are neither loaded nor returned"""
+        for url, budget in (('/api/users?fields=id,email,last_login', 3), ('/api/users?include=roles', 4),
+                            ('/api/roles?fields=id,name', 4), ('/api/invitations?fields=id,email', 3)):
+            with self.subTest(url=url):
+                self.assertFixedQueries(url, budget)
+        
+        response = self.client.get('/api/users?fields=id,email', headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(set(json.loads(response.data)['users'][0]), {'id', 'email'})
+        response = self.client.get('/api/users?include=roles', headers={'Authorization': f'Bearer {self.admin_token}'})
+        user = next(user for user in json.loads(response.data)['users'] if user['roles'])
+        self.assertNotIn('permissions', user['roles'][0])
+        self.assertIn('email', user)
+        response = self.client.get('/api/invitations?fields=email,role_name', headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(set(json.loads(response.data)[0]), {'email', 'role_name'})
+
+    def test_include_expands_nested_relationships(self):
+        """Test dotted include paths and relationships named in fields"""
+        response = self.client.get(
+            '/api/invitations?fields=id,inviter&include=role.permissions',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        invitation = json.loads(response.data)[0]
+        self.assertEqual(set(invitation), {'id', 'inviter', 'role'})
+        self.assertEqual(invitation['role']['permissions'][0]['resource'], 'thing')
+        self.assertNotIn('roles', invitation['inviter'])
+
+    def test_unknown_fields_are_rejected(self):
+        """Test that bad fields or include parameters get a 400"""
+        for url in ('/api/users?fields=password_hash', '/api/users?include=sessions',
+                    '/api/roles?include=permissions.roles', f'/api/users/{self.admin_id}?fields=nope'):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'Authorization': f'Bearer {self.admin_token}'})
+                self.assertEqual(response.status_code, 400)
+
+    def test_normalized_roles(self):
+        """Test that ?shape=normalized matches the default listing with permissions shared"""
+        # Two to load the caller, one for the ETag counters, one for roles and permissions
+        self.assertFixedQueries('/api/roles?shape=normalized', 4)
+        
+        with self.app.app_context():
+            shared = Permission(name='thing:shared', resource='thing', action='shared')
+            for role in Role.query.all():
+                role.permissions.append(shared)
+            db.session.commit()
+        headers = {'Authorization': f'Bearer {self.admin_token}'}
+        data = json.loads(self.client.get('/api/roles?shape=normalized', headers=headers).data)
+        default = json.loads(self.client.get('/api/roles', headers=headers).data)
+        
+        rebuilt = [
+            dict({key: value for key, value in role.items() if key != 'permission_ids'},
+                 permissions=[data['permissions'][permission_id] for permission_id in role['permission_ids']])
+            for role in data['roles']
+        ]
+        key = lambda role: role['id']
+        for role in default:
+            role['permissions'].sort(key=key)
+        for role in rebuilt:
+            role['permissions'].sort(key=key)
+        self.assertEqual(sorted(rebuilt, key=key), sorted(default, key=key))
+        self.assertEqual(len(data['permissions']), len({p['id'] for role in default for p in role['permissions']}))
+
+    def test_normalized_roles_rejects_other_parameters(self):
+        """Test that unknown shapes and sparse fieldsets are refused"""
+        headers = {'Authorization': f'Bearer {self.admin_token}'}
+        self.assertEqual(self.client.get('/api/roles?shape=flat', headers=headers).status_code, 400)
+        self.assertEqual(self.client.get('/api/roles?shape=normalized&fields=id', headers=headers).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
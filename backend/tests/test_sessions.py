@@ -0,0 +1,206 @@
+import unittest
+import datetime
+import json
+import jwt
+import os
+import sys
+import uuid
+
+from sqlalchemy import event
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, UserSession, session_revocations
+from principal_cache import principal_cache
+from revocation import BloomFilter, RevocationFilter, revocation_filter
+
+class SessionsTestCase(unittest.TestCase):
+    """Test cases for sessions, refresh tokens and revocation"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        revocation_filter.reset()
+        
+        with self.app.app_context():
+            db.create_all()
+            admin = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin.set_password('admin123')
+            user = User(email='user@test.com', is_active=True, is_admin=False, role='user')
+            user.set_password('user123')
+            db.session.add_all([admin, user])
+            db.session.commit()
+            self.user_id = str(user.id)
+            self.admin_token = admin.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        revocation_filter.reset()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self):
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'email': 'user@test.com', 'password': 'user123'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)
+
+    def post(self, path, token=None, body=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        return self.client.post(path, data=json.dumps(body or {}), content_type='application/json', headers=headers)
+
+    def get_sessions(self, token):
+        return self.client.get('/api/auth/sessions', headers={'Authorization': f'Bearer {token}'})
+
+    def test_login_issues_short_access_token_and_refresh_token(self):
+        """Test that login opens a session"""
+        data = self.login()
+        self.assertEqual(data['expires_in'], self.app.config['ACCESS_TOKEN_TTL'])
+        claims = jwt.decode(data['token'], os.environ.get('JWT_SECRET'), algorithms=['HS256'])
+        self.assertEqual(data['refresh_token'].split('.')[0], claims['sid'])
+        self.assertIn('jti', claims)
+        lifetime = claims['exp'] - datetime.datetime.utcnow().timestamp()
+        self.assertLessEqual(lifetime, self.app.config['ACCESS_TOKEN_TTL'] + 1)
+        
+        with self.app.app_context():
+            user_session = db.session.get(UserSession, uuid.UUID(claims['sid']))
+            self.assertNotIn(data['refresh_token'].split('.')[1], user_session.refresh_hash)
+
+    def test_refresh_rotates_and_detects_reuse(self):
+        """Test that a refresh token works once and replaying it revokes the session"""
+        data = self.login()
+        response = self.post('/api/auth/refresh', body={'refresh_token': data['refresh_token']})
+        self.assertEqual(response.status_code, 200)
+        refreshed = json.loads(response.data)
+        self.assertNotEqual(refreshed['refresh_token'], data['refresh_token'])
+        self.assertEqual(self.get_sessions(refreshed['token']).status_code, 200)
+        
+        response = self.post('/api/auth/refresh', body={'refresh_token': data['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get_sessions(refreshed['token']).status_code, 401)
+        response = self.post('/api/auth/refresh', body={'refresh_token': refreshed['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+        
+        self.assertEqual(self.post('/api/auth/refresh', body={'refresh_token': 'garbage'}).status_code, 401)
+
+    def test_forged_refresh_secret_leaves_session_usable(self):
+        """Test that a wrong secret for a known session id does not revoke it"""
+        data = self.login()
+        session_id = data['refresh_token'].split('.')[0]
+        response = self.post('/api/auth/refresh', body={'refresh_token': f'{session_id}.forged'})
+        self.assertEqual(response.status_code, 401)
+        
+        self.assertEqual(self.get_sessions(data['token']).status_code, 200)
+        response = self.post('/api/auth/refresh', body={'refresh_token': data['refresh_token']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_revokes_only_current_session(self):
+        """Test that logout cuts off the session's access and refresh tokens"""
+        first, second = self.login(), self.login()
+        self.assertEqual(self.post('/api/auth/logout', first['token']).status_code, 200)
+        
+        self.assertEqual(self.get_sessions(first['token']).status_code, 401)
+        self.assertEqual(self.post('/api/auth/refresh', body={'refresh_token': first['refresh_token']}).status_code, 401)
+        self.assertEqual(self.get_sessions(second['token']).status_code, 200)
+        
+        response = self.client.get('/api/auth/sessions', headers={'Authorization': f"Bearer {second['token']}"})
+        self.assertEqual([s['current'] for s in json.loads(response.data)], [True])
+
+    def test_protected_rejects_revoked_session(self):
+        """Test that /api/protected honors session revocation"""
+        data = self.login()
+        headers = {'Authorization': f"Bearer {data['token']}"}
+        self.assertEqual(self.client.get('/api/protected', headers=headers).status_code, 200)
+        self.assertEqual(self.post('/api/auth/logout', data['token']).status_code, 200)
+        self.assertEqual(self.client.get('/api/protected', headers=headers).status_code, 401)
+
+    def test_logout_all_and_admin_revoke(self):
+        """Test revoking every session of a user"""
+        first, second = self.login(), self.login()
+        response = self.post('/api/auth/logout-all', first['token'])
+        self.assertEqual(json.loads(response.data)['revoked'], 2)
+        self.assertEqual(self.get_sessions(second['token']).status_code, 401)
+        
+        third = self.login()
+        response = self.client.delete(
+            f'/api/users/{self.user_id}/sessions',
+            headers={'Authorization': f'Bearer {self.admin_token}'}
+        )
+        self.assertEqual(json.loads(response.data)['revoked'], 1)
+        self.assertEqual(self.get_sessions(third['token']).status_code, 401)
+
+    def test_other_workers_pick_up_revocations(self):
+        """Test that a separate filter learns of revocations from the log"""
+        data = self.login()
+        session_id = jwt.decode(data['token'], options={'verify_signature': False})['sid']
+        other_worker = RevocationFilter(refresh_interval=3600)
+        with self.app.app_context():
+            self.assertFalse(other_worker.is_revoked(session_id))
+            self.post('/api/auth/logout', data['token'])
+            
+            # Within the refresh interval the worker answers from memory alone
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                self.assertFalse(other_worker.is_revoked(session_id))
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            self.assertEqual(statements, [])
+            
+            other_worker.refresh()
+            self.assertTrue(other_worker.is_revoked(session_id))
+
+    def test_refresh_rereads_sequence_gaps(self):
+        """Test that a seq committed out of order is not skipped"""
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+        ids = [uuid.uuid4() for _ in range(3)]
+        worker = RevocationFilter(refresh_interval=3600)
+        with self.app.app_context():
+            db.session.execute(session_revocations.insert(), [
+                {'seq': 1, 'session_id': ids[0], 'expires_at': expires_at},
+                {'seq': 3, 'session_id': ids[2], 'expires_at': expires_at}
+            ])
+            db.session.commit()
+            worker.refresh()
+            self.assertTrue(worker.is_revoked(ids[2]))
+            self.assertFalse(worker.is_revoked(ids[1]))
+            
+            db.session.execute(session_revocations.insert(), [{'seq': 2, 'session_id': ids[1], 'expires_at': expires_at}])
+            db.session.commit()
+            worker.refresh()
+            self.assertTrue(worker.is_revoked(ids[1]))
+
+    def test_deactivation_revokes_sessions(self):
+        """Test that deactivating a user ends their sessions"""
+        data = self.login()
+        with self.app.app_context():
+            user = db.session.get(User, uuid.UUID(self.user_id))
+            user.is_active = False
+            db.session.commit()
+        self.assertEqual(self.post('/api/auth/refresh', body={'refresh_token': data['refresh_token']}).status_code, 401)
+
+class BloomFilterTestCase(unittest.TestCase):
+    """Test cases for the revocation Bloom filter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(size_bits=4096)
+        keys = [str(uuid.uuid4()) for _ in range(200)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        misses = sum(str(uuid.uuid4()) in bloom for _ in range(1000))
+        self.assertLess(misses, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import base64
+import hashlib
+import hmac
+import json
+import jwt
+import os
+import sys
+import time
+from unittest import mock
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User
+from principal_cache import principal_cache
+from tokens import TokenService, token_service, parse_keys, load_private_key, generate_private_key
+
+class TokenServiceTestCase(unittest.TestCase):
+    """Test cases for the signing keyring and verified-token cache"""
+
+    def setUp(self):
+        self.service = TokenService()
+        self.service.configure({'default': 'old_secret', '2026-10': 'new_secret'}, active_kid='2026-10', max_size=2)
+
+    def test_signs_with_active_kid_and_verifies_any_key(self):
+        """Test that rotation keeps tokens signed with older keys valid"""
+        token = self.service.encode({'sub': 'a', 'exp': time.time() + 60})
+        self.assertEqual(jwt.get_unverified_header(token)['kid'], '2026-10')
+        self.assertEqual(self.service.decode(token)['sub'], 'a')
+        
+        legacy = jwt.encode({'sub': 'b', 'exp': time.time() + 60}, 'old_secret', algorithm='HS256')
+        self.assertEqual(self.service.decode(legacy)['sub'], 'b')
+        
+        self.service.configure({'2026-10': 'new_secret'})
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.service.decode(legacy)
+        unknown = jwt.encode({'sub': 'c'}, 'new_secret', algorithm='HS256', headers={'kid': 'nope'})
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.service.decode(unknown)
+
+    def test_repeat_tokens_skip_verification(self):
+        """Test that a verified token is served from the cache"""
+        token = self.service.encode({'sub': 'a', 'exp': time.time() + 60})
+        self.service.decode(token)
+        with mock.patch('tokens.jwt.decode', side_effect=AssertionError('verified again')):
+            self.assertEqual(self.service.decode(token)['sub'], 'a')
+        
+        forged = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.service.decode(forged)
+
+    def test_cached_tokens_expire_with_exp(self):
+        """Test that a cached token is rejected once it expires"""
+        token = self.service.encode({'sub': 'a', 'exp': time.time() + 1})
+        self.service.decode(token)
+        time.sleep(1.1)
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            self.service.decode(token)
+        self.assertEqual(len(self.service), 0)
+
+    def test_cache_is_bounded(self):
+        """Test that the least recently used token is evicted"""
+        for sub in 'abc':
+            self.service.decode(self.service.encode({'sub': sub, 'exp': time.time() + 60}))
+        self.assertEqual(len(self.service), 2)
+
+    def test_parse_keys(self):
+        """Test the JWT_KEYS format"""
+        self.assertEqual(parse_keys('a:one, b:two:three'), {'a': 'one', 'b': 'two:three'})
+        self.assertEqual(parse_keys(''), {})
+        with self.assertRaises(ValueError):
+            parse_keys('missing-secret')
+
+class AsymmetricSigningTestCase(unittest.TestCase):
+    """Test cases for RS256/EdDSA signing and the published key set"""
+
+    def setUp(self):
+        self.service = TokenService()
+        self.keys = {
+            'rsa-1': load_private_key(generate_private_key('RS256')),
+            'ed-1': load_private_key(generate_private_key('EdDSA')),
+            'default': 'shared_secret'
+        }
+
+    def test_tokens_verify_offline_from_jwks(self):
+        """Test that a resource server can verify with the published keys alone"""
+        for kid, algorithm in (('rsa-1', 'RS256'), ('ed-1', 'EdDSA')):
+            self.service.configure(self.keys, active_kid=kid)
+            token = self.service.encode({'sub': 'a', 'exp': time.time() + 60})
+            self.assertEqual(jwt.get_unverified_header(token)['alg'], algorithm)
+            self.assertEqual(self.service.decode(token)['sub'], 'a')
+            
+            published = {jwk['kid']: jwk for jwk in self.service.jwks['keys']}
+            self.assertEqual(sorted(published), ['ed-1', 'rsa-1'])
+            self.assertNotIn('d', published[kid])
+            public_key = jwt.PyJWK(published[kid]).key
+            self.assertEqual(jwt.decode(token, public_key, algorithms=[algorithm])['sub'], 'a')
+
+    def test_algorithm_is_bound_to_kid(self):
+        """Test that a token must use the algorithm of the key it names"""
+        from cryptography.hazmat.primitives import serialization
+        
+        self.service.configure(self.keys, active_kid='rsa-1')
+        # Classic confusion attack: HMAC signed with the published public key
+        public_pem = self.keys['rsa-1'].verifying.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=')
+        signing_input = encode({'alg': 'HS256', 'typ': 'JWT', 'kid': 'rsa-1'}) + b'.' + encode({'sub': 'a'})
+        signature = base64.urlsafe_b64encode(hmac.new(public_pem, signing_input, hashlib.sha256).digest()).rstrip(b'=')
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.service.decode((signing_input + b'.' + signature).decode())
+        
+        wrong_key = jwt.encode({'sub': 'a'}, self.keys['ed-1'].signing, algorithm='EdDSA', headers={'kid': 'rsa-1'})
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.service.decode(wrong_key)
+
+class SharedVerificationTestCase(unittest.TestCase):
+    """Test cases for the entry points that verify tokens"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        principal_cache.clear()
+        token_service.clear()
+        
+        with self.app.app_context():
+            db.create_all()
+            user = User(email='user@test.com', is_active=True, is_admin=True, role='admin')
+            user.set_password('user123')
+            db.session.add(user)
+            db.session.commit()
+            self.token = user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        token_service.clear()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_entry_points_share_the_cache(self):
+        """Test that /api/protected and token_required verify through the keyring"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        response = self.client.get('/api/protected', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('user@test.com', json.loads(response.data)['message'])
+        
+        with mock.patch('tokens.jwt.decode', side_effect=AssertionError('verified again')):
+            response = self.client.get('/api/users', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.get('/api/protected', headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_jwks_endpoint_is_cacheable(self):
+        """Test that the key set is served with a long Cache-Control"""
+        response = self.client.get('/.well-known/jwks.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'keys': []})
+        self.assertEqual(response.headers['Cache-Control'], f"public, max-age={self.app.config['JWKS_MAX_AGE']}")
+
+if __name__ == '__main__':
+    unittest.main()
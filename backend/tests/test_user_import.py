@@ -0,0 +1,142 @@
+import unittest
+import json
+import os
+import sys
+from unittest import mock
+
+# Add the parent directory to sys.path to import backend modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Role, Permission, AuditLog
+
+class BulkUserImportTestCase(unittest.TestCase):
+    """Test cases for POST /api/users/bulk"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
+        self.client = self.app.test_client()
+        
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Role(name='user', description='Regular user', is_system_role=True))
+            db.session.add(Role(name='auditor', description='Auditor'))
+            admin_user = User(email='admin@test.com', is_active=True, is_admin=True, role='admin')
+            admin_user.set_password('admin123')
+            regular_user = User(email='user@test.com', is_active=True, is_admin=False, role='user')
+            regular_user.set_password('user123')
+            db.session.add_all([admin_user, regular_user])
+            db.session.commit()
+            
+            self.admin_token = admin_user.generate_auth_token()
+            self.user_token = regular_user.generate_auth_token()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def post_import(self, body, content_type, token=None):
+        return self.client.post(
+            '/api/users/bulk',
+            data=body,
+            content_type=content_type,
+            headers={'Authorization': f'Bearer {token or self.admin_token}'}
+        )
+
+    def test_csv_import(self):
+        """Test importing users from CSV with a per-row report"""
+        body = (
+            'email,password,first_name,last_name,is_admin,roles\n'
+            'alice@test.com,pw1,Alice,A,false,user;auditor\n'
+            'bob@test.com,pw2,Bob,B,,\n'
+            'USER@test.com,pw3,Existing,User,,\n'
+            'alice@test.com,pw4,Alice,Again,,\n'
+            ',pw5,No,Email,,\n'
+            'carol@test.com,pw6,Carol,C,,nosuchrole\n'
+        )
+        response = self.post_import(body, 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        
+        report = json.loads(response.data)
+        self.assertEqual((report['created'], report['skipped'], report['failed']), (2, 2, 2))
+        self.assertEqual(
+            [(r['line'], r['status']) for r in report['results']],
+            [(2, 'created'), (3, 'created'), (4, 'skipped'), (5, 'skipped'), (6, 'error'), (7, 'error')]
+        )
+        self.assertEqual(report['results'][5]['message'], 'unknown roles: nosuchrole')
+        
+        with self.app.app_context():
+            alice = User.query.filter_by(email='alice@test.com').first()
+            self.assertEqual(alice.first_name, 'Alice')
+            self.assertFalse(alice.is_admin)
+            self.assertTrue(alice.check_password('pw1'))
+            self.assertEqual(sorted(role.name for role in alice.roles), ['auditor', 'user'])
+            self.assertEqual(str(alice.id), report['results'][0]['id'])
+            
+            # One summarized audit record for the whole import
+            logs = AuditLog.query.filter_by(action='bulk_create').all()
+            self.assertEqual(len(logs), 1)
+            self.assertIn('2 created', logs[0].details)
+
+    def test_ndjson_import_in_batches(self):
+        """Test importing NDJSON across several batches"""
+        lines = [json.dumps({'email': f'import{i}@test.com', 'password': 'pw', 'roles': ['user']}) for i in range(5)]
+        lines.insert(2, '{not json')
+        with mock.patch.dict(self.app.config, {'USER_IMPORT_BATCH_SIZE': 2}):
+            response = self.post_import('\n'.join(lines) + '\n', 'application/x-ndjson')
+        
+        report = json.loads(response.data)
+        self.assertEqual((report['created'], report['failed']), (5, 1))
+        self.assertEqual(report['results'][2], {'line': 3, 'email': None, 'status': 'error', 'message': 'invalid JSON'})
+        with self.app.app_context():
+            self.assertEqual(User.query.filter(User.email.like('import%@test.com')).count(), 5)
+
+    def test_malformed_roles_fail_their_row(self):
+        """Test that non-string role entries are a per-row error rather than a failed import"""
+        lines = [
+            json.dumps({'email': 'a@test.com', 'password': 'pw', 'roles': [{'x': 1}]}),
+            json.dumps({'email': 'b@test.com', 'password': 'pw', 'roles': 5}),
+            json.dumps({'email': 'c@test.com', 'password': 'pw', 'roles': ['user']})
+        ]
+        response = self.post_import('\n'.join(lines), 'application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        
+        report = json.loads(response.data)
+        self.assertEqual([r['status'] for r in report['results']], ['error', 'error', 'created'])
+        self.assertEqual(report['results'][0]['message'], 'roles must be a list of role names')
+
+    def test_import_too_large(self):
+        """Test that imports over USER_IMPORT_MAX_ROWS are refused before anything is created"""
+        with mock.patch.dict(self.app.config, {'USER_IMPORT_MAX_ROWS': 2}):
+            body = 'email,password\n' + ''.join(f'big{i}@test.com,pw\n' for i in range(3))
+            response = self.post_import(body, 'text/csv')
+        
+        self.assertEqual(response.status_code, 413)
+        with self.app.app_context():
+            self.assertEqual(User.query.filter(User.email.like('big%')).count(), 0)
+
+    def test_unsupported_content_type(self):
+        """Test that only CSV and NDJSON bodies are accepted"""
+        response = self.post_import('[]', 'application/json')
+        self.assertEqual(response.status_code, 415)
+
+    def test_import_requires_admin(self):
+        """Test that only admins can import users, as for POST /api/users"""
+        with self.app.app_context():
+            permission = Permission(name='user:create', resource='user', action='create')
+            role = Role(name='provisioner', permissions=[permission])
+            user = User.query.filter_by(email='user@test.com').first()
+            user.roles.append(role)
+            db.session.add(role)
+            db.session.commit()
+        
+        response = self.post_import('email,password\nx@test.com,pw\n', 'text/csv', token=self.user_token)
+        self.assertEqual(response.status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
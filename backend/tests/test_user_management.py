@@ -1,4 +1,5 @@
 import unittest
+import base64
 import json
 import os
 import sys
@@ -17,6 +18,7 @@ class UserManagementTestCase(unittest.TestCase):
         """Set up test client and database"""
         self.app = app
         self.app.config['TESTING'] = True
+        self.app.config['AUDIT_WRITE_BEHIND'] = False
         self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.client = self.app.test_client()
         
@@ -93,7 +95,64 @@ class UserManagementTestCase(unittest.TestCase):
         data = json.loads(response.data)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(data), 2)  # Should have admin and regular user
+        self.assertEqual(len(data['users']), 2)  # Should have admin and regular user
+        self.assertIsNone(data['next_cursor'])
+
+    def test_list_users_keyset_pagination(self):
+        """Test paging through users with limit and cursor"""
+        with self.app.app_context():
+            for i in range(3):
+                extra_user = User(email=f'extra{i}@test.com', is_active=i != 0, is_admin=False)
+                extra_user.password_hash = 'not-a-real-hash'
+                db.session.add(extra_user)
+            db.session.commit()
+        
+        token = self.get_admin_token()
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/users?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            response = self.client.get(url, headers={'Authorization': f'Bearer {token}'})
+            data = json.loads(response.data)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(data['users']), 2)
+            seen.extend(user['email'] for user in data['users'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_list_users_rejects_malformed_cursor(self):
+        """Test that a decodable cursor holding the wrong types is a 400"""
+        token = self.get_admin_token()
+        for values in ([1, 2], [None, None], ['not-a-date', 'not-a-uuid']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+            response = self.client.get(
+                f'/api/users?cursor={cursor}',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['message'], 'Invalid cursor!')
+
+    def test_list_users_filters(self):
+        """Test server-side filtering of the user list"""
+        token = self.get_admin_token()
+        response = self.client.get(
+            '/api/users?is_admin=false&role=user',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        data = json.loads(response.data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['email'] for user in data['users']], ['user@test.com'])
+        
+        response = self.client.get(
+            '/api/users?created_from=not-a-date',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 400)
 
     def test_list_users_as_regular_user(self):
         """Test listing users as regular user (should be denied)"""
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import jwt
+
+# Key id for JWT_SECRET, and for tokens minted before signing keys had ids
+DEFAULT_KID = 'default'
+HMAC_ALGORITHM = 'HS256'
+
+# `verifying` is the public key for RS256/EdDSA and the secret for HS256
+SigningKey = namedtuple('SigningKey', ['algorithm', 'signing', 'verifying'])
+
+
+def parse_keys(value):
+    """Parse `kid:value` pairs separated by commas into a dict"""
+    keys = {}
+    for entry in (value or '').split(','):
+        if not entry.strip():
+            continue
+        kid, sep, key = entry.strip().partition(':')
+        if not sep or not kid or not key:
+            raise ValueError('key entries must look like kid:value')
+        keys[kid] = key
+    return keys
+
+
+def hmac_key(secret):
+    return SigningKey(HMAC_ALGORITHM, secret, secret)
+
+
+def load_private_key(pem):
+    """SigningKey for an RSA (RS256) or Ed25519 (EdDSA) private key in PEM form"""
+    # cryptography is only needed once asymmetric keys are configured
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+    private_key = load_pem_private_key(pem, password=None)
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return SigningKey('RS256', private_key, private_key.public_key())
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return SigningKey('EdDSA', private_key, private_key.public_key())
+    raise ValueError('signing keys must be RSA or Ed25519')
+
+
+def generate_private_key(algorithm):
+    """New unencrypted PKCS#8 PEM private key for RS256 or EdDSA"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f'unsupported algorithm {algorithm}')
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+
+
+def load_private_key_file(path):
+    with open(path, 'rb') as key_file:
+        return load_private_key(key_file.read())
+
+
+def public_jwk(kid, key):
+    """JWK for the public half of an asymmetric key"""
+    from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+    algorithm = RSAAlgorithm if key.algorithm == 'RS256' else OKPAlgorithm
+    jwk = algorithm.to_jwk(key.verifying, as_dict=True)
+    jwk.update({'kid': kid, 'alg': key.algorithm, 'use': 'sig'})
+    return jwk
+
+
+class TokenService:
+    """Signs and verifies JWTs against a keyring, caching verified tokens.
+
+    New tokens are signed with the active key and name it in their `kid`
+    header; any key still in the ring verifies, so a secret rotates by
+    adding the new key, making it active and dropping the old one once its
+    tokens have expired. Tokens without a `kid` use the `default` key.
+    Each key verifies only its own algorithm, so an HS256 token can never
+    be checked against a published RSA or Ed25519 key.
+
+    Verified claims are kept in a per-worker LRU keyed by a SHA-256 digest
+    of the token until the token's `exp`, so a token seen again skips the
+    signature check, JSON parsing and claim validation. Callers must not mutate the
+    returned claims.
+    """
+
+    def __init__(self, app=None):
+        self.keys = {}
+        self.active_kid = None
+        self.jwks = {'keys': []}
+        self.max_size = 10000
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_KEYS', '')
+        app.config.setdefault('JWT_PRIVATE_KEYS', '')
+        app.config.setdefault('JWT_ACTIVE_KID', None)
+        app.config.setdefault('JWT_TOKEN_CACHE_SIZE', 10000)
+        keys = {kid: hmac_key(secret) for kid, secret in parse_keys(app.config['JWT_KEYS']).items()}
+        for kid, path in parse_keys(app.config['JWT_PRIVATE_KEYS']).items():
+            keys[kid] = load_private_key_file(path)
+        if app.config.get('JWT_SECRET'):
+            keys.setdefault(DEFAULT_KID, hmac_key(app.config['JWT_SECRET']))
+        self.configure(keys, app.config['JWT_ACTIVE_KID'], app.config['JWT_TOKEN_CACHE_SIZE'])
+        app.extensions['token_service'] = self
+
+    def configure(self, keys, active_kid=None, max_size=None):
+        """Replace the keyring; plain string values are HS256 secrets"""
+        keys = {kid: hmac_key(key) if isinstance(key, str) else key for kid, key in keys.items()}
+        active_kid = active_kid or (DEFAULT_KID if DEFAULT_KID in keys else next(iter(keys), None))
+        if active_kid not in keys:
+            raise ValueError(f'No signing key with kid {active_kid!r}')
+        with self._lock:
+            self.keys = keys
+            self.active_kid = active_kid
+            self.jwks = {'keys': [
+                public_jwk(kid, key) for kid, key in keys.items() if key.algorithm != HMAC_ALGORITHM
+            ]}
+            if max_size is not None:
+                self.max_size = max_size
+            self._verified.clear()
+
+    def encode(self, payload):
+        key = self.keys[self.active_kid]
+        return jwt.encode(payload, key.signing, algorithm=key.algorithm, headers={'kid': self.active_kid})
+
+    def decode(self, token):
+        """Return the claims of a valid token; raises jwt.InvalidTokenError"""
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, kid, expires_at = entry
+                if expires_at > now and kid in self.keys:
+                    self._verified.move_to_end(digest)
+                    return claims
+                del self._verified[digest]
+
+        kid = jwt.get_unverified_header(token).get('kid', DEFAULT_KID)
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError('Unknown signing key')
+        claims = jwt.decode(token, key.verifying, algorithms=[key.algorithm])
+
+        # Tokens without an expiry are verified every time
+        if isinstance(claims.get('exp'), (int, float)):
+            with self._lock:
+                self._verified[digest] = (claims, kid, claims['exp'])
+                self._verified.move_to_end(digest)
+                while len(self._verified) > self.max_size:
+                    self._verified.popitem(last=False)
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+
+    def __len__(self):
+        return len(self._verified)
+
+
+token_service = TokenService()
@@ -0,0 +1,199 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+from itertools import islice
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Role, user_roles
+from pagination import parse_bool
+from hashing import password_hasher, HashingUnavailable
+
+DEFAULT_BATCH_SIZE = 100
+# Rows accepted per request. The import hashes every password before it
+# answers, so this keeps one request well inside gunicorn's 30s timeout
+DEFAULT_MAX_ROWS = 100
+
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _csv_rows(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for record in reader:
+        # Header is line 1
+        yield reader.line_num, record, None
+
+
+def _ndjson_rows(stream):
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError:
+            yield line_number, None, 'invalid JSON'
+
+
+def parse_import(stream, mimetype):
+    """Lazily parse an uploaded CSV or NDJSON body into (line, record, error) tuples"""
+    if mimetype in CSV_TYPES:
+        return _csv_rows(stream)
+    if mimetype in NDJSON_TYPES:
+        return _ndjson_rows(stream)
+    raise ValueError('Content-Type must be text/csv or application/x-ndjson')
+
+
+def take_rows(rows, max_rows=DEFAULT_MAX_ROWS):
+    """Read at most `max_rows` parsed rows; raises ValueError if there are more"""
+    rows = list(islice(rows, max_rows + 1))
+    if len(rows) > max_rows:
+        raise ValueError(f'at most {max_rows} rows per request; split the import')
+    return rows
+
+
+def _flag(value, default):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return default
+    parsed = parse_bool(str(value))
+    return default if parsed is None else parsed
+
+
+def _text(record, key):
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _prepare(record, role_ids):
+    """Validate one record into the fields to insert; raises ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('row must be an object')
+    email = _text(record, 'email')
+    password = record.get('password')
+    if not email or not password:
+        raise ValueError('email and password are required')
+
+    roles = record.get('roles') or []
+    if isinstance(roles, str):
+        roles = [name.strip() for name in roles.split(';') if name.strip()]
+    if not isinstance(roles, list) or not all(isinstance(name, str) for name in roles):
+        raise ValueError('roles must be a list of role names')
+    unknown = [name for name in roles if name not in role_ids]
+    if unknown:
+        raise ValueError(f'unknown roles: {", ".join(unknown)}')
+
+    return {
+        'email': email,
+        'password': str(password),
+        'first_name': _text(record, 'first_name'),
+        'last_name': _text(record, 'last_name'),
+        'is_active': _flag(record.get('is_active'), True),
+        'is_admin': _flag(record.get('is_admin'), False),
+        'role_ids': [role_ids[name] for name in roles]
+    }
+
+
+def _insert_batch(batch, results):
+    """Create the users in `batch`, skipping emails that already exist"""
+    lowered = [row['email'].lower() for _, row in batch]
+    existing = set(db.session.execute(
+        select(func.lower(User.email)).where(func.lower(User.email).in_(lowered))
+    ).scalars())
+
+    pending = []
+    for line, row in batch:
+        if row['email'].lower() in existing:
+            results.append({'line': line, 'email': row['email'], 'status': 'skipped', 'message': 'already exists'})
+        else:
+            pending.append((line, row))
+    if not pending:
+        return
+
+    try:
+        hashes = password_hasher.hash_many([row['password'] for _, row in pending])
+    except HashingUnavailable:
+        for line, row in pending:
+            results.append({'line': line, 'email': row['email'], 'status': 'error', 'message': 'password hashing is at capacity; retry'})
+        return
+
+    now = datetime.datetime.utcnow()
+    user_rows, role_rows = [], []
+    for (line, row), password_hash in zip(pending, hashes):
+        user_id = uuid.uuid4()
+        row['id'] = user_id
+        user_rows.append({
+            'id': user_id, 'email': row['email'], 'password_hash': password_hash,
+            'first_name': row['first_name'], 'last_name': row['last_name'],
+            'is_active': row['is_active'], 'is_admin': row['is_admin'], 'role': 'user',
+            'created_at': now, 'updated_at': now
+        })
+        role_rows.extend({'user_id': user_id, 'role_id': role_id} for role_id in row['role_ids'])
+
+    try:
+        db.session.execute(User.__table__.insert(), user_rows)
+        if role_rows:
+            db.session.execute(user_roles.insert(), role_rows)
+        db.session.commit()
+    except IntegrityError:
+        # Another request created one of these emails since the check above
+        db.session.rollback()
+        for line, row in pending:
+            results.append({'line': line, 'email': row['email'], 'status': 'error', 'message': 'conflicting change; retry'})
+        return
+
+    for line, row in pending:
+        results.append({'line': line, 'email': row['email'], 'status': 'created', 'id': str(row['id'])})
+
+
+def import_users(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Create users from parsed import rows in batches.
+
+    Each batch checks for existing emails with one query, hashes its
+    passwords across the hashing pool and inserts users and role
+    memberships with multi-row INSERTs in one transaction. Returns a report
+    with one result per row, in input order.
+    """
+    role_ids = dict(db.session.execute(select(Role.name, Role.id)).all())
+    results = []
+    seen = set()
+    batch = []
+    for line, record, error in rows:
+        email = record.get('email') if isinstance(record, dict) else None
+        if error is None:
+            try:
+                row = _prepare(record, role_ids)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            results.append({'line': line, 'email': email, 'status': 'error', 'message': error})
+            continue
+        if row['email'].lower() in seen:
+            results.append({'line': line, 'email': row['email'], 'status': 'skipped', 'message': 'duplicate in import'})
+            continue
+        seen.add(row['email'].lower())
+
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            _insert_batch(batch, results)
+            batch = []
+    if batch:
+        _insert_batch(batch, results)
+
+    results.sort(key=lambda result: result['line'])
+    counts = {'created': 0, 'skipped': 0, 'error': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        'created': counts['created'],
+        'skipped': counts['skipped'],
+        'failed': counts['error'],
+        'results': results
+    }
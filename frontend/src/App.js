@@ -9,6 +9,7 @@ import PermissionManagement from './components/PermissionManagement';
 import InviteUser from './components/InviteUser';
 import AuditLogs from './components/AuditLogs';
 import Navbar from './components/Navbar';
+import apiService from './api/apiService';
 import './App.css';
 
 function App() {
@@ -29,15 +30,21 @@ function App() {
     setLoading(false);
   }, []);
 
-  const handleLogin = (userData, token) => {
+  const handleLogin = (userData, token, refreshToken) => {
     localStorage.setItem('token', token);
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken);
+    }
     localStorage.setItem('user', JSON.stringify(userData));
     setIsAuthenticated(true);
     setUser(userData);
   };
 
   const handleLogout = () => {
+    // End the session server-side too; logging out locally must not wait on it
+    apiService.logout().catch(() => {});
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
     setIsAuthenticated(false);
     setUser(null);
@@ -1,5 +1,50 @@
 const API_BASE_URL = 'http://localhost:5000/api';
 
+// Access tokens are short-lived. When one is rejected, trade the refresh
+// token for a new pair and retry the request once with the new token.
+let refreshing = null;
+
+async function refreshTokens() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return false;
+  }
+  const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+  if (!response.ok) {
+    localStorage.removeItem('refresh_token');
+    return false;
+  }
+  const data = await response.json();
+  localStorage.setItem('token', data.token);
+  localStorage.setItem('refresh_token', data.refresh_token);
+  return true;
+}
+
+async function authFetch(url, options = {}) {
+  const response = await fetch(url, options);
+  if (response.status !== 401) {
+    return response;
+  }
+  // Concurrent requests share one refresh; a refresh token works only once
+  refreshing = refreshing || refreshTokens().finally(() => { refreshing = null; });
+  if (!(await refreshing)) {
+    return response;
+  }
+  return fetch(url, {
+    ...options,
+    headers: {
+      ...options.headers,
+      'Authorization': `Bearer ${localStorage.getItem('token')}`,
+    },
+  });
+}
+
 const apiService = {
   // Auth endpoints
   async login(email, password) {
@@ -41,10 +86,25 @@ const apiService = {
     return response.json();
   },
   
+  async logout() {
+    const token = localStorage.getItem('token');
+    await fetch(`${API_BASE_URL}/auth/logout`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+  
   // User endpoints
-  async getUsers() {
+  // Returns one page: { users, next_cursor }. Pass next_cursor back as `cursor`
+  // to fetch the following page; filters are passed through as query params.
+  async getUsers(params = {}) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/users`, {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    const response = await authFetch(`${API_BASE_URL}/users${query ? `?${query}` : ''}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -60,7 +120,7 @@ const apiService = {
   
   async getUser(userId) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/users/${userId}`, {
+    const response = await authFetch(`${API_BASE_URL}/users/${userId}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -76,7 +136,7 @@ const apiService = {
   
   async updateUser(userId, userData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/users/${userId}`, {
+    const response = await authFetch(`${API_BASE_URL}/users/${userId}`, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
@@ -95,7 +155,7 @@ const apiService = {
   
   async deleteUser(userId) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/users/${userId}`, {
+    const response = await authFetch(`${API_BASE_URL}/users/${userId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -112,7 +172,7 @@ const apiService = {
 
   async createUser(userData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/users`, {
+    const response = await authFetch(`${API_BASE_URL}/users`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -130,9 +190,12 @@ const apiService = {
   },
   
   // Role endpoints
+  // Fetched normalized, so each permission is sent once however many roles
+  // hold it. Roles are returned with `permissions` rebuilt from the shared
+  // map, in the same shape as the plain listing.
   async getRoles() {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/roles`, {
+    const response = await authFetch(`${API_BASE_URL}/roles?shape=normalized`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -143,12 +206,16 @@ const apiService = {
       throw new Error(errorData.message || 'Failed to fetch roles');
     }
     
-    return response.json(); // Ensure role IDs are included in the response
+    const { roles, permissions } = await response.json();
+    return roles.map(({ permission_ids, ...role }) => ({
+      ...role,
+      permissions: permission_ids.map((id) => permissions[id]),
+    }));
   },
   
   async createRole(roleData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/roles`, {
+    const response = await authFetch(`${API_BASE_URL}/roles`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -167,7 +234,7 @@ const apiService = {
 
   async updateRole(roleId, roleData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/roles/${roleId}`, {
+    const response = await authFetch(`${API_BASE_URL}/roles/${roleId}`, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
@@ -186,7 +253,7 @@ const apiService = {
 
   async deleteRole(roleId) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/roles/${roleId}`, {
+    const response = await authFetch(`${API_BASE_URL}/roles/${roleId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -203,7 +270,7 @@ const apiService = {
 
   async getPermissions() {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/permissions`, {
+    const response = await authFetch(`${API_BASE_URL}/permissions`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -219,7 +286,7 @@ const apiService = {
 
   async createPermission(permissionData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/permissions`, {
+    const response = await authFetch(`${API_BASE_URL}/permissions`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -239,7 +306,7 @@ const apiService = {
   // Invitation endpoints
   async getInvitations() {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/invitations`, {
+    const response = await authFetch(`${API_BASE_URL}/invitations`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -255,7 +322,7 @@ const apiService = {
   
   async createInvitation(invitationData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/invitations`, {
+    const response = await authFetch(`${API_BASE_URL}/invitations`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -274,7 +341,7 @@ const apiService = {
   
   async revokeInvitation(invitationId) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/invitations/${invitationId}`, {
+    const response = await authFetch(`${API_BASE_URL}/invitations/${invitationId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -291,7 +358,7 @@ const apiService = {
 
   async inviteAndCreateUser(userData) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/invitations`, {
+    const response = await authFetch(`${API_BASE_URL}/invitations`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -320,9 +387,15 @@ const apiService = {
     return response.json();
   },
 
-  async getAuditLogs() {
+  // Returns one page, newest first: { audit_logs, next_cursor }. Filters
+  // (user_id, action, resource_type, resource_id, ip_address, from, to) and
+  // `cursor` are passed through as query params.
+  async getAuditLogs(params = {}) {
     const token = localStorage.getItem('token');
-    const response = await fetch(`${API_BASE_URL}/audit-logs`, {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    const response = await authFetch(`${API_BASE_URL}/audit-logs${query ? `?${query}` : ''}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
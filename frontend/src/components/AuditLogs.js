@@ -3,6 +3,8 @@ import apiService from '../api/apiService';
 
 function AuditLogs() {
   const [logs, setLogs] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filters, setFilters] = useState({ action: '', resource_type: '' });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -13,8 +15,9 @@ function AuditLogs() {
   const fetchAuditLogs = async () => {
     setLoading(true);
     try {
-      const data = await apiService.getAuditLogs(); // Corrected method name
-      setLogs(data);
+      const data = await apiService.getAuditLogs(filters);
+      setLogs(data.audit_logs);
+      setNextCursor(data.next_cursor);
       setError('');
     } catch (err) {
       setError(err.message);
@@ -23,12 +26,54 @@ function AuditLogs() {
     }
   };
 
+  const fetchMoreAuditLogs = async () => {
+    try {
+      const data = await apiService.getAuditLogs({ ...filters, cursor: nextCursor });
+      setLogs([...logs, ...data.audit_logs]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
+  const handleFilterChange = (e) => {
+    setFilters({ ...filters, [e.target.name]: e.target.value });
+  };
+
+  const handleFilterSubmit = (e) => {
+    e.preventDefault();
+    fetchAuditLogs();
+  };
+
   if (loading) return <div>Loading audit logs...</div>;
 
   return (
     <div>
       <h1>Audit Logs</h1>
       {error && <div className="alert alert-danger">{error}</div>}
+      <form onSubmit={handleFilterSubmit} className="form-container">
+        <div className="form-group">
+          <label>Action:</label>
+          <input
+            type="text"
+            name="action"
+            className="form-control"
+            value={filters.action}
+            onChange={handleFilterChange}
+          />
+        </div>
+        <div className="form-group">
+          <label>Resource type:</label>
+          <input
+            type="text"
+            name="resource_type"
+            className="form-control"
+            value={filters.resource_type}
+            onChange={handleFilterChange}
+          />
+        </div>
+        <button type="submit" className="btn btn-primary">Filter</button>
+      </form>
       <table className="table-container">
         <thead>
           <tr>
@@ -51,6 +96,9 @@ function AuditLogs() {
           ))}
         </tbody>
       </table>
+      {nextCursor && (
+        <button className="btn btn-secondary" onClick={fetchMoreAuditLogs}>Load more</button>
+      )}
     </div>
   );
 }
@@ -25,7 +25,7 @@ function InviteUser({ onLogin }) {
     try {
       const response = await apiService.inviteAndCreateUser(formData);
       if (response && response.user && response.token) {
-        const { user, token } = response;
+        const { user, token, refresh_token } = response;
         setSuccessMessage('User invited and created successfully!');
         setError('');
         setFormData({
@@ -35,7 +35,7 @@ function InviteUser({ onLogin }) {
           password: '',
           role_ids: []
         });
-        onLogin(user, token); // Log in the newly created user
+        onLogin(user, token, refresh_token); // Log in the newly created user
       } else {
         throw new Error('Invalid response from server');
       }
@@ -15,7 +15,7 @@ function Login({ onLogin }) {
 
     try {
       const data = await apiService.login(email, password);
-      onLogin(data.user, data.token);
+      onLogin(data.user, data.token, data.refresh_token);
     } catch (err) {
       setError(err.message);
     } finally {
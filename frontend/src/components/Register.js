@@ -25,7 +25,7 @@ function Register({ onLogin }) {
 
     try {
       const data = await apiService.register(email, password, firstName, lastName);
-      onLogin(data.user, data.token);
+      onLogin(data.user, data.token, data.refresh_token);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -3,6 +3,7 @@ import apiService from '../api/apiService'; // Adjust the import path as necessa
 
 function UserManagement() {
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [editingUser, setEditingUser] = useState(null);
@@ -31,7 +32,8 @@ function UserManagement() {
     setLoading(true);
     try {
       const data = await apiService.getUsers();
-      setUsers(data);
+      setUsers(data.users);
+      setNextCursor(data.next_cursor);
       setError('');
     } catch (err) {
       setError(err.message);
@@ -40,6 +42,16 @@ function UserManagement() {
     }
   };
   
+  const fetchMoreUsers = async () => {
+    try {
+      const data = await apiService.getUsers({ cursor: nextCursor });
+      setUsers([...users, ...data.users]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+  
   const handleChange = (e) => {
     const { name, value, type, checked } = e.target;
     setFormData({
@@ -282,6 +294,9 @@ function UserManagement() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <button className="btn btn-secondary" onClick={fetchMoreUsers}>Load more</button>
+          )}
         </div>
       )}
     </div>